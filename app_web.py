@@ -7,17 +7,27 @@ using various letter mapping techniques.
 
 import os
 import re
+import math
 import itertools
 import ahocorasick
+import numpy as np
 import json
+import hashlib
+import base64
 import time
+from array import array
+from bisect import bisect_right
 from concurrent.futures import ThreadPoolExecutor
 from collections import defaultdict
-from flask import Flask, request, jsonify, render_template_string, send_from_directory
+from flask import Flask, Response, request, jsonify, render_template_string, send_from_directory, stream_with_context
 from flask_cors import CORS
 import logging
-from functools import lru_cache
 import threading
+from result_cache import ResultCache, make_cache_key
+from shared_scan import ProcessScanner, write_scan_buffer
+from metrics import Metrics, COUNT_BUCKETS
+from matcher_cache import MatcherCache
+from corpus_file import read_corpus_file, write_corpus_file
 
 # Configure logging
 logging.basicConfig(
@@ -33,12 +43,65 @@ CORS(app)
 class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'dev-secret-key-change-in-production'
     TORAH_FILE = os.path.join(os.path.dirname(__file__), 'torah.txt')
+    # Extra corpora as 'name=path,name=path'; 'torah' is TORAH_FILE unless overridden
+    CORPORA = os.environ.get('CORPORA', '')
     MAX_RESULTS = int(os.environ.get('MAX_RESULTS', '1000'))
     CACHE_TIMEOUT = int(os.environ.get('CACHE_TIMEOUT', '3600'))
+    CACHE_MAX_ENTRIES = int(os.environ.get('CACHE_MAX_ENTRIES', '1024'))
     MAX_WORKERS = int(os.environ.get('MAX_WORKERS', '8'))
+    MAX_BATCH_PHRASES = int(os.environ.get('MAX_BATCH_PHRASES', '200'))
+    MAX_PAGE_SIZE = int(os.environ.get('MAX_PAGE_SIZE', '1000'))
+    MAX_VERSE_IDS = int(os.environ.get('MAX_VERSE_IDS', '1000'))
+    SEARCH_ENGINE = os.environ.get('SEARCH_ENGINE', 'class')
+    EXECUTION_MODE = os.environ.get('EXECUTION_MODE', 'thread')
+    SCAN_PROCESSES = int(os.environ.get('SCAN_PROCESSES', '0'))
+    INDEX_DIR = os.environ.get('INDEX_DIR', os.path.join(os.path.dirname(__file__), '.index'))
+    CORPUS_FILE = os.environ.get('CORPUS_FILE', os.path.join(INDEX_DIR, 'corpus.bin'))
+    PRELOAD_MAP_INDEXES = os.environ.get('PRELOAD_MAP_INDEXES', '0') == '1'
+    CACHE_FILE = os.environ.get('CACHE_FILE', os.path.join(INDEX_DIR, 'result_cache.sqlite3'))
+    MATCHER_DIR = os.environ.get('MATCHER_DIR', os.path.join(INDEX_DIR, 'matchers'))
+    MATCHER_CACHE_MB = int(os.environ.get('MATCHER_CACHE_MB', '256'))
+    MATCHER_DISK_MB = int(os.environ.get('MATCHER_DISK_MB', '2048'))
+    MAX_VARIANT_SPACE = int(os.environ.get('MAX_VARIANT_SPACE', '5000000'))
+    COST_BUDGET_MS = int(os.environ.get('COST_BUDGET_MS', '10000'))
+    COST_POLICY = os.environ.get('COST_POLICY', 'reroute')
+    DOWNGRADE_LIMIT = int(os.environ.get('DOWNGRADE_LIMIT', '100'))
+    ELS_MAX_SKIP = int(os.environ.get('ELS_MAX_SKIP', '5000'))
+    ELS_MAX_HITS = int(os.environ.get('ELS_MAX_HITS', '10000'))
+    GEMATRIA_MAX_WORDS = int(os.environ.get('GEMATRIA_MAX_WORDS', '3'))
+    GEMATRIA_MAX_HITS = int(os.environ.get('GEMATRIA_MAX_HITS', '10000'))
+    OCCURRENCES_MAX_HITS = int(os.environ.get('OCCURRENCES_MAX_HITS', '100000'))
+    FUZZY_MAX_DISTANCE = int(os.environ.get('FUZZY_MAX_DISTANCE', '3'))
+    SIGNATURE_MAX_LENGTH = int(os.environ.get('SIGNATURE_MAX_LENGTH', '8'))
+    REQUEST_DEADLINE = float(os.environ.get('REQUEST_DEADLINE', '25'))
+    ASYNC_CONCURRENCY = int(os.environ.get('ASYNC_CONCURRENCY', '0'))
+    ASYNC_QUEUE_SIZE = int(os.environ.get('ASYNC_QUEUE_SIZE', '64'))
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1') == '1'
+    METRICS_FILE = os.environ.get('METRICS_FILE', os.path.join(INDEX_DIR, 'metrics.sqlite3'))
+    METRICS_FLUSH_INTERVAL = float(os.environ.get('METRICS_FLUSH_INTERVAL', '5'))
+    METRICS_FLUSH_REQUESTS = int(os.environ.get('METRICS_FLUSH_REQUESTS', '100'))
 
 app.config.from_object(Config)
 
+result_cache = ResultCache(Config.CACHE_FILE, Config.CACHE_TIMEOUT, Config.CACHE_MAX_ENTRIES)
+
+metrics = Metrics(Config.METRICS_FILE, Config.METRICS_ENABLED, Config.METRICS_FLUSH_INTERVAL,
+                  Config.METRICS_FLUSH_REQUESTS)
+STAGE_SECONDS = 'torah_search_stage_seconds'
+metrics.histogram(STAGE_SECONDS, 'Time spent in each search pipeline stage.')
+metrics.histogram('torah_search_variants', 'Size of the variant space per executed query.', COUNT_BUCKETS)
+metrics.histogram('torah_search_matches', 'Accepted hits per executed query.', COUNT_BUCKETS)
+metrics.counter('torah_search_requests_total', 'Search queries by endpoint, engine and cache outcome.')
+metrics.counter('torah_search_errors_total', 'Failed search queries by endpoint.')
+metrics.counter('torah_search_truncated_total', 'Searches cut short by their deadline.')
+metrics.counter('torah_search_matcher_lookups_total', 'Compiled matcher lookups by outcome (memory, disk, build).')
+metrics.counter('torah_search_matcher_seconds_saved_total', 'Matcher build time avoided by cache hits.')
+
+matcher_cache = MatcherCache(
+    Config.MATCHER_DIR, Config.MATCHER_CACHE_MB * 1024 * 1024, Config.MATCHER_DISK_MB * 1024 * 1024,
+    sizeof=lambda automaton: automaton.get_stats()['total_size']
+)
+
 # === Letter Mapping Data ===
 abgd_map_1 = { 'א': 'ב', 'ב': 'א', 'ג': 'ד', 'ד': 'ג', 'ה': 'ו', 'ו': 'ה',
                'ז': 'ח', 'ח': 'ז', 'ט': 'י', 'י': 'ט', 'כ': 'ל', 'ל': 'כ',
@@ -79,6 +142,10 @@ abgd_map_8 = [['א','ה','ו','י']]
 
 final_to_regular = { 'ך':'כ', 'ם':'מ', 'ן':'נ', 'ף':'פ', 'ץ':'צ' }
 
+GEMATRIA_VALUES = { 'א': 1, 'ב': 2, 'ג': 3, 'ד': 4, 'ה': 5, 'ו': 6, 'ז': 7, 'ח': 8, 'ט': 9,
+                    'י': 10, 'כ': 20, 'ל': 30, 'מ': 40, 'נ': 50, 'ס': 60, 'ע': 70, 'פ': 80, 'צ': 90,
+                    'ק': 100, 'ר': 200, 'ש': 300, 'ת': 400 }
+
 maps = [
     ("Map 1", abgd_map_1),
     ("Map 2", abgd_map_2),
@@ -86,11 +153,75 @@ maps = [
     ("Map 4", abgd_map_4)
 ]
 
+MAP_NAMES = tuple(f"Map {number}" for number in range(1, 9))
+
+# Identifies the mapping tables, so persisted matchers are rebuilt when they change
+MAPPING_DIGEST = hashlib.sha1(repr((
+    maps, abgd_map_5, abgd_map_6, abgd_map_7, abgd_map_8, final_to_regular
+)).encode('utf-8')).hexdigest()[:16]
+
+# Available search engines: 'class' scans with per-letter character classes,
+# 'bitap' runs a vectorized Shift-And over the encoded corpus, 'suffix'
+# walks the corpus suffix array, 'projected' looks the phrase up in a
+# per-map projected index, 'aho' expands every variant into an
+# Aho-Corasick automaton, 'words' looks whole words up in the word index and
+# 'signature' looks single words up in the n-gram signature index
+SEARCH_ENGINES = ('class', 'bitap', 'suffix', 'projected', 'aho', 'words', 'signature')
+
+# Engines that scan the whole corpus for every query; a batch search runs the
+# phrases these would get in one shared Shift-And pass instead
+SCAN_ENGINES = ('class', 'bitap', 'aho')
+
+# Response formats: full location dicts with marked verse text, verse ids
+# and match offsets to be resolved through /api/verses, or only hit counts
+# by sources, book and chapter
+RESPONSE_FORMATS = ('full', 'compact', 'summary')
+
+# Name of the corpus loaded from TORAH_FILE and searched by default
+DEFAULT_CORPUS = 'torah'
+
+# Sections stored in binary corpus files; files of another layout are rebuilt
+CORPUS_LAYOUT = 2
+
+# How a phrase may match: anywhere in the text, as whole words, or as whole
+# words whose first word may carry ignored_prefixes letters; the word modes
+# always run on the 'words' engine
+MATCH_MODES = ('substring', 'word', 'prefix')
+
+# Maximum locations reported per variant
+MAX_LOCATIONS = 100
+
+# How the 'class' engine scans: in the request thread, or in a process pool
+# over the memory-mapped encoded corpus
+EXECUTION_MODES = ('thread', 'process')
+
+# What to do with a query over budget: refuse it, run it on a cheaper engine,
+# or only return a first page of results
+COST_POLICIES = ('reject', 'reroute', 'downgrade')
+
+# Rough per-engine cost model in milliseconds, fitted on the bundled corpus;
+# only used to compare plans against budgets, not as a latency promise
+SCAN_MS_PER_CHAR = 0.00005
+VARIANT_MS = 0.003
+SUFFIX_MS_PER_DIGIT = 50
+WORD_MS_PER_TERM = 0.0005
+SIGNATURE_MS_PER_GRAM = 0.0002
+
+# Verses per step of the vectorized scans that check a deadline between steps
+SCAN_CHUNK_VERSES = 4096
+
+# ELS directions: letters read at increasing offsets, decreasing offsets, or both
+ELS_DIRECTIONS = ('forward', 'backward', 'both')
+
+# Gematria spans: runs of up to GEMATRIA_MAX_WORDS whole words, or any run of
+# letters within a verse
+GEMATRIA_SPANS = ('words', 'letters')
+
 ignored_prefixes = {'ל', 'מ', 'ו', 'ה', 'כ'}
 
 # Global variables for caching
-_torah_lines = None
-_torah_text = None
+_verse_tables = {}
+_process_scanners = {}
 _torah_lock = threading.RLock()
 
 # === Core Search Logic ===
@@ -127,161 +258,3073 @@ def get_possible_conversions(ch):
     # Original character
     results.append((ch, "Original"))
     
-    return list(set(results))
+    # Deterministic order: the original letter first, then maps in order
+    return sorted(set(results), key=lambda option: (option[1] != "Original", option[1], option[0]))
 
-def generate_all_variants(phrase):
-    """Generate all possible variants of a phrase using letter mappings."""
+def get_letter_options(phrase, maps=None):
+    """Get the (letter, source) options for every position of a phrase.
+
+    With ``maps``, only conversions from those maps (and the original
+    letter) are kept.
+    """
     letter_options = []
     for ch in phrase:
         if ch == ' ':
             letter_options.append([(' ', 'Original')])
         else:
-            letter_options.append(get_possible_conversions(ch))
+            options = get_possible_conversions(ch)
+            if maps is not None:
+                options = [option for option in options if option[1] == 'Original' or option[1] in maps]
+            letter_options.append(options)
+    return letter_options
+
+def generate_all_variants(phrase, maps=None):
+    """Generate all possible variants of a phrase using letter mappings."""
+    letter_options = get_letter_options(phrase, maps)
     
     return [
         ("".join([ltr for ltr, _ in combo]), [src for _, src in combo])
         for combo in itertools.product(*letter_options)
     ]
 
-@lru_cache(maxsize=128)
-def load_torah_lines():
-    """Load Torah lines with caching."""
-    global _torah_lines, _torah_text
-    
+def gematria_value(text):
+    """Return the standard gematria value of a text; final letters count as their regular forms."""
+    return sum(GEMATRIA_VALUES.get(final_to_regular.get(ch, ch), 0) for ch in text)
+
+def gematria_targets(phrase, maps=None):
+    """Return the values a phrase can take and the per-letter sources reaching each.
+
+    Without ``maps`` only the phrase's own value is used; with ``maps``
+    every variant under those maps counts. Values are collected letter by
+    letter, so the variant space is never enumerated; the first sources
+    found (original letters first) are kept for each value.
+    """
+    letter_options = get_letter_options(phrase, maps if maps is not None else ())
+    values = {0: ()}
+    for options in letter_options:
+        next_values = {}
+        for value, sources in values.items():
+            for letter, source in options:
+                next_values.setdefault(value + gematria_value(letter), sources + (source,))
+        values = next_values
+    return values
+
+HEADER_RE = re.compile(r'^(\S+)\s+\u05e4\u05e8\u05e7-([\u05d0-\u05ea]+)$')
+VERSE_RE = re.compile(r'\{[^}]+\}[^{}]+')
+VERSE_NUM_RE = re.compile(r'\{([^}]+)\}')
+VERSE_MARK_RE = re.compile(r'\{[^}]+\}')
+WORD_RE = re.compile(r'[\u05d0-\u05ea]+')
+
+def count_variants(phrase, maps=None):
+    """Return the number of variants generate_all_variants would produce."""
+    return math.prod(len(options) for options in get_letter_options(phrase, maps))
+
+def observe_variant_count(phrase, maps=None):
+    """Record the variant-space size of an executed query."""
+    with metrics.timer(STAGE_SECONDS, stage='variant_count'):
+        variant_count = count_variants(phrase, maps)
+    metrics.observe('torah_search_variants', variant_count)
+
+class VerseTable:
+    """Pre-parsed verse references and clean texts, built once per corpus file.
+
+    Verse texts are stored back to back in ``text`` (separated by newlines)
+    with ``starts[i]`` giving the offset of verse ``i``. References are kept
+    in parallel arrays: ``verse_ids[i]`` indexes ``verse_labels``,
+    ``chapter_ids[i]`` indexes ``chapters`` (a list of ``(book_id, chapter)``
+    pairs) and ``book_ids`` index ``books``. The arrays may be memoryviews
+    into a mapped corpus file.
+    """
+
+    def __init__(self, text, starts, verse_ids, verse_labels, chapter_ids, chapters, books, line_count):
+        self.text = text
+        self.starts = starts
+        self.verse_ids = verse_ids
+        self.verse_labels = verse_labels
+        self.chapter_ids = chapter_ids
+        self.chapters = chapters
+        self.books = books
+        self.line_count = line_count
+        self.encoded = None
+        self.suffix_index = None
+        self.projected_indexes = {}
+        self.letters = None
+        self.verse_columns = None
+        self.word_index = None
+        self.signature_index = None
+        self.gematria_index = None
+        self.corpus = None
+
+    def __len__(self):
+        return len(self.verse_ids)
+
+    def verse_text(self, i):
+        """Return the clean text of verse ``i``."""
+        return self.text[self.starts[i]:self.starts[i + 1] - 1]
+
+    def reference(self, i):
+        """Return ``(book, chapter, verse)`` labels for verse ``i``."""
+        book_id, chapter = self.chapters[self.chapter_ids[i]]
+        return self.books[book_id], chapter, self.verse_labels[self.verse_ids[i]]
+
+class ShardSet:
+    """Several verse tables searched as one, in registry order.
+
+    Verse ids and text offsets of each shard are shifted by the verse and
+    text sizes of the shards before it, so hits from every shard sort,
+    page and format like hits from a single table.
+    """
+
+    def __init__(self, tables):
+        self.tables = tables
+        self.verse_bases = [0]
+        self.text_bases = [0]
+        for table in tables:
+            self.verse_bases.append(self.verse_bases[-1] + len(table))
+            self.text_bases.append(self.text_bases[-1] + table.starts[len(table)])
+        self.starts = array('q')
+        for table, base in zip(tables, self.text_bases):
+            self.starts.extend(start + base for start in table.starts[:len(table)])
+        self.starts.append(self.text_bases[-1])
+
+    def __len__(self):
+        return self.verse_bases[-1]
+
+    def _locate(self, i):
+        shard = bisect_right(self.verse_bases, i) - 1
+        return self.tables[shard], i - self.verse_bases[shard]
+
+    def verse_text(self, i):
+        """Return the clean text of verse ``i``."""
+        table, verse_id = self._locate(i)
+        return table.verse_text(verse_id)
+
+    def reference(self, i):
+        """Return ``(book, chapter, verse)`` labels for verse ``i``."""
+        table, verse_id = self._locate(i)
+        return table.reference(verse_id)
+
+def parse_torah_file(path):
+    """Parse a corpus file into a VerseTable."""
+    texts = []
+    verse_ids = array('I')
+    verse_labels = []
+    label_index = {}
+    chapter_ids = array('I')
+    chapters = []
+    books = []
+    book_index = {}
+    line_count = 0
+    chapter_id = None
+
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line_count += 1
+            line = line.strip()
+
+            # Check for book/chapter headers
+            match = HEADER_RE.match(line)
+            if match:
+                book, chapter = match.groups()
+                if book not in book_index:
+                    book_index[book] = len(books)
+                    books.append(book)
+                chapter_id = len(chapters)
+                chapters.append((book_index[book], chapter))
+                continue
+
+            # Find verses
+            for verse in VERSE_RE.findall(line):
+                if chapter_id is None:
+                    # Verses before the first header have no reference
+                    chapter_id = len(chapters)
+                    chapters.append((len(books), None))
+                    books.append(None)
+                verse_num_match = VERSE_NUM_RE.search(verse)
+                label = verse_num_match.group(1) if verse_num_match else "?"
+                if label not in label_index:
+                    label_index[label] = len(verse_labels)
+                    verse_labels.append(label)
+                verse_ids.append(label_index[label])
+                chapter_ids.append(chapter_id)
+                texts.append(VERSE_MARK_RE.sub('', verse).strip())
+
+    starts = array('I', [0])
+    for verse_text in texts:
+        starts.append(starts[-1] + len(verse_text) + 1)
+    texts.append('')
+
+    return VerseTable('\n'.join(texts), starts, verse_ids, verse_labels, chapter_ids, chapters, books, line_count)
+
+class EncodedCorpus:
+    """The verse table text encoded as one uint8 letter code per character.
+
+    Code 0 is the verse separator and every other distinct character of the
+    text gets its own code. ``conversions[q, c]`` is set when corpus code
+    ``c`` is an allowed conversion of phrase letter ``q`` under the
+    abgd_map_* tables (or the original letter).
+    """
+
+    def __init__(self, alphabet, codes, starts):
+        self.alphabet = alphabet
+        self.char_codes = {ch: code for code, ch in enumerate(self.alphabet)}
+        self.codes = np.asarray(codes, dtype=np.uint8)
+        self.starts = np.asarray(starts, dtype=np.int64)
+
+        digest = hashlib.sha1(self.codes.tobytes())
+        digest.update('\0'.join(self.alphabet).encode('utf-8'))
+        self.digest = digest.hexdigest()[:16]
+
+        self.conversions = np.zeros((len(self.alphabet), len(self.alphabet)), dtype=bool)
+        for code, ch in enumerate(self.alphabet[1:], start=1):
+            self.conversions[code, self.allowed_codes(get_letter_options(ch)[0])] = True
+
+    @classmethod
+    def from_table(cls, table):
+        """Encode a parsed verse table."""
+        alphabet = sorted(set(table.text) - {'\n'})
+        if len(alphabet) > 255:
+            raise ValueError(f"Corpus alphabet too large to encode: {len(alphabet)} characters")
+
+        alphabet = ['\n'] + alphabet
+        translation = {ord(ch): code for code, ch in enumerate(alphabet)}
+        codes = np.frombuffer(table.text.translate(translation).encode('latin-1'), dtype=np.uint8)
+        return cls(alphabet, codes, table.starts)
+
+    def decode(self):
+        """Return the text the codes encode."""
+        code_points = np.array([ord(ch) for ch in self.alphabet], dtype='<u4')
+        return code_points[self.codes].tobytes().decode('utf-32-le')
+
+    def allowed_codes(self, options):
+        """Return the corpus codes for a position's (letter, source) options."""
+        return sorted({self.char_codes[letter] for letter, _ in options if letter in self.char_codes})
+
+    def encode(self, phrase):
+        """Encode a phrase, or return None if it uses characters absent from the corpus."""
+        if any(ch not in self.char_codes for ch in phrase):
+            return None
+        return np.array([self.char_codes[ch] for ch in phrase], dtype=np.uint8)
+
+def build_suffix_array(codes):
+    """Build the suffix array of a code array by prefix doubling."""
+    n = len(codes)
+    rank = codes.astype(np.int64)
+    k = 1
+    while True:
+        second = np.zeros(n, dtype=np.int64)
+        second[:n - k] = rank[k:] + 1
+        keys = rank * (n + 1) + second
+        suffix_array = np.argsort(keys, kind='stable')
+        sorted_keys = keys[suffix_array]
+        boundaries = np.empty(n, dtype=bool)
+        boundaries[0] = True
+        boundaries[1:] = sorted_keys[1:] != sorted_keys[:-1]
+        rank = np.empty(n, dtype=np.int64)
+        rank[suffix_array] = np.cumsum(boundaries) - 1
+        if rank[suffix_array[-1]] == n - 1:
+            return suffix_array.astype(np.int32)
+        k *= 2
+
+class SuffixArrayIndex:
+    """Suffix array over an encoded corpus for logarithmic-time lookups.
+
+    Ranges are half-open ``[lo, hi)`` slices of the suffix array whose
+    suffixes share a common prefix; ``narrow`` extends that prefix by one
+    letter code, so mapped phrases can be resolved one allowed letter set at
+    a time and dead branches of the variant tree are pruned immediately.
+    """
+
+    def __init__(self, codes, suffix_array):
+        self.codes = codes
+        self.suffix_array = suffix_array
+
+    def _bound(self, lo, hi, depth, code, upper):
+        codes, suffix_array, n = self.codes, self.suffix_array, len(self.codes)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            pos = int(suffix_array[mid]) + depth
+            current = int(codes[pos]) if pos < n else -1
+            if current < code or (upper and current == code):
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def narrow(self, lo, hi, depth, code):
+        """Restrict a range sharing a ``depth``-long prefix to those followed by ``code``."""
+        lo = self._bound(lo, hi, depth, code, upper=False)
+        return lo, self._bound(lo, hi, depth, code, upper=True)
+
+    def find(self, pattern_codes):
+        """Return the suffix array range of all occurrences of a code sequence."""
+        lo, hi = 0, len(self.suffix_array)
+        for depth, code in enumerate(pattern_codes):
+            lo, hi = self.narrow(lo, hi, depth, int(code))
+            if lo == hi:
+                break
+        return lo, hi
+
+    def occurrences(self, pattern_codes):
+        """Return the sorted start offsets of a code sequence."""
+        lo, hi = self.find(pattern_codes)
+        return np.sort(self.suffix_array[lo:hi])
+
+    def contains(self, pattern_codes):
+        """Check whether a code sequence occurs in the corpus."""
+        lo, hi = self.find(pattern_codes)
+        return hi > lo
+
+    def search_classes(self, allowed_codes):
+        """Find every occurrence of a sequence of allowed code sets.
+
+        Returns ``(variant_codes, positions)`` pairs, one per distinct variant
+        that actually occurs in the corpus.
+        """
+        found = []
+        stack = [((), 0, len(self.suffix_array))]
+        while stack:
+            prefix, lo, hi = stack.pop()
+            depth = len(prefix)
+            if depth == len(allowed_codes):
+                found.append((prefix, self.suffix_array[lo:hi]))
+                continue
+            for code in reversed(allowed_codes[depth]):
+                sub_lo, sub_hi = self.narrow(lo, hi, depth, code)
+                if sub_lo < sub_hi:
+                    stack.append((prefix + (code,), sub_lo, sub_hi))
+        return found
+
+def load_suffix_index(codes, name):
+    """Load a suffix array from the index directory, building and saving it if needed."""
+    path = os.path.join(app.config['INDEX_DIR'], f'suffix_array-{name}.npy')
+
+    try:
+        # Mapped read-only so every worker shares the same pages
+        return SuffixArrayIndex(codes, np.load(path, mmap_mode='r'))
+    except (OSError, ValueError):
+        pass
+
+    start_time = time.time()
+    suffix_array = build_suffix_array(codes)
+    logger.info(f"Built suffix array over {len(suffix_array)} characters "
+                f"in {time.time() - start_time:.2f}s")
+    try:
+        os.makedirs(app.config['INDEX_DIR'], exist_ok=True)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.save(f, suffix_array)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logger.warning(f"Could not persist suffix array to {path}: {e}")
+    return SuffixArrayIndex(codes, suffix_array)
+
+def map_class_ids(alphabet, maps):
+    """Return the connected component id of every letter in the conversion graph of ``maps``.
+
+    Class 0 is reserved for the verse separator; letters reachable from the
+    alphabet through conversions are included too.
+    """
+    letters = set(alphabet[1:])
+    for ch in list(letters):
+        letters.update(letter for letter, _ in get_letter_options(ch, maps)[0])
+    parent = {ch: ch for ch in letters}
+
+    def find(ch):
+        while parent[ch] != ch:
+            parent[ch] = parent[parent[ch]]
+            ch = parent[ch]
+        return ch
+
+    for ch in sorted(letters):
+        for letter, _ in get_letter_options(ch, maps)[0]:
+            parent[find(letter)] = find(ch)
+
+    roots = sorted({find(ch) for ch in letters})
+    root_ids = {root: class_id for class_id, root in enumerate(roots, start=1)}
+    return {ch: root_ids[find(ch)] for ch in letters}
+
+class ProjectedIndex:
+    """Suffix array over the corpus projected onto map equivalence classes.
+
+    Every letter is replaced by the id of its connected component in the
+    conversion graph of the selected maps, so a phrase can only match where
+    its projection occurs and a map-restricted query becomes one exact
+    lookup. Maps whose conversions are not symmetric (e.g. Map 4's final
+    letters) make this a superset, so hits are still verified per letter.
+    """
+
+    def __init__(self, encoded, maps):
+        self.class_ids = map_class_ids(encoded.alphabet, maps)
+        projection = np.zeros(len(encoded.alphabet), dtype=np.uint8)
+        for code, ch in enumerate(encoded.alphabet[1:], start=1):
+            projection[code] = self.class_ids[ch]
+
+        name = '-'.join(map_name.split()[-1] for map_name in maps) if maps is not None else 'all'
+        self.suffix_index = load_suffix_index(projection[encoded.codes], f'{encoded.digest}-maps-{name}')
+
+    def project(self, phrase):
+        """Project a phrase onto class ids, or return None if a letter cannot match."""
+        if any(ch not in self.class_ids for ch in phrase):
+            return None
+        return [self.class_ids[ch] for ch in phrase]
+
+def get_projected_index(table, maps):
+    """Return the projected index for a set of maps, building it on first use."""
+    key = tuple(maps) if maps is not None else None
+    with _torah_lock:
+        if key not in table.projected_indexes:
+            table.projected_indexes[key] = ProjectedIndex(table.encoded, maps)
+        return table.projected_indexes[key]
+
+class SignatureIndex:
+    """Distinct letter n-grams of the vocabulary, keyed by map class signatures.
+
+    Every run of 1 to ``max_length`` letters inside a vocabulary word is an
+    n-gram; ``grams[n]`` holds the corpus codes of the distinct n-grams of
+    length ``n`` and their postings are the ``(word_ids, offsets)`` entries
+    ``entries[n][bounds[n][g]:bounds[n][g + 1]]``. A single-word phrase can
+    only occur inside a word, so its matches are the postings of the n-grams
+    its letter classes allow, found without touching the text.
+
+    A signature replaces each letter by its class id under a set of maps
+    (see map_class_ids); every n-gram a phrase can match shares the
+    phrase's signature, so one dictionary lookup narrows the n-grams to
+    verify. With all maps every letter is in one class and the lookup only
+    selects by length.
+    """
+
+    def __init__(self, grams, bounds, word_ids, offsets):
+        self.grams = grams
+        self.bounds = bounds
+        self.word_ids = word_ids
+        self.offsets = offsets
+        self.max_length = max(grams, default=0)
+        self._signatures = {}
+
+    @classmethod
+    def build(cls, table, max_length):
+        """Collect the n-grams of a table's word index vocabulary."""
+        char_codes = table.encoded.char_codes
+        postings = defaultdict(lambda: defaultdict(list))
+        for word_id, word in enumerate(table.word_index.vocabulary):
+            for length in range(1, min(len(word), max_length) + 1):
+                by_gram = postings[length]
+                for offset in range(len(word) - length + 1):
+                    by_gram[word[offset:offset + length]].append((word_id, offset))
+
+        grams, bounds, word_ids, offsets = {}, {}, {}, {}
+        for length, by_gram in postings.items():
+            entries = list(by_gram.values())
+            grams[length] = np.array([[char_codes[ch] for ch in gram] for gram in by_gram], dtype=np.uint8)
+            bounds[length] = np.concatenate([[0], np.cumsum([len(entry) for entry in entries])]).astype(np.int64)
+            flat = np.array([pair for entry in entries for pair in entry], dtype=np.int64)
+            word_ids[length], offsets[length] = flat[:, 0], flat[:, 1]
+        return cls(grams, bounds, word_ids, offsets)
+
+    def signatures(self, alphabet, maps):
+        """Return ``(class_map, {length: {signature: gram ids}})`` for a set of maps, building it on first use."""
+        key = tuple(maps) if maps is not None else None
+        with _torah_lock:
+            if key not in self._signatures:
+                class_map = map_class_ids(alphabet, maps)
+                class_ids = np.zeros(len(alphabet), dtype=np.uint8)
+                for code, ch in enumerate(alphabet[1:], start=1):
+                    class_ids[code] = class_map[ch]
+                by_length = {}
+                for length, grams in self.grams.items():
+                    keys = class_ids[grams].view(np.dtype((np.void, length))).ravel()
+                    unique_keys, inverse = np.unique(keys, return_inverse=True)
+                    order = np.argsort(inverse.ravel(), kind='stable')
+                    splits = np.cumsum(np.bincount(inverse.ravel(), minlength=len(unique_keys)))[:-1]
+                    by_length[length] = {
+                        unique_key.tobytes(): gram_ids
+                        for unique_key, gram_ids in zip(unique_keys, np.split(order, splits))
+                    }
+                self._signatures[key] = class_map, by_length
+            return self._signatures[key]
+
+    def find(self, table, input_phrase, letter_options, maps=None):
+        """Return the sorted text offsets where a single-word phrase matches."""
+        length = len(input_phrase)
+        class_map, by_length = self.signatures(table.encoded.alphabet, maps)
+        if length not in by_length or any(ch not in class_map for ch in input_phrase):
+            return np.zeros(0, dtype=np.int64)
+
+        signature = bytes(class_map[ch] for ch in input_phrase)
+        gram_ids = by_length[length].get(signature)
+        if gram_ids is None:
+            return np.zeros(0, dtype=np.int64)
+
+        # Maps without symmetric conversions make signatures a superset, so verify per letter
+        grams = self.grams[length]
+        for j, options in enumerate(letter_options):
+            allowed = np.zeros(len(table.encoded.alphabet), dtype=bool)
+            allowed[table.encoded.allowed_codes(options)] = True
+            gram_ids = gram_ids[allowed[grams[gram_ids, j]]]
+
+        # Expand the postings of the matching n-grams, then of their words
+        bounds = self.bounds[length]
+        entries = expand_ranges(bounds[gram_ids], bounds[gram_ids + 1])
+        word_ids, offsets = self.word_ids[length][entries], self.offsets[length][entries]
+        word_index = table.word_index
+        first, last = word_index.bounds[word_ids], word_index.bounds[word_ids + 1]
+        tokens = word_index.postings[expand_ranges(first, last)]
+        return np.sort(word_index.token_starts[tokens] + np.repeat(offsets, last - first))
+
+def expand_ranges(starts, ends):
+    """Concatenate ``range(start, end)`` for every pair of bounds, vectorized."""
+    lengths = ends - starts
+    total = int(lengths.sum())
+    if not total:
+        return np.zeros(0, dtype=np.int64)
+    shifts = np.repeat(starts - np.concatenate([[0], np.cumsum(lengths)[:-1]]), lengths)
+    return np.arange(total, dtype=np.int64) + shifts
+
+def load_signature_index(table):
+    """Map a table's signature index from the index directory, building and saving it if needed.
+
+    The index is stored in the corpus file format, so workers share its
+    pages instead of each loading a copy.
+    """
+    max_length = app.config['SIGNATURE_MAX_LENGTH']
+    path = os.path.join(app.config['INDEX_DIR'], f'signatures-{table.encoded.digest}-{max_length}.bin')
+
+    try:
+        meta, sections = read_corpus_file(path)
+        lengths = meta['lengths']
+        return SignatureIndex(
+            {length: np.asarray(sections[f'grams{length}']).reshape(-1, length) for length in lengths},
+            *({length: np.asarray(sections[f'{name}{length}']) for length in lengths}
+              for name in ('bounds', 'word_ids', 'offsets'))
+        )
+    except (OSError, ValueError, KeyError):
+        pass
+
+    start_time = time.time()
+    index = SignatureIndex.build(table, max_length)
+    logger.info(f"Built signature index over {sum(len(grams) for grams in index.grams.values())} n-grams "
+                f"in {time.time() - start_time:.2f}s")
+    sections = {}
+    for length in index.grams:
+        sections[f'grams{length}'] = ('B', np.ascontiguousarray(index.grams[length]))
+        for name in ('bounds', 'word_ids', 'offsets'):
+            sections[f'{name}{length}'] = ('q', np.ascontiguousarray(getattr(index, name)[length], dtype=np.int64))
+    try:
+        write_corpus_file(path, {'lengths': sorted(index.grams)}, sections)
+    except OSError as e:
+        logger.warning(f"Could not persist signature index to {path}: {e}")
+    return index
+
+class LetterSequence:
+    """The encoded corpus reduced to its Hebrew letters, for skip searches.
+
+    Spaces, punctuation and verse separators are dropped, so equidistant
+    letter sequences run across word and verse boundaries. ``codes[k]`` is
+    the corpus code of letter ``k`` and ``offsets[k]`` its offset in the
+    verse table text.
+    """
+
+    def __init__(self, encoded):
+        is_letter = np.array(['\u05d0' <= ch <= '\u05ea' for ch in encoded.alphabet], dtype=bool)
+        self.offsets = np.flatnonzero(is_letter[encoded.codes])
+        self.codes = encoded.codes[self.offsets]
+
+    def __len__(self):
+        return len(self.codes)
+
+def get_letter_sequence(table):
+    """Return the letters-only sequence of a table, building it on first use."""
     with _torah_lock:
-        if _torah_lines is None:
+        if table.letters is None:
+            table.letters = LetterSequence(table.encoded)
+        return table.letters
+
+class VerseColumns:
+    """The encoded verses laid out column by column, longest verse first.
+
+    ``columns[j, r]`` is the code of character ``j`` of verse ``order[r]``
+    (0 past its end) and only the first ``active[j]`` verses reach column
+    ``j``, so a scan stepping through every verse in lockstep touches each
+    character once. The arrays may be memoryviews into a mapped corpus file.
+    """
+
+    def __init__(self, order, lengths, active, columns):
+        self.order = np.asarray(order, dtype=np.int64)
+        self.lengths = np.asarray(lengths, dtype=np.int64)
+        self.active = np.asarray(active, dtype=np.int64)
+        self.columns = np.asarray(columns, dtype=np.uint8).reshape(len(self.active), len(self.order))
+
+    @classmethod
+    def build(cls, encoded):
+        """Lay out the verses of an encoded corpus."""
+        starts = encoded.starts
+        lengths = starts[1:] - starts[:-1] - 1
+        order = np.argsort(-lengths, kind='stable')
+        lengths = lengths[order]
+        active = np.searchsorted(-lengths, -np.arange(lengths[0] if len(lengths) else 0), side='left')
+        columns = np.zeros((len(active), len(lengths)), dtype=np.uint8)
+        verse_starts = starts[order]
+        for j, count in enumerate(active.tolist()):
+            columns[j, :count] = encoded.codes[verse_starts[:count] + j]
+        return cls(order, lengths, active, columns)
+
+def get_verse_columns(table):
+    """Return the column layout of a table's verses, building it on first use."""
+    with _torah_lock:
+        if table.verse_columns is None:
+            table.verse_columns = VerseColumns.build(table.encoded)
+        return table.verse_columns
+
+class WordIndex:
+    """Inverted index from words to their occurrences in the verse table.
+
+    Tokens are maximal runs of Hebrew letters. ``token_starts[t]`` is the
+    text offset of token ``t``, ``token_word_ids[t]`` its id in
+    ``vocabulary`` and ``token_verse_ids[t]`` its verse; the postings of a
+    word are the token indexes ``postings[bounds[w]:bounds[w + 1]]`` and
+    ``word_lengths[w]`` is its letter count. Every form left after
+    stripping leading ignored_prefixes letters (at least two letters must
+    remain) is a stem ``(stem_word_ids[s], stem_prefix_lengths[s])``, so
+    prefixed forms are found without scanning the text.
+
+    The arrays may be memoryviews into a mapped corpus file; only the
+    vocabulary is held per process.
+    """
+
+    ARRAYS = (('token_starts', 'q'), ('token_word_ids', 'I'), ('token_verse_ids', 'q'), ('postings', 'q'),
+              ('bounds', 'q'), ('word_lengths', 'I'), ('stem_word_ids', 'I'), ('stem_prefix_lengths', 'I'))
+
+    def __init__(self, vocabulary, token_starts, token_word_ids, token_verse_ids, postings, bounds,
+                 word_lengths, stem_word_ids, stem_prefix_lengths):
+        self.vocabulary = vocabulary
+        self.token_starts = np.asarray(token_starts, dtype=np.int64)
+        self.token_word_ids = np.asarray(token_word_ids, dtype=np.uint32)
+        self.token_verse_ids = np.asarray(token_verse_ids, dtype=np.int64)
+        self.postings = np.asarray(postings, dtype=np.int64)
+        self.bounds = np.asarray(bounds, dtype=np.int64)
+        self.word_lengths = np.asarray(word_lengths, dtype=np.uint32)
+        self.stem_word_ids = np.asarray(stem_word_ids, dtype=np.uint32)
+        self.stem_prefix_lengths = np.asarray(stem_prefix_lengths, dtype=np.uint32)
+        self.stem_lengths = self.word_lengths[self.stem_word_ids] - self.stem_prefix_lengths
+
+    @classmethod
+    def build(cls, table):
+        """Tokenize a table's text."""
+        word_ids = {}
+        token_starts = array('q')
+        token_word_ids = array('I')
+        for match in WORD_RE.finditer(table.text):
+            token_starts.append(match.start())
+            token_word_ids.append(word_ids.setdefault(match.group(), len(word_ids)))
+
+        vocabulary = list(word_ids)
+        token_starts = np.frombuffer(token_starts, dtype=np.int64)
+        token_word_ids = np.frombuffer(token_word_ids, dtype=np.uint32)
+        token_verse_ids = np.searchsorted(table.encoded.starts, token_starts, side='right') - 1
+        postings = np.argsort(token_word_ids, kind='stable')
+        bounds = np.searchsorted(token_word_ids[postings], np.arange(len(vocabulary) + 1))
+
+        stem_word_ids, stem_prefix_lengths = array('I'), array('I')
+        for word_id, word in enumerate(vocabulary):
+            for prefix_length in range(1, len(word) - 1):
+                if word[prefix_length - 1] not in ignored_prefixes:
+                    break
+                stem_word_ids.append(word_id)
+                stem_prefix_lengths.append(prefix_length)
+        word_lengths = np.array([len(word) for word in vocabulary], dtype=np.uint32)
+        return cls(vocabulary, token_starts, token_word_ids, token_verse_ids, postings, bounds,
+                   word_lengths, stem_word_ids, stem_prefix_lengths)
+
+    def matching_words(self, pattern, length):
+        """Return a mask over word ids of the words of ``length`` letters fully matching ``pattern``."""
+        mask = np.zeros(len(self.vocabulary), dtype=bool)
+        word_ids = [word_id for word_id in np.flatnonzero(self.word_lengths == length).tolist()
+                    if pattern.fullmatch(self.vocabulary[word_id])]
+        mask[word_ids] = True
+        return mask
+
+    def occurrences(self, word_ids, prefix_length=0):
+        """Return the token indexes of a set of words and the text offsets just past ``prefix_length`` letters."""
+        tokens = np.concatenate(
+            [self.postings[self.bounds[word_id]:self.bounds[word_id + 1]] for word_id in word_ids]
+            or [np.zeros(0, dtype=np.int64)]
+        )
+        return tokens, self.token_starts[tokens] + prefix_length
+
+    def find(self, word_patterns, prefixes=False):
+        """Find runs of consecutive whole words matching per-word patterns.
+
+        With ``prefixes`` the first word may also carry leading
+        ignored_prefixes letters. Returns the sorted text offsets where the
+        first word's match starts.
+        """
+        first_pattern, first_length = word_patterns[0]
+        tokens, offsets = self.occurrences(np.flatnonzero(self.matching_words(first_pattern, first_length)))
+        if prefixes:
+            by_prefix = defaultdict(list)
+            stems = np.flatnonzero(self.stem_lengths == first_length)
+            for word_id, prefix_length in zip(self.stem_word_ids[stems].tolist(),
+                                              self.stem_prefix_lengths[stems].tolist()):
+                if first_pattern.fullmatch(self.vocabulary[word_id], prefix_length):
+                    by_prefix[prefix_length].append(word_id)
+            for prefix_length, word_ids in by_prefix.items():
+                more_tokens, more_offsets = self.occurrences(word_ids, prefix_length)
+                tokens = np.concatenate([tokens, more_tokens])
+                offsets = np.concatenate([offsets, more_offsets])
+
+        # Every further word must be the next token of the same verse
+        for k, (pattern, length) in enumerate(word_patterns[1:], start=1):
+            keep = tokens + k < len(self.token_starts)
+            tokens, offsets = tokens[keep], offsets[keep]
+            following = tokens + k
+            keep = ((self.token_verse_ids[following] == self.token_verse_ids[tokens])
+                    & self.matching_words(pattern, length)[self.token_word_ids[following]])
+            tokens, offsets = tokens[keep], offsets[keep]
+        return np.sort(offsets)
+
+class GematriaIndex:
+    """Prefix sums of letter and word values for equal-value span queries.
+
+    ``letter_prefix[k]`` is the total value of the first ``k`` letters of the
+    letters-only sequence, so the value of any letter span is one
+    subtraction; ``word_sums[n]`` maps the value of every run of ``n``
+    consecutive words within a verse to the token indexes starting it.
+    Letter values are at least 1, so prefix sums are strictly increasing.
+    """
+
+    def __init__(self, table, max_words):
+        encoded = table.encoded
+        letters = get_letter_sequence(table)
+        code_values = np.array([gematria_value(ch) for ch in encoded.alphabet], dtype=np.int64)
+        self.letter_prefix = np.concatenate([[0], np.cumsum(code_values[letters.codes])])
+        self.letter_verse_ids = np.searchsorted(encoded.starts, letters.offsets, side='right') - 1
+        self.longest_verse = int(np.bincount(self.letter_verse_ids).max()) if len(letters) else 0
+
+        word_index = table.word_index
+        word_values = np.array([gematria_value(word) for word in word_index.vocabulary], dtype=np.int64)
+        token_prefix = np.concatenate([[0], np.cumsum(word_values[word_index.token_word_ids])])
+        token_count = len(word_index.token_starts)
+        self.word_sums = {}
+        for n in range(1, max_words + 1):
+            count = max(token_count - n + 1, 0)
+            sums = token_prefix[n:n + count] - token_prefix[:count]
+            starts = np.flatnonzero(word_index.token_verse_ids[n - 1:] == word_index.token_verse_ids[:count])
+            order = np.argsort(sums[starts], kind='stable')
+            starts, values = starts[order], sums[starts][order]
+            keys, first = np.unique(values, return_index=True)
+            self.word_sums[n] = dict(zip(keys.tolist(), np.split(starts, first[1:])))
+
+    def find_letter_spans(self, targets):
+        """Return ``(starts, lengths)`` of the single-verse letter spans whose value is in ``targets``.
+
+        One vectorized window-sum pass per span length, stopping once every
+        window of that length is worth more than the largest target.
+        """
+        prefix, verse_ids = self.letter_prefix, self.letter_verse_ids
+        letter_count = len(verse_ids)
+        starts, lengths = [], []
+        for length in range(1, min(self.longest_verse, letter_count) + 1):
+            sums = prefix[length:] - prefix[:letter_count - length + 1]
+            if sums.min() > targets[-1]:
+                break
+            found = np.flatnonzero(np.isin(sums, targets) & (verse_ids[length - 1:] == verse_ids[:len(sums)]))
+            starts.append(found)
+            lengths.append(np.full(len(found), length))
+        if not starts:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        starts, lengths = np.concatenate(starts), np.concatenate(lengths)
+        order = np.lexsort((lengths, starts))
+        return starts[order], lengths[order]
+
+    def find_word_runs(self, targets):
+        """Return ``(tokens, counts)`` of the runs of up to ``max_words`` words whose value is in ``targets``."""
+        tokens, counts = [], []
+        for n, sums in self.word_sums.items():
+            for value in targets.tolist():
+                found = sums.get(value)
+                if found is not None:
+                    tokens.append(found)
+                    counts.append(np.full(len(found), n))
+        if not tokens:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        tokens, counts = np.concatenate(tokens), np.concatenate(counts)
+        order = np.lexsort((counts, tokens))
+        return tokens[order], counts[order]
+
+def get_gematria_index(table):
+    """Return the gematria index of a table, building it on first use."""
+    with _torah_lock:
+        if table.gematria_index is None:
+            table.gematria_index = GematriaIndex(table, app.config['GEMATRIA_MAX_WORDS'])
+        return table.gematria_index
+
+def file_sha1(path):
+    """Return the SHA-1 hex digest of a file's contents."""
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def write_corpus(table, path, source_sha1):
+    """Write an encoded verse table, its word index and verse columns to a binary corpus file."""
+    encoded = table.encoded
+    word_index = table.word_index or WordIndex.build(table)
+    verse_columns = table.verse_columns or VerseColumns.build(encoded)
+    meta = {
+        'source_sha1': source_sha1,
+        'layout': CORPUS_LAYOUT,
+        'alphabet': encoded.alphabet,
+        'verse_labels': table.verse_labels,
+        'chapters': table.chapters,
+        'books': table.books,
+        'line_count': table.line_count,
+        'vocabulary': word_index.vocabulary
+    }
+    sections = {
+        'codes': ('B', encoded.codes),
+        'starts': ('q', encoded.starts),
+        'verse_ids': ('I', table.verse_ids),
+        'chapter_ids': ('I', table.chapter_ids),
+        'column_order': ('q', verse_columns.order),
+        'column_lengths': ('q', verse_columns.lengths),
+        'column_active': ('q', verse_columns.active),
+        'columns': ('B', np.ascontiguousarray(verse_columns.columns))
+    }
+    for name, fmt in WordIndex.ARRAYS:
+        sections[f'word_{name}'] = (fmt, np.ascontiguousarray(getattr(word_index, name)))
+    write_corpus_file(path, meta, sections)
+
+def read_corpus(path, source_sha1=None):
+    """Map a binary corpus file as a verse table, or return None if it was built from other text.
+
+    The letter codes, reference arrays, word index and verse columns stay in
+    the shared mapping; only the text used by the regex engines and the
+    word index vocabulary are decoded per process. Files written with an
+    older layout are treated as stale.
+    """
+    meta, sections = read_corpus_file(path)
+    if meta.get('layout') != CORPUS_LAYOUT:
+        return None
+    if source_sha1 is not None and meta['source_sha1'] != source_sha1:
+        return None
+    encoded = EncodedCorpus(meta['alphabet'], sections['codes'], sections['starts'])
+    table = VerseTable(
+        encoded.decode(), sections['starts'], sections['verse_ids'], meta['verse_labels'],
+        sections['chapter_ids'], [tuple(chapter) for chapter in meta['chapters']],
+        meta['books'], meta['line_count']
+    )
+    table.encoded = encoded
+    table.word_index = WordIndex(meta['vocabulary'], *(sections[f'word_{name}'] for name, _ in WordIndex.ARRAYS))
+    table.verse_columns = VerseColumns(
+        sections['column_order'], sections['column_lengths'], sections['column_active'], sections['columns']
+    )
+    return table
+
+def load_corpus(torah_path, corpus_path):
+    """Load the verse table from the corpus file, rebuilding the file if it is missing or stale."""
+    source_sha1 = file_sha1(torah_path)
+    try:
+        table = read_corpus(corpus_path, source_sha1)
+        if table is not None:
+            return table
+        logger.info(f"Corpus file {corpus_path} is stale, rebuilding")
+    except FileNotFoundError:
+        pass
+    except (OSError, ValueError, KeyError) as e:
+        logger.warning(f"Could not read corpus file {corpus_path}: {e}")
+
+    table = parse_torah_file(torah_path)
+    table.encoded = EncodedCorpus.from_table(table)
+    table.word_index = WordIndex.build(table)
+    try:
+        write_corpus(table, corpus_path, source_sha1)
+    except OSError as e:
+        logger.warning(f"Could not write corpus file to {corpus_path}: {e}")
+    return table
+
+def parse_corpora(spec, default_path):
+    """Parse a CORPORA spec into an ordered name -> path registry.
+
+    The default 'torah' corpus comes first unless the spec names it
+    elsewhere; relative paths are resolved against the application
+    directory.
+    """
+    corpora = {DEFAULT_CORPUS: default_path}
+    for entry in spec.split(','):
+        if not entry.strip():
+            continue
+        name, separator, path = entry.partition('=')
+        name, path = name.strip(), path.strip()
+        if not separator or not name or not path:
+            raise ValueError(f'Invalid CORPORA entry: {entry!r}')
+        corpora[name] = os.path.join(os.path.dirname(__file__), path)
+    return corpora
+
+def get_corpus_registry():
+    """Return the configured corpora, in search order."""
+    return parse_corpora(app.config['CORPORA'], app.config['TORAH_FILE'])
+
+def corpus_file_path(name):
+    """Return the binary corpus file of a registered corpus."""
+    if name == DEFAULT_CORPUS:
+        return app.config['CORPUS_FILE']
+    return os.path.join(app.config['INDEX_DIR'], f'corpus-{name}.bin')
+
+def load_verse_table(name=DEFAULT_CORPUS):
+    """Load the verse table of a registered corpus, parsing its text file on first use.
+
+    Every corpus is an independent shard with its own corpus file, suffix
+    array and word index.
+    """
+    with _torah_lock:
+        if name not in _verse_tables:
+            path = get_corpus_registry()[name]
             try:
-                with open(app.config['TORAH_FILE'], encoding="utf-8") as f:
-                    _torah_lines = f.readlines()
-                    _torah_text = ''.join(_torah_lines)
-                logger.info(f"Loaded Torah file with {len(_torah_lines)} lines")
+                with metrics.timer(STAGE_SECONDS, stage='corpus_load'):
+                    table = load_corpus(path, corpus_file_path(name))
+                    table.corpus = name
+                    table.suffix_index = load_suffix_index(table.encoded.codes, table.encoded.digest)
+                    table.signature_index = load_signature_index(table)
+                    if app.config['PRELOAD_MAP_INDEXES']:
+                        for map_name in MAP_NAMES:
+                            get_projected_index(table, (map_name,))
+                logger.info(f"Loaded corpus {name} with {table.line_count} lines ({len(table)} verses)")
             except FileNotFoundError:
-                logger.error(f"Torah file not found: {app.config['TORAH_FILE']}")
-                return [], ""
+                logger.error(f"Corpus file not found: {path}")
+                return None
+            _verse_tables[name] = table
+
+        return _verse_tables[name]
+
+def load_search_table(corpora=None):
+    """Return the table a query runs over: one corpus, or a ShardSet over several."""
+    if corpora is None:
+        return load_verse_table()
+    tables = [load_verse_table(name) for name in corpora]
+    if any(table is None for table in tables):
+        return None
+    return tables[0] if len(tables) == 1 else ShardSet(tables)
+
+def get_process_scanner(table):
+    """Return the process-pool scanner for a table, writing its scan buffer on first use."""
+    with _torah_lock:
+        encoded = table.encoded
+        if encoded.digest not in _process_scanners:
+            path = os.path.join(app.config['INDEX_DIR'], f'scan-{encoded.digest}.bin')
+            write_scan_buffer(path, encoded.codes, encoded.starts)
+            _process_scanners[encoded.digest] = ProcessScanner(
+                path, len(encoded.codes), len(encoded.starts),
+                app.config['SCAN_PROCESSES'] or os.cpu_count() or 1
+            )
+        return _process_scanners[encoded.digest]
+
+def build_automaton(variant_tuples):
+    """Build Aho-Corasick automaton for efficient pattern matching.
+
+    Only the variant lengths are stored; sources are resolved per hit with
+    make_source_resolver, which keeps the automaton compact enough to
+    serialize and load quickly.
+    """
+    automaton = ahocorasick.Automaton(ahocorasick.STORE_LENGTH)
+    for variant, _ in variant_tuples:
+        automaton.add_word(variant)
+    automaton.make_automaton()
+    return automaton
+
+def get_automaton(input_phrase, maps=None):
+    """Return the compiled automaton for a phrase from the matcher cache, building it on a miss."""
+    key = make_cache_key(matcher='aho', phrase=input_phrase,
+                         maps=list(maps) if maps is not None else None, mapping=MAPPING_DIGEST)
+    automaton, outcome, seconds_saved = matcher_cache.get(
+        key, lambda: build_automaton(generate_all_variants(input_phrase, maps))
+    )
+    metrics.inc('torah_search_matcher_lookups_total', outcome=outcome)
+    if seconds_saved:
+        metrics.inc('torah_search_matcher_seconds_saved_total', seconds_saved)
+    return automaton
+
+def compile_class_pattern(letter_options):
+    """Compile a phrase's per-letter options into a character-class pattern."""
+    classes = []
+    for options in letter_options:
+        letters = sorted({letter for letter, _ in options})
+        classes.append('[' + ''.join(re.escape(letter) for letter in letters) + ']')
+    return re.compile(''.join(classes))
+
+def make_source_resolver(letter_options):
+    """Return a function recovering the per-letter map sources of a variant.
+
+    The first option producing each letter wins, and results are memoized
+    per variant since popular variants recur across many verses.
+    """
+    first_sources = []
+    for options in letter_options:
+        sources = {}
+        for letter, source in options:
+            sources.setdefault(letter, source)
+        first_sources.append(sources)
+
+    resolved = {}
+
+    def resolve_sources(variant):
+        sources = resolved.get(variant)
+        if sources is None:
+            sources = resolved[variant] = tuple(
+                position[letter] for position, letter in zip(first_sources, variant)
+            )
+        return sources
+
+    return resolve_sources
+
+def compile_code_pattern(encoded, letter_options):
+    """Build a byte character-class pattern over corpus codes, or None if it cannot match."""
+    classes = []
+    for options in letter_options:
+        codes = encoded.allowed_codes(options)
+        if not codes:
+            return None
+        classes.append(b'[' + b''.join(re.escape(bytes([code])) for code in codes) + b']')
+    return b''.join(classes)
+
+def search_with_character_classes(table, input_phrase, execution='thread', start_pos=0, maps=None):
+    """Scan the corpus once with a per-letter character-class pattern.
+
+    Work grows with the number of hits rather than with the size of the
+    variant space; sources are only resolved for accepted hits. With
+    execution='process' the scan runs over the memory-mapped encoded corpus
+    in a process pool instead of the calling thread.
+    """
+    letter_options = get_letter_options(input_phrase, maps)
+    if execution == 'process':
+        encoded = table.encoded
+        pattern = compile_code_pattern(encoded, letter_options)
+        if pattern is None:
+            return []
+        phrase_codes = encoded.encode(input_phrase)
+        hits = get_process_scanner(table).scan(
+            pattern, phrase_codes.tobytes() if phrase_codes is not None else None
+        )
+        candidates = np.frombuffer(hits, dtype=np.int64)
+        candidates = candidates[candidates >= start_pos]
+        return accept_candidates(table, letter_options, input_phrase, candidates)
+
+    return list(iter_character_class_hits(table, input_phrase, start_pos, maps))
+
+def iter_character_class_hits(table, input_phrase, start_pos=0, maps=None):
+    """Yield character-class hits in corpus order as the scan finds them."""
+    letter_options = get_letter_options(input_phrase, maps)
+    pattern = compile_class_pattern(letter_options)
+    resolve_sources = make_source_resolver(letter_options)
+    text, starts = table.text, table.starts
+    verse_id = 0
+    pos = start_pos
+
+    while True:
+        match = pattern.search(text, pos)
+        if not match:
+            break
+
+        start = match.start()
+        variant = match.group()
+        if variant == input_phrase:
+            pos = start + 1
+            continue
+
+        # Keep the first accepted hit per verse, then skip to the next verse
+        verse_id = bisect_right(starts, start, verse_id) - 1
+        yield make_hit(table, resolve_sources, variant, verse_id, start)
+        pos = starts[verse_id + 1]
+
+def build_shift_and_masks(encoded, letter_options):
+    """Build the Shift-And mask table for a phrase.
+
+    Bit ``j % 64`` of ``masks[j // 64, code]`` is set when ``code`` may
+    appear at phrase position ``j``.
+    """
+    masks = np.zeros(((len(letter_options) + 63) // 64, len(encoded.alphabet)), dtype=np.uint64)
+    for j, options in enumerate(letter_options):
+        masks[j >> 6, encoded.allowed_codes(options)] |= np.uint64(1 << (j & 63))
+    return masks
+
+def search_with_bit_parallel(table, input_phrase, start_pos=0, maps=None):
+    """Vectorized Shift-And scan over the encoded corpus.
+
+    The first phrase position is tested against every corpus offset at once;
+    each further position only filters the surviving candidates, so a query
+    is a few array operations per letter instead of a per-character loop.
+    """
+    letter_options = get_letter_options(input_phrase, maps)
+    candidates = find_class_candidates(table.encoded, letter_options, start_pos)
+    return accept_candidates(table, letter_options, input_phrase, candidates)
+
+def find_class_candidates(encoded, letter_options, start_pos=0, end_pos=None):
+    """Return every corpus offset in ``[start_pos, end_pos)`` where the letter classes match, in order."""
+    codes = encoded.codes
+    masks = build_shift_and_masks(encoded, letter_options)
+    span = len(codes) - len(letter_options) + 1
+    if end_pos is not None:
+        span = min(span, end_pos)
+    if span <= start_pos:
+        return np.zeros(0, dtype=np.int64)
+
+    one = np.uint64(1)
+    candidates = np.flatnonzero(masks[0][codes[start_pos:span]] & one) + start_pos
+    for j in range(1, len(letter_options)):
+        if not len(candidates):
+            break
+        bits = masks[j >> 6][codes[candidates + j]] >> np.uint64(j & 63)
+        candidates = candidates[(bits & one).astype(bool)]
+    return candidates
+
+def verse_chunks(encoded):
+    """Yield ``(start, end)`` text offsets of consecutive runs of SCAN_CHUNK_VERSES verses."""
+    bounds = encoded.starts[:-1:SCAN_CHUNK_VERSES].tolist() + [len(encoded.codes)]
+    yield from zip(bounds, bounds[1:])
+
+def scan_class_candidates(encoded, letter_options, deadline=None):
+    """Find the class candidates of the whole corpus one verse chunk at a time.
+
+    Once ``deadline`` expires the scan stops between chunks, so the
+    candidates found cover whole verses from the start of the corpus.
+    """
+    parts = []
+    for start, end in verse_chunks(encoded):
+        if deadline is not None and deadline.expired():
+            break
+        parts.append(find_class_candidates(encoded, letter_options, start, end))
+    return np.concatenate(parts) if parts else np.zeros(0, dtype=np.int64)
+
+def find_candidates(table, input_phrase, letter_options, engine, maps=None, match='substring', deadline=None):
+    """Return the sorted offsets where an engine finds a phrase, before per-verse acceptance.
+
+    Scanning engines go through scan_class_candidates and stop at
+    ``deadline``; the index lookups always run to completion.
+    """
+    encoded = table.encoded
+    if engine == 'suffix':
+        allowed_codes = [encoded.allowed_codes(options) for options in letter_options]
+        found = table.suffix_index.search_classes(allowed_codes)
+        if not found:
+            return np.zeros(0, dtype=np.int64)
+        return np.sort(np.concatenate([positions for _, positions in found])).astype(np.int64)
+    if engine == 'projected':
+        index = get_projected_index(table, maps)
+        projected = index.project(input_phrase)
+        if projected is None:
+            return np.zeros(0, dtype=np.int64)
+        candidates = index.suffix_index.occurrences(projected).astype(np.int64)
+        return filter_candidates(encoded, letter_options, candidates)
+    if engine == 'signature':
+        return table.signature_index.find(table, input_phrase, letter_options, maps)
+    if engine == 'words' or match != 'substring':
+        return find_word_candidates(table, input_phrase, letter_options, prefixes=match == 'prefix')
+    return scan_class_candidates(encoded, letter_options, deadline)
+
+def build_multi_shift_and_masks(encoded, letter_options_list):
+    """Build a combined Shift-And table for up to 64 phrases.
+
+    Bit ``p`` of ``masks[j, code]`` is set when ``code`` may appear at
+    position ``j`` of phrase ``p``; positions past the end of a phrase
+    accept every code so its bit survives until the longest phrase is done.
+    """
+    length = max(len(letter_options) for letter_options in letter_options_list)
+    masks = np.zeros((length, len(encoded.alphabet)), dtype=np.uint64)
+    for phrase_id, letter_options in enumerate(letter_options_list):
+        bit = np.uint64(1 << phrase_id)
+        for j, options in enumerate(letter_options):
+            masks[j, encoded.allowed_codes(options)] |= bit
+        masks[len(letter_options):] |= bit
+    return masks
+
+def search_batch_bit_parallel(table, phrases, deadline=None):
+    """Search many phrases with one multi-pattern Shift-And pass per 64 phrases.
+
+    The phrase ID is the bit position in the combined state, so the corpus is
+    gathered once for all phrases and each further position only touches the
+    surviving candidates. Returns one hit list per phrase; once ``deadline``
+    expires the remaining verse chunks and phrases get no further hits. A
+    ShardSet is scanned shard by shard, with hits shifted as in
+    iter_shard_hits.
+    """
+    if isinstance(table, ShardSet):
+        results = [[] for _ in phrases]
+        for shard, verse_base, text_base in zip(table.tables, table.verse_bases, table.text_bases):
+            for hits, shard_hits in zip(results, search_batch_bit_parallel(shard, phrases, deadline)):
+                hits.extend((variant, source, verse_id + verse_base, start + text_base)
+                            for variant, source, verse_id, start in shard_hits)
+        return results
+    results = []
+    for chunk_start in range(0, len(phrases), 64):
+        with metrics.timer(STAGE_SECONDS, stage='scan_batch'):
+            results.extend(scan_multi_shift_and(table, phrases[chunk_start:chunk_start + 64], deadline))
+    return results
+
+def scan_multi_shift_and(table, chunk, deadline=None):
+    """Run one multi-pattern Shift-And pass for up to 64 phrases, one verse chunk at a time."""
+    encoded = table.encoded
+    letter_options_list = [get_letter_options(phrase) for phrase in chunk]
+    masks = build_multi_shift_and_masks(encoded, letter_options_list)
+    codes = np.concatenate([encoded.codes, np.zeros(len(masks), dtype=np.uint8)])
+    span = len(encoded.codes) - min(len(phrase) for phrase in chunk) + 1
+
+    parts = [[] for _ in chunk]
+    for start, end in verse_chunks(encoded):
+        end = min(end, span)
+        if end <= start or (deadline is not None and deadline.expired()):
+            break
+        state = masks[0][codes[start:end]]
+        offsets = np.flatnonzero(state)
+        candidates, state = offsets + start, state[offsets]
+        for j in range(1, len(masks)):
+            if not len(candidates):
+                break
+            state &= masks[j][codes[candidates + j]]
+            keep = state != 0
+            candidates, state = candidates[keep], state[keep]
+        for phrase_id in range(len(chunk)):
+            matched = ((state >> np.uint64(phrase_id)) & np.uint64(1)).astype(bool)
+            parts[phrase_id].append(candidates[matched])
+
+    return [
+        accept_candidates(table, letter_options, phrase,
+                          np.concatenate(found) if found else np.zeros(0, dtype=np.int64))
+        for phrase, letter_options, found in zip(chunk, letter_options_list, parts)
+    ]
+
+def search_with_suffix_array(table, input_phrase, start_pos=0, maps=None):
+    """Resolve a mapped phrase through the suffix array, one letter set at a time."""
+    letter_options = get_letter_options(input_phrase, maps)
+    candidates = find_candidates(table, input_phrase, letter_options, 'suffix', maps)
+    candidates = candidates[candidates >= start_pos]
+    return accept_candidates(table, letter_options, input_phrase, candidates)
+
+def search_with_projection(table, input_phrase, start_pos=0, maps=None):
+    """Look a phrase up in the projected index of the selected maps.
+
+    The projected phrase is found with one suffix array lookup; candidates
+    are then verified against the per-letter allowed sets.
+    """
+    letter_options = get_letter_options(input_phrase, maps)
+    candidates = find_candidates(table, input_phrase, letter_options, 'projected', maps)
+    candidates = candidates[candidates >= start_pos]
+    return accept_candidates(table, letter_options, input_phrase, candidates)
+
+def search_with_word_index(table, input_phrase, start_pos=0, maps=None, prefixes=False):
+    """Resolve a whole-word phrase through the word index.
+
+    Each word's character-class pattern is matched against the vocabulary
+    rather than the text, and the postings of the matching words give the
+    candidates. With ``prefixes`` the phrase may also follow leading
+    ignored_prefixes letters of its first word.
+    """
+    letter_options = get_letter_options(input_phrase, maps)
+    candidates = find_word_candidates(table, input_phrase, letter_options, prefixes)
+    candidates = candidates[candidates >= start_pos]
+    return accept_candidates(table, letter_options, input_phrase, candidates)
+
+def search_with_signatures(table, input_phrase, start_pos=0, maps=None):
+    """Resolve a single-word phrase through the n-gram signature index.
+
+    One signature lookup gives the n-grams of the vocabulary the phrase can
+    match; their verified postings are the candidates, so neither variants
+    nor the text are ever scanned.
+    """
+    letter_options = get_letter_options(input_phrase, maps)
+    candidates = find_candidates(table, input_phrase, letter_options, 'signature', maps)
+    candidates = candidates[candidates >= start_pos]
+    return accept_candidates(table, letter_options, input_phrase, candidates)
+
+def find_word_candidates(table, input_phrase, letter_options, prefixes=False):
+    """Return the sorted offsets where a phrase matches as whole words, verified letter by letter."""
+    word_patterns = []
+    position = 0
+    for word in input_phrase.split(' '):
+        word_patterns.append((compile_class_pattern(letter_options[position:position + len(word)]), len(word)))
+        position += len(word) + 1
+
+    candidates = table.word_index.find(word_patterns, prefixes)
+    return filter_candidates(table.encoded, letter_options, candidates)
+
+def filter_candidates(encoded, letter_options, candidates):
+    """Keep the candidate offsets whose letters are all allowed at their phrase positions."""
+    codes = encoded.codes
+    candidates = candidates[candidates + len(letter_options) <= len(codes)]
+    for j, options in enumerate(letter_options):
+        allowed = np.zeros(len(encoded.alphabet), dtype=bool)
+        allowed[encoded.allowed_codes(options)] = True
+        candidates = candidates[allowed[codes[candidates + j]]]
+    return candidates
+
+def accept_candidates(table, letter_options, input_phrase, candidates):
+    """Turn sorted candidate match offsets into hits.
+
+    Occurrences of the input phrase itself are dropped and only the first
+    remaining candidate of each verse is kept.
+    """
+    candidates, verse_ids = first_per_verse(table.encoded, input_phrase, candidates)
+    text = table.text
+    length = len(input_phrase)
+    resolve_sources = make_source_resolver(letter_options)
+    return [
+        make_hit(table, resolve_sources, text[start:start + length], verse_id, start)
+        for start, verse_id in zip(candidates.tolist(), verse_ids.tolist())
+    ]
+
+def first_per_verse(encoded, input_phrase, candidates):
+    """Drop occurrences of the input phrase and keep the first candidate of each verse.
+
+    Returns the kept offsets and their verse ids, both in corpus order.
+    """
+    codes = encoded.codes
+    phrase_codes = encoded.encode(input_phrase)
+    if phrase_codes is not None and len(candidates):
+        original = np.ones(len(candidates), dtype=bool)
+        for j, code in enumerate(phrase_codes):
+            original &= codes[candidates + j] == code
+        candidates = candidates[~original]
+
+    verse_ids = np.searchsorted(encoded.starts, candidates, side='right') - 1
+    verse_ids, first = np.unique(verse_ids, return_index=True)
+    return candidates[first], verse_ids
+
+def group_code_windows(encoded, candidates, length):
+    """Group match offsets by the codes they cover.
+
+    Returns ``(first, variant_ids, counts)`` with distinct windows ordered
+    by their codes: the offset index of each window's first match, the
+    window of every match and the matches per window.
+    """
+    windows = np.ascontiguousarray(encoded.codes[candidates[:, None] + np.arange(length)])
+    keys = windows.view(np.dtype((np.void, length))).ravel()
+    _, first, inverse, counts = np.unique(keys, return_index=True, return_inverse=True, return_counts=True)
+    return first, inverse.ravel(), counts
+
+def make_hit(table, resolve_sources, variant, verse_id, start):
+    """Build a (variant, source, verse_id, start) hit for an accepted match.
+
+    ``start`` is the match offset in the verse table text, so hits sort by
+    (book, chapter, verse, offset) simply by comparing it. No verse text is
+    copied until a location is built.
+    """
+    return variant, resolve_sources(variant), verse_id, start
+
+def make_reference(table, verse_id):
+    """Build the book/chapter/verse dict of a verse."""
+    book, chapter, verse_num = table.reference(verse_id)
+    return {'book': book, 'chapter': chapter, 'verse': verse_num}
+
+def make_location(table, verse_id, start, length):
+    """Build the location dict reported for a hit, with the match marked at its offset."""
+    location = make_reference(table, verse_id)
+    location['text'] = mark_span(table, verse_id, start, length)
+    return location
+
+def mark_span(table, verse_id, start, length):
+    """Return the text of a verse with the span at text offset ``start`` in brackets."""
+    clean_verse = table.verse_text(verse_id)
+    offset = start - table.starts[verse_id]
+    return f'{clean_verse[:offset]}[{clean_verse[offset:offset + length]}]{clean_verse[offset + length:]}'
+
+def group_matches(table, hits):
+    """Group (variant, source, verse_id, start) hits by variant and source."""
+    grouped_matches = defaultdict(list)
+    for variant, source, verse_id, start in hits:
+        grouped_matches[(variant, source)].append(make_location(table, verse_id, start, len(variant)))
+    return grouped_matches
+
+def group_offsets(table, hits):
+    """Group hits by variant and source as compact ``[verse_id, offset]`` pairs.
+
+    ``offset`` is the match start within the verse text, so clients can
+    highlight it in text fetched from /api/verses.
+    """
+    grouped_matches = defaultdict(list)
+    for variant, source, verse_id, start in hits:
+        grouped_matches[(variant, source)].append([verse_id, start - table.starts[verse_id]])
+    return grouped_matches
+
+def search_in_batch(table, verse_range, automaton, phrase_length, input_phrase, start_pos=0,
+                    resolve_sources=None, deadline=None):
+    """Search for patterns in a range of verses, stopping early once ``deadline`` expires."""
+    if resolve_sources is None:
+        resolve_sources = make_source_resolver(get_letter_options(input_phrase))
+    with metrics.timer(STAGE_SECONDS, stage='scan_batch'):
+        return scan_verse_range(table, verse_range, automaton, phrase_length, input_phrase,
+                                start_pos, resolve_sources, deadline)
+
+def scan_verse_range(table, verse_range, automaton, phrase_length, input_phrase, start_pos,
+                     resolve_sources, deadline=None):
+    results = []
+
+    for i in verse_range:
+        if deadline is not None and i % 64 == 0 and deadline.expired():
+            break
+
+        clean_verse = table.verse_text(i)
+
+        if len(clean_verse) < phrase_length:
+            continue
+
+        # Search for patterns
+        for end_index, length in automaton.iter(clean_verse):
+            start_index = end_index - length + 1
+            variant = clean_verse[start_index:end_index + 1]
+
+            if variant != input_phrase:
+                start = table.starts[i] + start_index
+                if start < start_pos:
+                    continue
+                results.append(make_hit(table, resolve_sources, variant, i, start))
+                break
+
+    return results
+
+def iter_reference_parallel(automaton, table, phrase_length, input_phrase, start_pos=0, maps=None, deadline=None):
+    """Yield automaton hits in corpus order, one thread batch at a time.
+
+    Once ``deadline`` expires every batch stops early, so only the batches
+    up to the first interrupted one are yielded and the hits stay a prefix
+    of the full result in corpus order.
+    """
+    resolve_sources = make_source_resolver(get_letter_options(input_phrase, maps))
+    first_verse = bisect_right(table.starts, start_pos) - 1
+    num_workers = min(app.config['MAX_WORKERS'], os.cpu_count() or 4)
+    batch_size = (len(table) - first_verse) // num_workers + 1
+    batches = [
+        range(i, min(i + batch_size, len(table)))
+        for i in range(first_verse, len(table), batch_size)
+    ]
+
+    with ThreadPoolExecutor(max_workers=num_workers) as executor:
+        futures = [
+            executor.submit(search_in_batch, table, batch, automaton, phrase_length, input_phrase,
+                            start_pos, resolve_sources, deadline)
+            for batch in batches
+        ]
+        
+        try:
+            for future in futures:
+                try:
+                    batch_hits = future.result()
+                except Exception as e:
+                    logger.error(f"Error in search batch: {e}")
+                    continue
+                yield from batch_hits
+                if deadline is not None and deadline.reached:
+                    break
+        finally:
+            # Stop batches nobody will read, e.g. once a page is filled
+            for future in futures:
+                future.cancel()
+
+def iter_search_hits(table, input_phrase, engine, execution, start_pos=0, maps=None, deadline=None,
+                     match='substring', max_hits=None):
+    """Yield (variant, source, verse_id, start) hits from the selected engine.
+
+    Hits come in corpus order, i.e. by (book, chapter, verse, offset), starting
+    at offset ``start_pos`` of the verse table text. ``maps`` restricts the
+    conversions to the given map names. ``deadline`` lets the batched
+    Aho-Corasick scan stop between verses; other engines are cut between
+    hits by Deadline.limit. The 'words' engine always matches whole words,
+    with prefixed first words too if ``match`` is 'prefix'. A ShardSet fans out to its shards (see
+    iter_shard_hits), which stop after ``max_hits`` hits each.
+    """
+    if isinstance(table, ShardSet):
+        yield from iter_shard_hits(table, input_phrase, engine, execution, start_pos, maps, deadline, match,
+                                   max_hits)
+        return
+    if engine == 'aho':
+        # Generate variants and build automaton, or reuse a cached one
+        with metrics.timer(STAGE_SECONDS, stage='automaton_build'):
+            automaton = get_automaton(input_phrase, maps)
+        yield from iter_reference_parallel(
+            automaton, table, len(input_phrase.replace(' ', '')), input_phrase, start_pos, maps, deadline
+        )
+    elif engine == 'bitap':
+        yield from search_with_bit_parallel(table, input_phrase, start_pos, maps)
+    elif engine == 'suffix':
+        yield from search_with_suffix_array(table, input_phrase, start_pos, maps)
+    elif engine == 'projected':
+        yield from search_with_projection(table, input_phrase, start_pos, maps)
+    elif engine == 'words':
+        yield from search_with_word_index(table, input_phrase, start_pos, maps, prefixes=match == 'prefix')
+    elif engine == 'signature':
+        yield from search_with_signatures(table, input_phrase, start_pos, maps)
+    elif execution == 'process':
+        yield from search_with_character_classes(table, input_phrase, execution, start_pos, maps)
+    else:
+        yield from iter_character_class_hits(table, input_phrase, start_pos, maps)
+
+def build_allowed_masks(encoded, letter_options):
+    """Return one boolean mask over corpus codes per phrase position."""
+    masks = np.zeros((len(letter_options), len(encoded.alphabet)), dtype=bool)
+    for j, options in enumerate(letter_options):
+        masks[j, encoded.allowed_codes(options)] = True
+    return masks
+
+def scan_els_skips(letters, patterns, skips, max_hits, deadline=None):
+    """Run the strided comparisons for each skip, in ascending skip order.
+
+    ``patterns`` holds ``(sign, masks, anchors)`` triples, where ``anchors``
+    are the letter indexes allowed at the first position of ``masks``; a
+    backward pattern is the reversed phrase read forward. Returns
+    ``(found, hit_count, positions)``: at most ``max_hits`` match starts as
+    ``(skip, sign, starts)`` triples, the total number of hits and the
+    number of skip x start positions compared.
+    """
+    found = []
+    hit_count = kept = positions = 0
+    for skip in skips:
+        if deadline is not None and deadline.expired():
+            break
+        for sign, masks, anchors in patterns:
+            span = len(letters) - (len(masks) - 1) * skip
+            if span <= 0:
+                continue
+            positions += span
+            candidates = anchors[:np.searchsorted(anchors, span)]
+            for j in range(1, len(masks)):
+                if not len(candidates):
+                    break
+                candidates = candidates[masks[j][letters[candidates + j * skip]]]
+            hit_count += len(candidates)
+            if len(candidates) and kept < max_hits:
+                found.append((skip, sign, candidates[:max_hits - kept]))
+                kept += len(found[-1][2])
+    return found, hit_count, positions
+
+def search_els(table, input_phrase, min_skip, max_skip, direction='both', maps=None, deadline=None):
+    """Find a phrase and its mapped variants as equidistant letter sequences.
+
+    Every skip in ``[min_skip, max_skip]`` is tested over the letters-only
+    sequence with one vectorized gather per phrase letter, starting from the
+    precomputed offsets of the first letter's allowed set. Skips are dealt
+    round-robin to a thread pool so every worker gets a similar mix of short
+    and long skips. Unlike contiguous searches the unmapped phrase itself is
+    reported.
+
+    Returns ``(hits, hit_count, positions)``: at most ELS_MAX_HITS
+    ``(variant, sources, skip, letter_index, start_verse, end_verse)`` hits
+    ordered by skip, direction and position (backward hits have a negative
+    skip), the total number of hits and the skip x start positions compared.
+    Sequences never run from one shard of a ShardSet into the next; letter
+    indexes count the letters of the earlier shards first.
+    """
+    if isinstance(table, ShardSet):
+        hits, hit_count, positions, letter_base = [], 0, 0, 0
+        for shard, verse_base in zip(table.tables, table.verse_bases):
+            shard_hits, shard_count, shard_positions = search_els(shard, input_phrase, min_skip, max_skip,
+                                                                  direction, maps, deadline)
+            hits.extend((variant, sources, skip, letter_index + letter_base, start + verse_base, end + verse_base)
+                        for variant, sources, skip, letter_index, start, end in shard_hits)
+            hit_count += shard_count
+            positions += shard_positions
+            letter_base += len(get_letter_sequence(shard))
+        hits.sort(key=lambda hit: (abs(hit[2]), hit[2] < 0))
+        return hits[:app.config['ELS_MAX_HITS']], hit_count, positions
+    letters = get_letter_sequence(table)
+    encoded = table.encoded
+    phrase = input_phrase.replace(' ', '')
+    letter_options = get_letter_options(phrase, maps)
+    masks = build_allowed_masks(encoded, letter_options)
+    patterns = []
+    if direction in ('forward', 'both'):
+        patterns.append((1, masks, np.flatnonzero(masks[0][letters.codes])))
+    if direction in ('backward', 'both'):
+        reversed_masks = masks[::-1]
+        patterns.append((-1, reversed_masks, np.flatnonzero(reversed_masks[0][letters.codes])))
+
+    max_hits = app.config['ELS_MAX_HITS']
+    skips = list(range(min_skip, max_skip + 1))
+    num_workers = max(min(app.config['MAX_WORKERS'], os.cpu_count() or 4, len(skips)), 1)
+    with ThreadPoolExecutor(max_workers=num_workers) as executor:
+        futures = [
+            executor.submit(scan_els_skips, letters.codes, patterns, skips[i::num_workers], max_hits, deadline)
+            for i in range(num_workers)
+        ]
+        chunks = [future.result() for future in futures]
+
+    # Each worker kept its own first max_hits, which covers the global first max_hits
+    found = sorted((entry for chunk, _, _ in chunks for entry in chunk), key=lambda entry: (entry[0], -entry[1]))
+    hit_count = sum(count for _, count, _ in chunks)
+    positions = sum(scanned for _, _, scanned in chunks)
+
+    hits = []
+    resolve_sources = make_source_resolver(letter_options)
+    steps = np.arange(len(phrase))
+    for skip, sign, starts in found:
+        starts = starts[:max_hits - len(hits)]
+        if sign < 0:
+            # Backward hits were found as the reversed phrase; read them from their last letter
+            starts = starts + (len(phrase) - 1) * skip
+        indexes = starts[:, None] + sign * skip * steps
+        verse_ids = np.searchsorted(encoded.starts, letters.offsets[indexes[:, [0, -1]]], side='right') - 1
+        for start, row, (start_verse, end_verse) in zip(
+                starts.tolist(), letters.codes[indexes].tolist(), verse_ids.tolist()):
+            variant = ''.join(encoded.alphabet[code] for code in row)
+            hits.append((variant, resolve_sources(variant), sign * skip, start, start_verse, end_verse))
+        if len(hits) >= max_hits:
+            break
+    return hits, hit_count, positions
+
+def search_gematria(table, input_phrase, span='words', maps=None):
+    """Find corpus spans whose gematria value equals the phrase's.
+
+    With ``maps`` any value reachable through those maps' substitutions
+    counts. Returns ``(values, hits, hit_count)``: the target values with
+    their sources, at most GEMATRIA_MAX_HITS ``(variant, sources, value,
+    verse_id, start, length)`` hits in corpus order (``start`` and
+    ``length`` locate the span in the verse table text) and the total
+    number of hits. Spans never cross from one shard of a ShardSet into the
+    next.
+    """
+    if isinstance(table, ShardSet):
+        hits, hit_count = [], 0
+        for shard, verse_base, text_base in zip(table.tables, table.verse_bases, table.text_bases):
+            values, shard_hits, shard_count = search_gematria(shard, input_phrase, span, maps)
+            hits.extend((variant, sources, value, verse_id + verse_base, start + text_base, length)
+                        for variant, sources, value, verse_id, start, length in shard_hits)
+            hit_count += shard_count
+        return values, hits[:app.config['GEMATRIA_MAX_HITS']], hit_count
+    index = get_gematria_index(table)
+    values = gematria_targets(input_phrase.replace(' ', ''), maps)
+    targets = np.array(sorted(values), dtype=np.int64)
+    max_hits = app.config['GEMATRIA_MAX_HITS']
+    text = table.text
+
+    if span == 'letters':
+        letters = get_letter_sequence(table)
+        starts, lengths = index.find_letter_spans(targets)
+        span_values = index.letter_prefix[starts + lengths] - index.letter_prefix[starts]
+        first = letters.offsets[starts[:max_hits]]
+        last = letters.offsets[(starts + lengths - 1)[:max_hits]]
+        verse_ids = index.letter_verse_ids[starts[:max_hits]]
+        spans = zip(first.tolist(), (last + 1 - first).tolist(), verse_ids.tolist(), span_values.tolist())
+        hits = [
+            (''.join(WORD_RE.findall(text, start, start + length)), values[value], value, verse_id, start, length)
+            for start, length, verse_id, value in spans
+        ]
+        return values, hits, len(starts)
+
+    word_index = table.word_index
+    tokens, counts = index.find_word_runs(targets)
+    last_tokens = tokens[:max_hits] + counts[:max_hits] - 1
+    first = word_index.token_starts[tokens[:max_hits]]
+    last_lengths = np.array([len(word_index.vocabulary[word_id])
+                             for word_id in word_index.token_word_ids[last_tokens].tolist()], dtype=np.int64)
+    lengths = word_index.token_starts[last_tokens] + last_lengths - first
+    verse_ids = word_index.token_verse_ids[tokens[:max_hits]]
+    hits = []
+    for start, length, verse_id in zip(first.tolist(), lengths.tolist(), verse_ids.tolist()):
+        variant = text[start:start + length]
+        value = gematria_value(variant)
+        hits.append((variant, values[value], value, verse_id, start, length))
+    return values, hits, len(tokens)
+
+def scan_fuzzy(verse_columns, masks, length, max_distance, deadline=None):
+    """Run a Wu-Manber Shift-And scan with up to ``max_distance`` edits over every verse at once.
+
+    ``states[d]`` holds, per verse, bit ``i`` set when the first ``i + 1``
+    phrase positions match the text ending at the current column with at
+    most ``d`` insertions, deletions or substitutions. Returns per verse
+    (in ``verse_columns.order``) the smallest distance found, or
+    ``max_distance + 1``, and the end column of its first match.
+    """
+    count = len(verse_columns.order)
+    one = np.uint64(1)
+    last = np.uint64(1 << (length - 1))
+    states = [np.full(count, (1 << d) - 1, dtype=np.uint64) for d in range(max_distance + 1)]
+    best = np.full(count, max_distance + 1, dtype=np.int64)
+    ends = np.full(count, -1, dtype=np.int64)
+
+    for j, active in enumerate(verse_columns.active.tolist()):
+        if deadline is not None and j % 16 == 0 and deadline.expired():
+            break
+        allowed = masks[verse_columns.columns[j, :active]]
+        distance = np.full(active, max_distance + 1, dtype=np.int64)
+        previous_old = previous_new = None
+        for d in range(max_distance + 1):
+            old = states[d][:active].copy()
+            new = ((old << one) | one) & allowed
+            if d:
+                # Insertion, substitution and deletion from the state with one edit fewer
+                new |= previous_old | ((previous_old | previous_new) << one) | one
+            states[d][:active] = new
+            distance[((new & last) != 0) & (distance > d)] = d
+            previous_old, previous_new = old, new
+
+        improved = np.flatnonzero(distance < best[:active])
+        best[improved] = distance[improved]
+        ends[improved] = j
+    return best, ends
+
+def align_fuzzy_matches(encoded, masks, length, max_distance, ends, verse_starts):
+    """Return ``(distances, starts)`` of the best alignments of a phrase ending at the ``ends`` offsets.
+
+    Scan hits only give the end of a match, so the phrase is aligned
+    backwards over at most ``length + max_distance`` characters of its
+    verse with an edit-distance table filled for all hits at once. Ties
+    prefer the match length closest to the phrase length.
+    """
+    width = length + max_distance
+    offsets = ends[:, None] - np.arange(width)
+    available = ends - verse_starts + 1
+    bits = masks[encoded.codes[np.maximum(offsets, 0)]]
+
+    one = np.uint64(1)
+    row = np.tile(np.arange(width + 1, dtype=np.int64), (len(ends), 1))
+    for i in range(1, length + 1):
+        cost = ((bits >> np.uint64(length - i)) & one) == 0
+        previous, row = row, np.empty_like(row)
+        row[:, 0] = i
+        for j in range(1, width + 1):
+            row[:, j] = np.minimum(np.minimum(previous[:, j], row[:, j - 1]) + 1, previous[:, j - 1] + cost[:, j - 1])
+
+    spans = np.arange(width + 1)
+    row[spans > available[:, None]] = length + max_distance + 1
+    matched = np.argmin(row * (width + 1) + np.abs(spans - length), axis=1)
+    return row[np.arange(len(ends)), matched], ends + 1 - matched
+
+def search_fuzzy(table, input_phrase, max_distance=1, maps=None, deadline=None):
+    """Find the phrase and its mapped variants within ``max_distance`` edits.
+
+    Each phrase position accepts the letters of its mapped letter class, as
+    in the exact engines, and an edit inserts, deletes or substitutes one
+    letter. One bit-parallel scan runs over all verses in lockstep (see
+    scan_fuzzy); each verse then reports its closest match, the first one
+    on ties.
+
+    Returns ``(variant, distance, verse_id, start)`` hits in corpus order,
+    shard after shard for a ShardSet.
+    """
+    if isinstance(table, ShardSet):
+        return [
+            (variant, distance, verse_id + verse_base, start + text_base)
+            for shard, verse_base, text_base in zip(table.tables, table.verse_bases, table.text_bases)
+            for variant, distance, verse_id, start in search_fuzzy(shard, input_phrase, max_distance, maps,
+                                                                   deadline)
+        ]
+    encoded = table.encoded
+    letter_options = get_letter_options(input_phrase, maps)
+    masks = build_shift_and_masks(encoded, letter_options)[0]
+    verse_columns = get_verse_columns(table)
+    best, ends = scan_fuzzy(verse_columns, masks, len(letter_options), max_distance, deadline)
+
+    verse_ids = np.sort(verse_columns.order[best <= max_distance])
+    rows = np.argsort(verse_columns.order)[verse_ids]
+    verse_starts = encoded.starts[verse_ids]
+    ends = verse_starts + ends[rows]
+    distances, starts = align_fuzzy_matches(encoded, masks, len(letter_options), max_distance, ends, verse_starts)
+
+    text = table.text
+    return [
+        (text[start:end + 1], distance, verse_id, start)
+        for distance, verse_id, start, end in zip(
+            distances.tolist(), verse_ids.tolist(), starts.tolist(), ends.tolist()
+        )
+    ]
+
+class OccurrenceList:
+    """Every match of a phrase as parallel arrays in corpus order.
+
+    ``variants`` lists the distinct matched texts, most frequent first, and
+    hit ``i`` is variant ``variant_ids[i]`` at text offset ``starts[i]`` of
+    verse ``verse_ids[i]``. ``counts`` and ``verse_counts`` give the hits
+    and distinct verses per variant, so frequencies never need per-hit
+    objects.
+    """
+
+    def __init__(self, table, input_phrase, letter_options, candidates):
+        encoded = table.encoded
+        length = len(letter_options)
+        self.starts = candidates
+        self.verse_ids = np.searchsorted(encoded.starts, candidates, side='right') - 1
+
+        first, variant_ids, counts = group_code_windows(encoded, candidates, length)
+        order = np.lexsort((first, -counts))
+        rank = np.empty(len(order), dtype=np.int64)
+        rank[order] = np.arange(len(order))
+
+        self.variant_ids = rank[variant_ids]
+        self.counts = counts[order]
+        self.variants = [table.text[start:start + length] for start in candidates[first[order]].tolist()]
+        verse_pairs = np.unique(self.variant_ids * len(table) + self.verse_ids)
+        self.verse_counts = np.bincount(verse_pairs // len(table), minlength=len(order))
+
+        resolve_sources = make_source_resolver(letter_options)
+        self.sources = [resolve_sources(variant) for variant in self.variants]
+        self.original = self.variants.index(input_phrase) if input_phrase in self.variants else None
+        self.letter_options = letter_options
+
+    @classmethod
+    def combine(cls, parts, input_phrase):
+        """Merge ``(occurrences, verse_base, text_base)`` lists of consecutive shards into one.
+
+        Hits are shifted into the shard set's verse ids and offsets, and
+        variants are ranked over all shards as in a single list.
+        """
+        totals = {}
+        hit_base = 0
+        for occurrences, _, _ in parts:
+            variant_ids, first = np.unique(occurrences.variant_ids, return_index=True)
+            for variant_id, first_hit in zip(variant_ids.tolist(), first.tolist()):
+                total = totals.setdefault(occurrences.variants[variant_id],
+                                          [0, 0, hit_base + first_hit, occurrences.sources[variant_id]])
+                total[0] += int(occurrences.counts[variant_id])
+                total[1] += int(occurrences.verse_counts[variant_id])
+            hit_base += len(occurrences)
+
+        combined = cls.__new__(cls)
+        combined.variants = sorted(totals, key=lambda variant: (-totals[variant][0], totals[variant][2]))
+        rank = {variant: variant_id for variant_id, variant in enumerate(combined.variants)}
+        combined.counts = np.array([totals[variant][0] for variant in combined.variants], dtype=np.int64)
+        combined.verse_counts = np.array([totals[variant][1] for variant in combined.variants], dtype=np.int64)
+        combined.sources = [totals[variant][3] for variant in combined.variants]
+        combined.variant_ids = np.concatenate(
+            [np.array([rank[variant] for variant in occurrences.variants], dtype=np.int64)[occurrences.variant_ids]
+             for occurrences, _, _ in parts]
+        )
+        combined.starts = np.concatenate([occurrences.starts + text_base for occurrences, _, text_base in parts])
+        combined.verse_ids = np.concatenate(
+            [occurrences.verse_ids + verse_base for occurrences, verse_base, _ in parts]
+        )
+        combined.original = rank.get(input_phrase)
+        combined.letter_options = parts[0][0].letter_options
+        return combined
+
+    def __len__(self):
+        return len(self.starts)
+
+    def map_counts(self, map_names):
+        """Count the hits whose variant uses each map at one or more letters.
+
+        A map counts for a hit whenever its options can produce the letter at
+        some position, not only when it is the first source resolved for it,
+        so maps producing the same letter as the original are counted too.
+        """
+        totals = {}
+        for name in map_names:
+            letters = [{letter for letter, source in options if source == name} for options in self.letter_options]
+            totals[name] = sum(
+                count for variant, count in zip(self.variants, self.counts.tolist())
+                if any(letter in produced for letter, produced in zip(variant, letters))
+            )
+        return totals
+
+def search_occurrences(table, input_phrase, maps=None):
+    """Find every occurrence of a phrase and its mapped variants.
+
+    Unlike iter_search_hits this keeps overlapping matches, several matches
+    per verse and the phrase itself, collected by one Shift-And pass into
+    an OccurrenceList; the lists of the shards of a ShardSet are combined.
+    """
+    if isinstance(table, ShardSet):
+        return OccurrenceList.combine([
+            (search_occurrences(shard, input_phrase, maps), verse_base, text_base)
+            for shard, verse_base, text_base in zip(table.tables, table.verse_bases, table.text_bases)
+        ], input_phrase)
+    letter_options = get_letter_options(input_phrase, maps)
+    candidates = find_class_candidates(table.encoded, letter_options)
+    return OccurrenceList(table, input_phrase, letter_options, candidates)
+
+def summarize_hits(table, input_phrase, maps=None, match='substring', engine='bitap', deadline=None,
+                   max_hits=None):
+    """Count the hits iter_search_hits would yield by sources, book and chapter.
+
+    The hits are the same first-per-verse matches, but they stay arrays of
+    offsets and verse ids: distinct variants are counted with
+    group_code_windows and verses are binned by their integer chapter ids,
+    so no per-hit objects are built. Candidates come from ``engine`` (see
+    find_candidates); only the first ``max_hits`` hits are counted, and the
+    counts stop at the verse chunk or shard where ``deadline`` expires.
+
+    Returns ``(variant_counts, by_sources, by_book, by_chapter)``, dicts
+    keyed by variant, sources tuple, ``(corpus, book)`` and ``(corpus, book,
+    chapter)`` in corpus order, so same-named books of different shards
+    stay apart.
+    """
+    shards = table.tables if isinstance(table, ShardSet) else [table]
+    letter_options = get_letter_options(input_phrase, maps)
+    length = len(letter_options)
+    variant_counts = defaultdict(int)
+    by_book = defaultdict(int)
+    by_chapter = defaultdict(int)
+
+    for shard in shards:
+        if max_hits == 0 or (deadline is not None and deadline.expired()):
+            break
+        encoded = shard.encoded
+        candidates = find_candidates(shard, input_phrase, letter_options, engine, maps, match, deadline)
+        candidates, verse_ids = first_per_verse(encoded, input_phrase, candidates)
+        if max_hits is not None:
+            candidates, verse_ids = candidates[:max_hits], verse_ids[:max_hits]
+            max_hits -= len(candidates)
+        if not len(candidates):
+            continue
+
+        first, _, counts = group_code_windows(encoded, candidates, length)
+        for start, count in zip(candidates[first].tolist(), counts.tolist()):
+            variant_counts[shard.text[start:start + length]] += count
+
+        chapter_counts = np.bincount(np.asarray(shard.chapter_ids)[verse_ids], minlength=len(shard.chapters))
+        for chapter_id in np.flatnonzero(chapter_counts).tolist():
+            book_id, chapter = shard.chapters[chapter_id]
+            book = shard.books[book_id]
+            count = int(chapter_counts[chapter_id])
+            by_book[(shard.corpus, book)] += count
+            by_chapter[(shard.corpus, book, chapter)] += count
+
+    resolve_sources = make_source_resolver(letter_options)
+    by_sources = defaultdict(int)
+    for variant, count in variant_counts.items():
+        by_sources[resolve_sources(variant)] += count
+    return variant_counts, by_sources, by_book, by_chapter
+
+def iter_shard_hits(shards, input_phrase, engine, execution, start_pos=0, maps=None, deadline=None,
+                    match='substring', max_hits=None):
+    """Yield hits from every shard of a ShardSet, in shard order.
+
+    Shards are scanned in parallel, each collecting at most ``max_hits``
+    hits (enough for one page), and their hits are shifted into the shard
+    set's verse ids and offsets. Once ``deadline`` cuts a shard short the
+    later shards are dropped, so the hits stay a prefix of the full result.
+    """
+    jobs = [
+        (shard, table, max(start_pos - shards.text_bases[shard], 0))
+        for shard, table in enumerate(shards.tables)
+        if start_pos < shards.text_bases[shard + 1]
+    ]
+    if not jobs:
+        return
+
+    def collect(table, local_start):
+        hits = iter_search_hits(table, input_phrase, engine, execution, local_start, maps, deadline, match)
+        if deadline is not None:
+            hits = deadline.limit(hits)
+        try:
+            return list(itertools.islice(hits, max_hits))
+        finally:
+            hits.close()
+
+    with ThreadPoolExecutor(max_workers=min(len(jobs), app.config['MAX_WORKERS'])) as executor:
+        futures = [(shard, executor.submit(collect, table, local_start)) for shard, table, local_start in jobs]
+        try:
+            for shard, future in futures:
+                verse_base, text_base = shards.verse_bases[shard], shards.text_bases[shard]
+                for variant, source, verse_id, start in future.result():
+                    yield variant, source, verse_id + verse_base, start + text_base
+                if deadline is not None and deadline.reached:
+                    break
+        finally:
+            for _, future in futures:
+                future.cancel()
+
+def resume_position(table, hit):
+    """Return the scan offset just past a hit (hits are first-per-verse)."""
+    return table.starts[hit[2] + 1]
+
+def truncated_position(table, last_hit, start_pos):
+    """Return the scan offset a page cut short by its deadline resumes from.
+
+    That is just past the last hit on the page, or the page's own start if
+    the deadline expired before any hit, so the same offset is skipped again.
+    """
+    return resume_position(table, last_hit) if last_hit is not None else start_pos
+
+def encode_cursor(query_key, position):
+    """Encode an opaque pagination cursor for a query and scan offset."""
+    payload = json.dumps({'q': query_key[:12], 'p': int(position)}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('ascii')).decode('ascii').rstrip('=')
+
+class InvalidRequest(Exception):
+    """Raised for request options or cursors a search cannot run with."""
+
+def decode_cursor(cursor, query_key):
+    """Decode a pagination cursor, raising InvalidRequest if it does not belong to the query."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        position = int(payload['p'])
+    except (ValueError, TypeError, KeyError, UnicodeEncodeError):
+        raise InvalidRequest('Invalid cursor')
+    if payload.get('q') != query_key[:12] or position < 0:
+        raise InvalidRequest('Invalid cursor')
+    return position
+
+def collect_page(table, hits, limit, offset):
+    """Read one page of hits, stopping the scan as soon as it is filled.
+
+    Returns ``(page, next_position)``; ``next_position`` is None when the
+    scan is exhausted.
+    """
+    page = list(itertools.islice(hits, offset, offset + limit + 1))
+    hits.close()
+    if len(page) <= limit:
+        return page, None
+    page = page[:limit]
+    return page, resume_position(table, page[-1])
+
+def format_results(grouped_matches, limit=True, compact=False):
+    """Format grouped matches as result dicts, applying the result limits unless limit=False.
+
+    With ``compact`` the groups hold group_offsets pairs, reported as
+    ``matches`` with the shared match ``length`` instead of locations.
+    """
+    results = []
+    for (variant, sources), locations in grouped_matches.items():
+        if limit and len(results) >= app.config['MAX_RESULTS']:
+            break
         
-        return _torah_lines, _torah_text
+        locations = locations[:MAX_LOCATIONS] if limit else locations  # Limit locations per variant
+        if compact:
+            results.append({'variant': variant, 'sources': list(sources), 'length': len(variant),
+                            'matches': locations})
+        else:
+            results.append({'variant': variant, 'sources': list(sources), 'locations': locations})
+    return results
+
+def normalize_phrase(phrase):
+    """Normalize user input: trim and collapse runs of whitespace."""
+    return ' '.join(phrase.split())
+
+def resolve_search_options(engine, execution, maps, match='substring', phrase=None):
+    """Apply defaults to search options.
+
+    Returns ``(engine, execution, maps, error)``; maps are normalized to a
+    sorted tuple of map names, a single word ``phrase`` defaults to the
+    signature index, a single-map query to the projected index and
+    whole-word matches run on the word index.
+    """
+    if match not in MATCH_MODES:
+        return None, None, None, f'Unknown match mode: {match}'
+    if match != 'substring':
+        if engine not in (None, 'words'):
+            return None, None, None, f"match '{match}' requires the words engine"
+        engine = 'words'
+    elif engine == 'words':
+        return None, None, None, "the words engine requires match 'word' or 'prefix'"
+    elif phrase is not None and is_signature_phrase(phrase):
+        engine = engine or 'signature'
+    elif engine == 'signature':
+        return None, None, None, (f"the signature engine requires a single word of at most "
+                                  f"{app.config['SIGNATURE_MAX_LENGTH']} letters")
+    
+    if maps is not None:
+        if not maps:
+            return None, None, None, 'maps must not be empty'
+        unknown = [str(name) for name in maps if name not in MAP_NAMES]
+        if unknown:
+            return None, None, None, f"Unknown maps: {', '.join(unknown)}"
+        maps = tuple(sorted(set(maps), key=MAP_NAMES.index))
+        if engine is None and len(maps) == 1:
+            engine = 'projected'
+    
+    engine = engine or app.config['SEARCH_ENGINE']
+    execution = execution or app.config['EXECUTION_MODE']
+    if engine not in SEARCH_ENGINES:
+        return None, None, None, f'Unknown search engine: {engine}'
+    if execution not in EXECUTION_MODES:
+        return None, None, None, f'Unknown execution mode: {execution}'
+    return engine, execution, maps, None
+
+def is_signature_phrase(phrase):
+    """Whether the signature index can answer a phrase: one word of at most SIGNATURE_MAX_LENGTH letters."""
+    return WORD_RE.fullmatch(phrase) is not None and len(phrase) <= app.config['SIGNATURE_MAX_LENGTH']
+
+def resolve_corpora(corpora):
+    """Normalize selected corpus names to registry order.
+
+    Returns ``(corpora, error)``; selecting only the default corpus is the
+    same as selecting none.
+    """
+    if corpora is None:
+        return None, None
+    registry = list(get_corpus_registry())
+    unknown = [str(name) for name in corpora if name not in registry]
+    if not corpora or unknown:
+        return None, f"corpora must be a non-empty list of: {', '.join(registry)}"
+    corpora = tuple(sorted(set(corpora), key=registry.index))
+    return (None if corpora == (DEFAULT_CORPUS,) else corpora), None
+
+class Deadline:
+    """Cooperative time limit for one request.
+
+    Scans call ``expired()`` between units of work and stop cleanly once it
+    returns True; ``reached`` then records that the result is partial.
+    """
+
+    def __init__(self, seconds):
+        self.expires_at = time.monotonic() + seconds if seconds else None
+        self.reached = False
+
+    def expired(self):
+        if not self.reached and self.expires_at is not None and time.monotonic() >= self.expires_at:
+            self.reached = True
+        return self.reached
+
+    def limit(self, hits):
+        """Yield hits until the deadline expires."""
+        try:
+            for hit in hits:
+                yield hit
+                if self.expired():
+                    break
+        finally:
+            hits.close()
+
+def estimate_cost(table, input_phrase, maps=None):
+    """Estimate the cost of a query before running it.
+
+    The variant space is the product of the per-letter option counts, i.e.
+    what generate_all_variants would expand; ``estimated_ms`` applies the
+    cost model to every engine.
+    """
+    letter_options = get_letter_options(input_phrase, maps)
+    option_counts = [len(options) for options in letter_options]
+    variant_space = math.prod(option_counts)
+    distinct_variants = math.prod(len({letter for letter, _ in options}) for options in letter_options)
+    shards = table.tables if isinstance(table, ShardSet) else [table]
+    scan_ms = table.starts[len(table)] * SCAN_MS_PER_CHAR
+    vocabulary_size = sum(len(shard.word_index.vocabulary) for shard in shards)
+    estimated_ms = {
+        'class': scan_ms,
+        'bitap': scan_ms,
+        'suffix': SUFFIX_MS_PER_DIGIT * math.log10(max(distinct_variants, 1)),
+        'projected': scan_ms,
+        'aho': variant_space * VARIANT_MS + scan_ms,
+        'words': vocabulary_size * WORD_MS_PER_TERM * (input_phrase.count(' ') + 1)
+    }
+    if is_signature_phrase(input_phrase):
+        gram_count = sum(len(shard.signature_index.grams.get(len(input_phrase), ())) for shard in shards)
+        estimated_ms['signature'] = gram_count * SIGNATURE_MS_PER_GRAM
+    return {
+        'letter_options': option_counts,
+        'variant_space': variant_space,
+        'distinct_variants': distinct_variants,
+        'estimated_ms': {
+            engine: round(estimated_ms[engine], 1) for engine in SEARCH_ENGINES if engine in estimated_ms
+        }
+    }
+
+def plan_search(table, input_phrase, engine, maps=None, limit=None):
+    """Check a query against the cost budgets and decide how to run it.
+
+    Returns a plan dict with the ``engine`` and ``limit`` to use and an
+    ``action``: 'run' within budget, otherwise 'reject', 'reroute' (same
+    results from a cheaper engine) or 'downgrade' (first page only), as set
+    by COST_POLICY.
+    """
+    estimate = estimate_cost(table, input_phrase, maps)
+    plan = {'action': 'run', 'engine': engine, 'limit': limit, 'reason': None, 'estimate': estimate}
+    estimated_ms = estimate['estimated_ms']
+    
+    over_variants = engine == 'aho' and estimate['variant_space'] > app.config['MAX_VARIANT_SPACE']
+    if over_variants:
+        plan['reason'] = (f"variant space {estimate['variant_space']} exceeds "
+                          f"{app.config['MAX_VARIANT_SPACE']}")
+    elif estimated_ms[engine] > app.config['COST_BUDGET_MS']:
+        plan['reason'] = f"estimated {estimated_ms[engine]} ms exceeds {app.config['COST_BUDGET_MS']} ms"
+    else:
+        return plan
+    
+    policy = app.config['COST_POLICY']
+    if policy not in COST_POLICIES:
+        raise ValueError(f'Unknown cost policy: {policy}')
+    if policy == 'reject':
+        plan['action'] = 'reject'
+        return plan
+    
+    # Word matches have different semantics, so they are never rerouted to or from
+    cheapest = min((name for name in estimated_ms if name not in ('aho', 'words')),
+                   key=lambda name: estimated_ms[name])
+    if policy == 'reroute' and engine != 'words' and estimated_ms[cheapest] <= app.config['COST_BUDGET_MS']:
+        plan.update(action='reroute', engine=cheapest)
+    else:
+        # The automaton itself is the cost, so it cannot be downgraded in place
+        downgrade_limit = app.config['DOWNGRADE_LIMIT']
+        plan.update(action='downgrade', engine=cheapest if over_variants else engine,
+                    limit=min(limit or downgrade_limit, downgrade_limit))
+    return plan
 
-def build_automaton(variant_tuples):
-    """Build Aho-Corasick automaton for efficient pattern matching."""
-    automaton = ahocorasick.Automaton()
-    for variant, source in variant_tuples:
-        automaton.add_word(variant, (variant, source))
-    automaton.make_automaton()
-    return automaton
+def corpus_digest(table):
+    """Identify the loaded text of a table, one digest per shard.
 
-def search_in_batch(batch_lines, automaton, phrase_length, input_phrase, full_text):
-    """Search for patterns in a batch of lines."""
-    results = []
-    book = chapter = None
+    Cache keys include it, so results computed over a corpus file that has
+    since been replaced are never served.
+    """
+    shards = table.tables if isinstance(table, ShardSet) else [table]
+    return [shard.encoded.digest for shard in shards]
 
-    for line in batch_lines:
-        line = line.strip()
-        
-        # Check for book/chapter headers
-        match = re.match(r'^(\S+)\s+\u05e4\u05e8\u05e7-([\u05d0-\u05ea]+)$', line)
-        if match:
-            book, chapter = match.groups()
-            continue
+def make_query_key(table, input_phrase, engine, maps, match='substring', corpora=None):
+    """Build the cache key identifying a query's full result set over ``table``."""
+    options = {'phrase': input_phrase, 'engine': engine, 'corpus': corpus_digest(table)}
+    if maps is not None:
+        options['maps'] = list(maps)
+    if match != 'substring':
+        options['match'] = match
+    if corpora is not None:
+        options['corpora'] = list(corpora)
+    return make_cache_key(**options)
 
-        # Find verses
-        verses = re.findall(r'\{[^}]+\}[^{}]+', line)
-        for verse in verses:
-            verse_num_match = re.search(r'\{([^}]+)\}', verse)
-            verse_num = verse_num_match.group(1) if verse_num_match else "?"
-            clean_verse = re.sub(r'\{[^}]+\}', '', verse).strip()
+class ErrorResponse(dict):
+    """Error response of a search, answered with ``status`` instead of 200.
 
-            if len(clean_verse) < phrase_length:
-                continue
+    That is 400 for invalid options or cursors, 422 for queries rejected by
+    the cost budgets and 500 for failures of the server itself.
+    """
 
-            # Search for patterns
-            for end_index, (variant, source) in automaton.iter(clean_verse):
-                start_index = end_index - len(variant) + 1
-                matched_text = clean_verse[start_index:end_index + 1]
-                
-                if matched_text == variant and variant != input_phrase:
-                    if variant in full_text:
-                        marked_text = clean_verse.replace(variant, f'[{variant}]', 1)
-                        results.append((variant, tuple(source), book, chapter, verse_num, marked_text))
-                        break
-    
-    return results
+    def __init__(self, status, **fields):
+        super().__init__(fields)
+        self.status = status
 
-def search_with_reference_parallel(automaton, lines, phrase_length, input_phrase, full_text):
-    """Perform parallel search across Torah text."""
-    grouped_matches = defaultdict(list)
+def response_status(result):
+    """HTTP status to answer a search result or stream record with."""
+    return getattr(result, 'status', 200)
 
-    num_workers = min(app.config['MAX_WORKERS'], os.cpu_count() or 4)
-    batch_size = len(lines) // num_workers + 1
-    batches = [lines[i:i+batch_size] for i in range(0, len(lines), batch_size)]
+def plan_error(plan):
+    """Error response for a query rejected by the cost budgets."""
+    return ErrorResponse(422, error=f"Query too expensive: {plan['reason']}", success=False, results=[],
+                        estimate=plan['estimate'])
 
-    with ThreadPoolExecutor(max_workers=num_workers) as executor:
-        futures = [
-            executor.submit(search_in_batch, batch, automaton, phrase_length, input_phrase, full_text) 
-            for batch in batches
-        ]
-        
-        for future in futures:
-            try:
-                for variant, source, book, chapter, verse_num, marked_text in future.result():
-                    grouped_matches[(variant, source)].append({
-                        'book': book,
-                        'chapter': chapter, 
-                        'verse': verse_num,
-                        'text': marked_text
-                    })
-            except Exception as e:
-                logger.error(f"Error in search batch: {e}")
+def plan_summary(plan, requested_engine):
+    """Describe a non-trivial plan in a response."""
+    return {'action': plan['action'], 'reason': plan['reason'], 'requested_engine': requested_engine}
 
-    return grouped_matches
+def perform_search(input_phrase, engine=None, execution=None, limit=None, offset=0, cursor=None, maps=None,
+                   deadline=None, match='substring', corpora=None, format='full'):
+    """Main search function.
 
-def perform_search(input_phrase):
-    """Main search function."""
+    Without ``limit`` every hit is collected. With ``limit`` one page of at
+    most ``limit`` hits is returned in (book, chapter, verse, offset) order,
+    after skipping ``offset`` hits from the ``cursor`` position, and the scan
+    stops as soon as the page is filled.
+
+    The query is first checked against the cost budgets (see plan_search).
+    The scan stops at ``deadline`` seconds (capped at REQUEST_DEADLINE) and
+    the partial result is returned with ``truncated`` set. ``format``
+    'compact' reports verse ids and offsets instead of verse texts, and
+    'summary' only hit counts by sources, book and chapter (see
+    summarize_search). Invalid options or cursors and rejected queries are
+    returned as a ErrorResponse.
+    """
     try:
         start_time = time.time()
+        input_phrase = normalize_phrase(input_phrase)
+        engine, execution, maps, error = resolve_search_options(engine, execution, maps, match, input_phrase)
+        if not error:
+            corpora, error = resolve_corpora(corpora)
+        if error:
+            return ErrorResponse(400, error=error, success=False, results=[])
         
-        # Load Torah text
-        lines, full_text = load_torah_lines()
-        if not lines:
+        # Load Torah text, or the selected corpora as shards
+        table = load_search_table(corpora)
+        if not table:
             return {'error': 'Torah file not found or empty', 'results': []}
+        if format == 'summary':
+            return summarize_search(table, input_phrase, engine, maps, match, corpora, start_time, deadline)
         
-        # Generate variants and build automaton
-        variant_tuples = generate_all_variants(input_phrase)
-        automaton = build_automaton(variant_tuples)
+        requested_engine = engine
+        plan = plan_search(table, input_phrase, engine, maps, limit)
+        if plan['action'] == 'reject':
+            return plan_error(plan)
+        engine, limit = plan['engine'], plan['limit']
         
-        # Perform search
-        grouped_matches = search_with_reference_parallel(
-            automaton, lines, len(input_phrase.replace(' ', '')), input_phrase, full_text
+        query_key = make_query_key(table, input_phrase, engine, maps, match, corpora)
+        start_pos = decode_cursor(cursor, query_key) if cursor else 0
+        cache_key = query_key if limit is None else make_cache_key(
+            query=query_key, limit=limit, offset=offset, start=start_pos
         )
+        if format != 'full':
+            cache_key = make_cache_key(query=cache_key, format=format)
+        cached = result_cache.get(cache_key)
+        if cached is not None:
+            metrics.inc('torah_search_requests_total', endpoint='search', engine=engine, cached='true')
+            cached['search_time'] = round(time.time() - start_time, 3)
+            cached['cached'] = True
+            return cached
         
-        # Format results
-        results = []
-        for (variant, sources), locations in grouped_matches.items():
-            if len(results) >= app.config['MAX_RESULTS']:
-                break
-                
-            results.append({
-                'variant': variant,
-                'sources': list(sources),
-                'locations': locations[:100]  # Limit locations per variant
-            })
+        # Perform search
+        observe_variant_count(input_phrase, maps)
+        deadline = Deadline(min(deadline or app.config['REQUEST_DEADLINE'], app.config['REQUEST_DEADLINE']))
+        with metrics.timer(STAGE_SECONDS, stage='scan'):
+            hits = deadline.limit(iter_search_hits(table, input_phrase, engine, execution, start_pos, maps, deadline,
+                                                   match, offset + limit + 1 if limit is not None else None))
+            if limit is None:
+                page = list(hits)
+            else:
+                page, next_position = collect_page(table, hits, limit, offset)
+                if deadline.reached and next_position is None:
+                    next_position = truncated_position(table, page[-1] if page else None, start_pos)
+        metrics.observe('torah_search_matches', len(page))
+        if deadline.reached:
+            metrics.inc('torah_search_truncated_total', endpoint='search')
+        
+        with metrics.timer(STAGE_SECONDS, stage='formatting'):
+            if format == 'compact':
+                grouped_matches = group_offsets(table, page)
+            else:
+                grouped_matches = group_matches(table, page)
+            results = format_results(grouped_matches, limit=limit is None, compact=format == 'compact')
+        metrics.inc('torah_search_requests_total', endpoint='search', engine=engine, cached='false')
         
         search_time = time.time() - start_time
         
-        return {
+        response = {
             'input_phrase': input_phrase,
             'results': results,
             'total_variants': len(grouped_matches),
+            'engine': engine,
             'search_time': round(search_time, 3),
+            'truncated': deadline.reached,
             'success': True
         }
+        if maps is not None:
+            response['maps'] = list(maps)
+        if match != 'substring':
+            response['match'] = match
+        if corpora is not None:
+            response['corpora'] = list(corpora)
+        if format != 'full':
+            response['format'] = format
+        if plan['action'] != 'run':
+            response['plan'] = plan_summary(plan, requested_engine)
+        if limit is not None:
+            response.update({
+                'limit': limit,
+                'offset': offset,
+                'hit_count': len(page),
+                'has_more': next_position is not None,
+                'next_cursor': encode_cursor(query_key, next_position) if next_position is not None else None
+            })
+        # Partial results depend on timing, so they are never cached
+        if not deadline.reached:
+            result_cache.set(cache_key, response)
+        response['cached'] = False
+        return response
         
+    except InvalidRequest as e:
+        return ErrorResponse(400, error=str(e), success=False, results=[])
     except Exception as e:
         logger.error(f"Search error: {e}")
+        metrics.inc('torah_search_errors_total', endpoint='search')
+        return ErrorResponse(500, error='Internal server error', success=False, results=[])
+
+def summary_engine(engine):
+    """Engine a summary of a query for ``engine`` is counted with (see summarize_search)."""
+    return 'words' if engine == 'words' else 'bitap'
+
+def summarize_search(table, input_phrase, engine, maps, match, corpora, start_time, deadline=None):
+    """Build the 'summary' format response of perform_search (see summarize_hits).
+
+    Substring queries are counted with the Shift-And candidate scan and
+    whole-word queries with the word index, whatever engine was asked for,
+    since every engine finds the same hits. The cost budgets still apply: a
+    rejected query is refused, a rerouted one counts the candidates of the
+    cheaper engine and a downgraded one only the first DOWNGRADE_LIMIT hits.
+    Counting stops at ``deadline`` seconds with ``truncated`` set.
+    """
+    engine = requested_engine = summary_engine(engine)
+    plan = plan_search(table, input_phrase, engine, maps)
+    if plan['action'] == 'reject':
+        return plan_error(plan)
+    engine = plan['engine'] if plan['action'] == 'reroute' else engine
+    max_hits = plan['limit'] if plan['action'] == 'downgrade' else None
+    
+    query_key = make_query_key(table, input_phrase, engine, maps, match, corpora)
+    cache_key = make_cache_key(query=query_key, format='summary', max_hits=max_hits)
+    cached = result_cache.get(cache_key)
+    if cached is not None:
+        metrics.inc('torah_search_requests_total', endpoint='search', engine=engine, cached='true')
+        cached['search_time'] = round(time.time() - start_time, 3)
+        cached['cached'] = True
+        return cached
+    
+    deadline = Deadline(min(deadline or app.config['REQUEST_DEADLINE'], app.config['REQUEST_DEADLINE']))
+    with metrics.timer(STAGE_SECONDS, stage='scan'):
+        variant_counts, by_sources, by_book, by_chapter = summarize_hits(table, input_phrase, maps, match, engine,
+                                                                         deadline, max_hits)
+    total_hits = sum(variant_counts.values())
+    metrics.observe('torah_search_matches', total_hits)
+    if deadline.reached:
+        metrics.inc('torah_search_truncated_total', endpoint='search')
+    # Books and chapters of several corpora are reported per corpus
+    corpus_fields = (lambda corpus: {'corpus': corpus}) if corpora is not None else (lambda corpus: {})
+    metrics.inc('torah_search_requests_total', endpoint='search', engine=engine, cached='false')
+    
+    response = {
+        'input_phrase': input_phrase,
+        'format': 'summary',
+        'summary': {
+            'sources': [
+                {'sources': list(sources), 'count': count}
+                for sources, count in sorted(by_sources.items(), key=lambda item: -item[1])
+            ],
+            'books': [
+                {**corpus_fields(corpus), 'book': book, 'count': count}
+                for (corpus, book), count in by_book.items()
+            ],
+            'chapters': [
+                {**corpus_fields(corpus), 'book': book, 'chapter': chapter, 'count': count}
+                for (corpus, book, chapter), count in by_chapter.items()
+            ]
+        },
+        'total_variants': len(variant_counts),
+        'total_hits': total_hits,
+        'engine': engine,
+        'search_time': round(time.time() - start_time, 3),
+        'truncated': deadline.reached,
+        'success': True
+    }
+    if maps is not None:
+        response['maps'] = list(maps)
+    if match != 'substring':
+        response['match'] = match
+    if corpora is not None:
+        response['corpora'] = list(corpora)
+    if plan['action'] != 'run':
+        response['plan'] = plan_summary(plan, requested_engine)
+    if not deadline.reached:
+        result_cache.set(cache_key, response)
+    response['cached'] = False
+    return response
+
+def perform_batch_search(input_phrases, deadline=None, corpora=None):
+    """Search several phrases, sharing one corpus pass among those that need a scan.
+
+    Each phrase runs on the engine a single search would pick: phrases an
+    index answers (single words through the signature index) are looked up
+    one by one, and the rest share one multi-pattern Shift-And pass instead
+    of scanning the corpus once each. Every phrase is checked against the
+    cost budgets like perform_search, and the whole batch shares one
+    ``deadline``; phrases cut short by it are returned with ``truncated`` set.
+    ``corpora`` selects the shards searched for every phrase.
+    """
+    try:
+        start_time = time.time()
+        phrases = list(dict.fromkeys(normalize_phrase(phrase) for phrase in input_phrases))
+        corpora, error = resolve_corpora(corpora)
+        if error:
+            return ErrorResponse(400, error=error, success=False, results=[])
+        
+        table = load_search_table(corpora)
+        if not table:
+            return {'error': 'Torah file not found or empty', 'success': False, 'results': []}
+        
+        responses = {}
+        plans = {}
+        cache_keys = {}
+        for phrase in phrases:
+            engine = resolve_search_options(None, None, None, phrase=phrase)[0]
+            plan = plan_search(table, phrase, engine)
+            if plan['action'] == 'reject':
+                responses[phrase] = {'input_phrase': phrase, **plan_error(plan)}
+                continue
+            # Scanning engines all share the batch pass
+            plan['engine'] = 'bitap' if plan['engine'] in SCAN_ENGINES else plan['engine']
+            plan['requested_engine'] = engine
+            cache_keys[phrase] = make_cache_key(
+                query=make_query_key(table, phrase, plan['engine'], None, corpora=corpora), limit=plan['limit']
+            )
+            cached = result_cache.get(cache_keys[phrase])
+            if cached is not None:
+                metrics.inc('torah_search_requests_total', endpoint='batch', engine=plan['engine'], cached='true')
+                cached['cached'] = True
+                responses[phrase] = cached
+            else:
+                plans[phrase] = plan
+        
+        if plans:
+            for phrase in plans:
+                observe_variant_count(phrase)
+            deadline = Deadline(min(deadline or app.config['REQUEST_DEADLINE'], app.config['REQUEST_DEADLINE']))
+            scanned = [phrase for phrase, plan in plans.items() if plan['engine'] == 'bitap']
+            scan_start = time.time()
+            with metrics.timer(STAGE_SECONDS, stage='scan'):
+                hit_lists = dict(zip(scanned, search_batch_bit_parallel(table, scanned, deadline))) if scanned else {}
+                truncated = dict.fromkeys(scanned, deadline.reached)
+                for phrase, plan in plans.items():
+                    if plan['engine'] == 'bitap':
+                        continue
+                    if deadline.expired():
+                        hit_lists[phrase], truncated[phrase] = [], True
+                        continue
+                    hits = iter_search_hits(table, phrase, plan['engine'], app.config['EXECUTION_MODE'],
+                                            deadline=deadline)
+                    hit_lists[phrase] = list(deadline.limit(hits))
+                    truncated[phrase] = deadline.reached
+            scan_time = (time.time() - scan_start) / len(plans)
+            for phrase, plan in plans.items():
+                hits = hit_lists[phrase][:plan['limit']]
+                metrics.observe('torah_search_matches', len(hits))
+                metrics.inc('torah_search_requests_total', endpoint='batch', engine=plan['engine'], cached='false')
+                with metrics.timer(STAGE_SECONDS, stage='formatting'):
+                    grouped_matches = group_matches(table, hits)
+                    results = format_results(grouped_matches)
+                response = {
+                    'input_phrase': phrase,
+                    'results': results,
+                    'total_variants': len(grouped_matches),
+                    'engine': plan['engine'],
+                    'search_time': round(scan_time, 3),
+                    'truncated': truncated[phrase],
+                    'success': True
+                }
+                if corpora is not None:
+                    response['corpora'] = list(corpora)
+                if plan['action'] != 'run':
+                    response['plan'] = plan_summary(plan, plan['requested_engine'])
+                if truncated[phrase]:
+                    metrics.inc('torah_search_truncated_total', endpoint='batch')
+                else:
+                    result_cache.set(cache_keys[phrase], response)
+                response['cached'] = False
+                responses[phrase] = response
+        
         return {
-            'error': str(e),
-            'success': False,
-            'results': []
+            'results': [responses[phrase] for phrase in phrases],
+            'phrase_count': len(phrases),
+            'search_time': round(time.time() - start_time, 3),
+            'success': True
+        }
+        
+    except Exception as e:
+        logger.error(f"Batch search error: {e}")
+        metrics.inc('torah_search_errors_total', endpoint='batch')
+        return ErrorResponse(500, error='Internal server error', success=False, results=[])
+
+def perform_els_search(input_phrase, min_skip=2, max_skip=100, direction='both', maps=None, deadline=None,
+                       corpora=None):
+    """Search for a phrase as equidistant letter sequences (see search_els).
+
+    Hits are grouped by variant and sources like perform_search, each
+    location giving the signed skip and the references of the first and
+    last letters. ``skip_positions_per_s`` reports throughput as skips x
+    start positions compared per second.
+    """
+    try:
+        start_time = time.time()
+        input_phrase = normalize_phrase(input_phrase)
+        if maps is not None:
+            maps = tuple(sorted(set(maps), key=MAP_NAMES.index))
+        corpora, error = resolve_corpora(corpora)
+        if error:
+            return ErrorResponse(400, error=error, success=False, results=[])
+        
+        table = load_search_table(corpora)
+        if not table:
+            return {'error': 'Torah file not found or empty', 'success': False, 'results': []}
+        
+        cache_key = make_cache_key(route='els', corpus=corpus_digest(table), phrase=input_phrase,
+                                   min_skip=min_skip, max_skip=max_skip, direction=direction,
+                                   maps=list(maps) if maps is not None else None,
+                                   corpora=list(corpora) if corpora is not None else None,
+                                   max_hits=app.config['ELS_MAX_HITS'])
+        cached = result_cache.get(cache_key)
+        if cached is not None:
+            metrics.inc('torah_search_requests_total', endpoint='els', engine='els', cached='true')
+            cached['search_time'] = round(time.time() - start_time, 3)
+            cached['cached'] = True
+            return cached
+        
+        deadline = Deadline(min(deadline or app.config['REQUEST_DEADLINE'], app.config['REQUEST_DEADLINE']))
+        scan_start = time.perf_counter()
+        with metrics.timer(STAGE_SECONDS, stage='els_scan'):
+            hits, hit_count, positions = search_els(table, input_phrase, min_skip, max_skip, direction, maps,
+                                                    deadline)
+        scan_time = time.perf_counter() - scan_start
+        metrics.observe('torah_search_matches', hit_count)
+        if deadline.reached:
+            metrics.inc('torah_search_truncated_total', endpoint='els')
+        
+        with metrics.timer(STAGE_SECONDS, stage='formatting'):
+            grouped_matches = defaultdict(list)
+            for variant, sources, skip, letter_index, start_verse, end_verse in hits:
+                grouped_matches[(variant, sources)].append({
+                    'skip': skip,
+                    'letter_index': letter_index,
+                    'start': make_reference(table, start_verse),
+                    'end': make_reference(table, end_verse)
+                })
+            results = format_results(grouped_matches)
+        metrics.inc('torah_search_requests_total', endpoint='els', engine='els', cached='false')
+        
+        response = {
+            'input_phrase': input_phrase,
+            'results': results,
+            'total_variants': len(grouped_matches),
+            'total_hits': hit_count,
+            'hit_count': len(hits),
+            'min_skip': min_skip,
+            'max_skip': max_skip,
+            'direction': direction,
+            'skip_positions': positions,
+            'skip_positions_per_s': round(positions / scan_time) if scan_time > 0 else None,
+            'search_time': round(time.time() - start_time, 3),
+            'truncated': deadline.reached,
+            'success': True
+        }
+        if maps is not None:
+            response['maps'] = list(maps)
+        if corpora is not None:
+            response['corpora'] = list(corpora)
+        if not deadline.reached:
+            result_cache.set(cache_key, response)
+        response['cached'] = False
+        return response
+        
+    except Exception as e:
+        logger.error(f"ELS search error: {e}")
+        metrics.inc('torah_search_errors_total', endpoint='els')
+        return ErrorResponse(500, error='Internal server error', success=False, results=[])
+
+def perform_gematria_search(input_phrase, span='words', maps=None, corpora=None):
+    """Search for spans with the same gematria value as a phrase (see search_gematria).
+
+    Results use the /api/search shape: one entry per distinct span text,
+    with the sources that turn the phrase into its value and the span
+    marked in each location's verse text.
+    """
+    try:
+        start_time = time.time()
+        input_phrase = normalize_phrase(input_phrase)
+        if maps is not None:
+            maps = tuple(sorted(set(maps), key=MAP_NAMES.index))
+        corpora, error = resolve_corpora(corpora)
+        if error:
+            return ErrorResponse(400, error=error, success=False, results=[])
+        
+        table = load_search_table(corpora)
+        if not table:
+            return {'error': 'Torah file not found or empty', 'success': False, 'results': []}
+        
+        cache_key = make_cache_key(route='gematria', corpus=corpus_digest(table), phrase=input_phrase,
+                                   span=span, maps=list(maps) if maps is not None else None,
+                                   corpora=list(corpora) if corpora is not None else None,
+                                   max_words=app.config['GEMATRIA_MAX_WORDS'],
+                                   max_hits=app.config['GEMATRIA_MAX_HITS'])
+        cached = result_cache.get(cache_key)
+        if cached is not None:
+            metrics.inc('torah_search_requests_total', endpoint='gematria', engine='gematria', cached='true')
+            cached['search_time'] = round(time.time() - start_time, 3)
+            cached['cached'] = True
+            return cached
+        
+        with metrics.timer(STAGE_SECONDS, stage='gematria_scan'):
+            values, hits, hit_count = search_gematria(table, input_phrase, span, maps)
+        metrics.observe('torah_search_matches', hit_count)
+        
+        with metrics.timer(STAGE_SECONDS, stage='formatting'):
+            grouped_matches = defaultdict(list)
+            for variant, sources, value, verse_id, start, length in hits:
+                grouped_matches[(variant, sources, value)].append(
+                    make_location(table, verse_id, start, length)
+                )
+            results = []
+            for (variant, sources, value), locations in grouped_matches.items():
+                if len(results) >= app.config['MAX_RESULTS']:
+                    break
+                results.append({'variant': variant, 'sources': list(sources), 'value': value,
+                                'locations': locations[:MAX_LOCATIONS]})
+        metrics.inc('torah_search_requests_total', endpoint='gematria', engine='gematria', cached='false')
+        
+        response = {
+            'input_phrase': input_phrase,
+            'value': gematria_value(input_phrase),
+            'target_values': sorted(values),
+            'span': span,
+            'results': results,
+            'total_variants': len(grouped_matches),
+            'total_hits': hit_count,
+            'hit_count': len(hits),
+            'search_time': round(time.time() - start_time, 3),
+            'success': True
+        }
+        if maps is not None:
+            response['maps'] = list(maps)
+        if corpora is not None:
+            response['corpora'] = list(corpora)
+        result_cache.set(cache_key, response)
+        response['cached'] = False
+        return response
+        
+    except Exception as e:
+        logger.error(f"Gematria search error: {e}")
+        metrics.inc('torah_search_errors_total', endpoint='gematria')
+        return ErrorResponse(500, error='Internal server error', success=False, results=[])
+
+def perform_fuzzy_search(input_phrase, max_distance=1, maps=None, deadline=None, corpora=None):
+    """Search for a phrase allowing up to ``max_distance`` edits (see search_fuzzy).
+
+    Results are grouped by matched text and edit distance, closest first,
+    with the match marked in each location's verse text.
+    """
+    try:
+        start_time = time.time()
+        input_phrase = normalize_phrase(input_phrase)
+        if maps is not None:
+            maps = tuple(sorted(set(maps), key=MAP_NAMES.index))
+        corpora, error = resolve_corpora(corpora)
+        if error:
+            return ErrorResponse(400, error=error, success=False, results=[])
+        
+        table = load_search_table(corpora)
+        if not table:
+            return {'error': 'Torah file not found or empty', 'success': False, 'results': []}
+        
+        cache_key = make_cache_key(route='fuzzy', corpus=corpus_digest(table), phrase=input_phrase,
+                                   max_distance=max_distance, maps=list(maps) if maps is not None else None,
+                                   corpora=list(corpora) if corpora is not None else None)
+        cached = result_cache.get(cache_key)
+        if cached is not None:
+            metrics.inc('torah_search_requests_total', endpoint='fuzzy', engine='fuzzy', cached='true')
+            cached['search_time'] = round(time.time() - start_time, 3)
+            cached['cached'] = True
+            return cached
+        
+        deadline = Deadline(min(deadline or app.config['REQUEST_DEADLINE'], app.config['REQUEST_DEADLINE']))
+        with metrics.timer(STAGE_SECONDS, stage='fuzzy_scan'):
+            hits = search_fuzzy(table, input_phrase, max_distance, maps, deadline)
+        metrics.observe('torah_search_matches', len(hits))
+        if deadline.reached:
+            metrics.inc('torah_search_truncated_total', endpoint='fuzzy')
+        
+        with metrics.timer(STAGE_SECONDS, stage='formatting'):
+            grouped_matches = defaultdict(list)
+            distance_counts = [0] * (max_distance + 1)
+            for variant, distance, verse_id, start in hits:
+                grouped_matches[(variant, distance)].append(make_location(table, verse_id, start, len(variant)))
+                distance_counts[distance] += 1
+            results = []
+            for (variant, distance), locations in sorted(grouped_matches.items(), key=lambda item: item[0][1]):
+                if len(results) >= app.config['MAX_RESULTS']:
+                    break
+                results.append({'variant': variant, 'distance': distance, 'locations': locations[:MAX_LOCATIONS]})
+        metrics.inc('torah_search_requests_total', endpoint='fuzzy', engine='fuzzy', cached='false')
+        
+        response = {
+            'input_phrase': input_phrase,
+            'max_distance': max_distance,
+            'results': results,
+            'total_variants': len(grouped_matches),
+            'total_hits': len(hits),
+            'distance_counts': {str(distance): count for distance, count in enumerate(distance_counts)},
+            'search_time': round(time.time() - start_time, 3),
+            'truncated': deadline.reached,
+            'success': True
+        }
+        if maps is not None:
+            response['maps'] = list(maps)
+        if corpora is not None:
+            response['corpora'] = list(corpora)
+        if not deadline.reached:
+            result_cache.set(cache_key, response)
+        response['cached'] = False
+        return response
+        
+    except Exception as e:
+        logger.error(f"Fuzzy search error: {e}")
+        metrics.inc('torah_search_errors_total', endpoint='fuzzy')
+        return ErrorResponse(500, error='Internal server error', success=False, results=[])
+
+def perform_occurrence_search(input_phrase, maps=None, corpora=None):
+    """Count every occurrence of a phrase's variants (see search_occurrences).
+
+    Reports hits and distinct verses per variant, hits per map, and at most
+    OCCURRENCES_MAX_HITS hits as parallel ``variant_ids`` / ``verse_ids`` /
+    ``offsets`` arrays, offsets being within the verse text as in compact
+    results.
+    """
+    try:
+        start_time = time.time()
+        input_phrase = normalize_phrase(input_phrase)
+        if maps is not None:
+            maps = tuple(sorted(set(maps), key=MAP_NAMES.index))
+        corpora, error = resolve_corpora(corpora)
+        if error:
+            return ErrorResponse(400, error=error, success=False, results=[])
+        
+        table = load_search_table(corpora)
+        if not table:
+            return {'error': 'Torah file not found or empty', 'success': False, 'results': []}
+        
+        cache_key = make_cache_key(route='occurrences', corpus=corpus_digest(table), phrase=input_phrase,
+                                   maps=list(maps) if maps is not None else None,
+                                   corpora=list(corpora) if corpora is not None else None,
+                                   max_hits=app.config['OCCURRENCES_MAX_HITS'])
+        cached = result_cache.get(cache_key)
+        if cached is not None:
+            metrics.inc('torah_search_requests_total', endpoint='occurrences', engine='bitap', cached='true')
+            cached['search_time'] = round(time.time() - start_time, 3)
+            cached['cached'] = True
+            return cached
+        
+        with metrics.timer(STAGE_SECONDS, stage='scan'):
+            occurrences = search_occurrences(table, input_phrase, maps)
+        metrics.observe('torah_search_matches', len(occurrences))
+        
+        with metrics.timer(STAGE_SECONDS, stage='formatting'):
+            results = [
+                {'variant': variant, 'sources': list(sources), 'count': count, 'verses': verse_count}
+                for variant, sources, count, verse_count in zip(
+                    occurrences.variants, occurrences.sources,
+                    occurrences.counts.tolist(), occurrences.verse_counts.tolist()
+                )
+            ]
+            max_hits = app.config['OCCURRENCES_MAX_HITS']
+            starts = occurrences.starts[:max_hits]
+            verse_ids = occurrences.verse_ids[:max_hits]
+            hits = {
+                'variant_ids': occurrences.variant_ids[:max_hits].tolist(),
+                'verse_ids': verse_ids.tolist(),
+                'offsets': (starts - np.asarray(table.starts)[verse_ids]).tolist()
+            }
+        metrics.inc('torah_search_requests_total', endpoint='occurrences', engine='bitap', cached='false')
+        
+        original = occurrences.original
+        response = {
+            'input_phrase': input_phrase,
+            'results': results,
+            'map_counts': occurrences.map_counts(maps if maps is not None else MAP_NAMES),
+            'hits': hits,
+            'total_variants': len(results),
+            'total_hits': len(occurrences),
+            'total_verses': len(np.unique(occurrences.verse_ids)),
+            'original_hits': int(occurrences.counts[original]) if original is not None else 0,
+            'hit_count': len(hits['offsets']),
+            'search_time': round(time.time() - start_time, 3),
+            'success': True
+        }
+        if maps is not None:
+            response['maps'] = list(maps)
+        if corpora is not None:
+            response['corpora'] = list(corpora)
+        result_cache.set(cache_key, response)
+        response['cached'] = False
+        return response
+        
+    except Exception as e:
+        logger.error(f"Occurrence search error: {e}")
+        metrics.inc('torah_search_errors_total', endpoint='occurrences')
+        return ErrorResponse(500, error='Internal server error', success=False, results=[])
+
+def get_verses(verse_ids, corpora=None):
+    """Return ``(result, etag)`` with the reference and clean text of each verse id.
+
+    Verse ids are those of compact search results over the same
+    ``corpora``; the ETag only changes when a corpus does, so responses can
+    be cached by clients and proxies.
+    """
+    corpora, error = resolve_corpora(corpora)
+    if error:
+        return {'error': error, 'success': False}, None
+    table = load_search_table(corpora)
+    if not table:
+        return {'error': 'Torah file not found or empty', 'success': False}, None
+    
+    unknown = [verse_id for verse_id in verse_ids if not 0 <= verse_id < len(table)]
+    if unknown:
+        return {'error': f"Unknown verse ids: {', '.join(map(str, unknown))}", 'success': False}, None
+    
+    verses = []
+    for verse_id in verse_ids:
+        verse = make_reference(table, verse_id)
+        verse['id'] = verse_id
+        verse['text'] = table.verse_text(verse_id)
+        verses.append(verse)
+    
+    etag = make_cache_key(corpora=corpus_digest(table), ids=verse_ids)
+    return {'verses': verses, 'success': True}, etag
+
+def stream_search(input_phrase, engine=None, execution=None, limit=None, offset=0, cursor=None, maps=None,
+                  deadline=None, match='substring', corpora=None, format='full'):
+    """Yield search records as the scan finds them.
+
+    Each accepted hit is emitted as a ``location`` record (subject to the
+    same MAX_RESULTS / MAX_LOCATIONS limits as perform_search), or as a
+    ``match`` record with the verse id and offset if ``format`` is
+    'compact', followed by one ``summary`` record with counts and timings,
+    or an ``error`` record. ``limit``, ``offset`` and ``cursor`` page the
+    stream, and the cost budgets and ``deadline`` apply, like perform_search.
+    """
+    try:
+        start_time = time.time()
+        input_phrase = normalize_phrase(input_phrase)
+        engine, execution, maps, error = resolve_search_options(engine, execution, maps, match, input_phrase)
+        if not error:
+            corpora, error = resolve_corpora(corpora)
+        if error:
+            yield ErrorResponse(400, type='error', error=error, success=False)
+            return
+        
+        table = load_search_table(corpora)
+        if not table:
+            yield {'type': 'error', 'error': 'Torah file not found or empty', 'success': False}
+            return
+        if format == 'summary':
+            # Summaries hold no hits to stream, only the final counts
+            summary = summarize_search(table, input_phrase, engine, maps, match, corpora, start_time, deadline)
+            if response_status(summary) != 200:
+                yield ErrorResponse(summary.status, type='error', **summary)
+            else:
+                yield {'type': 'summary', **summary}
+            return
+        
+        requested_engine = engine
+        plan = plan_search(table, input_phrase, engine, maps, limit)
+        if plan['action'] == 'reject':
+            yield ErrorResponse(422, type='error', **plan_error(plan))
+            return
+        engine, limit = plan['engine'], plan['limit']
+        summary_extra = {'plan': plan_summary(plan, requested_engine)} if plan['action'] != 'run' else {}
+        deadline = Deadline(min(deadline or app.config['REQUEST_DEADLINE'], app.config['REQUEST_DEADLINE']))
+        
+        cache_key = make_query_key(table, input_phrase, engine, maps, match, corpora)
+        if limit is not None:
+            yield from stream_page(table, input_phrase, engine, execution, limit, offset,
+                                   decode_cursor(cursor, cache_key) if cursor else 0,
+                                   cache_key, start_time, maps, deadline, summary_extra, match, format)
+            return
+        
+        # Cached results hold full locations, so compact streams always scan
+        cached = result_cache.get(cache_key) if format == 'full' else None
+        if cached is not None:
+            metrics.inc('torah_search_requests_total', endpoint='stream', engine=engine, cached='true')
+            for result in cached['results']:
+                for location in result['locations']:
+                    yield {'type': 'location', 'variant': result['variant'],
+                           'sources': result['sources'], 'location': location}
+            yield {
+                'type': 'summary',
+                'input_phrase': input_phrase,
+                'total_variants': cached['total_variants'],
+                'engine': engine,
+                'search_time': round(time.time() - start_time, 3),
+                'truncated': False,
+                'cached': True,
+                'success': True,
+                **summary_extra
+            }
+            return
+        
+        observe_variant_count(input_phrase, maps)
+        grouped_matches = defaultdict(list)
+        reported_groups = set()
+        first_result_time = None
+        match_count = 0
+        hits = deadline.limit(iter_search_hits(table, input_phrase, engine, execution, maps=maps, deadline=deadline,
+                                               match=match))
+        for variant, source, verse_id, start in hits:
+            match_count += 1
+            key = (variant, source)
+            if key not in grouped_matches and len(grouped_matches) < app.config['MAX_RESULTS']:
+                reported_groups.add(key)
+            locations = grouped_matches[key]
+            if format == 'compact':
+                locations.append(None)
+            else:
+                location = make_location(table, verse_id, start, len(variant))
+                locations.append(location)
+            
+            if key in reported_groups and len(locations) <= MAX_LOCATIONS:
+                if first_result_time is None:
+                    first_result_time = time.time() - start_time
+                if format == 'compact':
+                    yield make_match_record(table, variant, source, verse_id, start)
+                else:
+                    yield {'type': 'location', 'variant': variant, 'sources': list(source), 'location': location}
+        
+        search_time = time.time() - start_time
+        metrics.observe(STAGE_SECONDS, search_time, stage='stream')
+        metrics.observe('torah_search_matches', match_count)
+        metrics.inc('torah_search_requests_total', endpoint='stream', engine=engine, cached='false')
+        if deadline.reached:
+            metrics.inc('torah_search_truncated_total', endpoint='stream')
+        elif format == 'full':
+            result_cache.set(cache_key, {
+                'input_phrase': input_phrase,
+                'results': format_results(grouped_matches),
+                'total_variants': len(grouped_matches),
+                'engine': engine,
+                'search_time': round(search_time, 3),
+                'truncated': False,
+                'success': True
+            })
+        yield {
+            'type': 'summary',
+            'input_phrase': input_phrase,
+            'total_variants': len(grouped_matches),
+            'engine': engine,
+            'first_result_time': round(first_result_time, 3) if first_result_time is not None else None,
+            'search_time': round(search_time, 3),
+            'truncated': deadline.reached,
+            'cached': False,
+            'success': True,
+            **summary_extra
         }
+        
+    except InvalidRequest as e:
+        yield ErrorResponse(400, type='error', error=str(e), success=False)
+    except Exception as e:
+        logger.error(f"Search error: {e}")
+        metrics.inc('torah_search_errors_total', endpoint='stream')
+        yield ErrorResponse(500, type='error', error='Internal server error', success=False)
+
+def make_match_record(table, variant, source, verse_id, start):
+    """Build the compact stream record of a hit."""
+    return {'type': 'match', 'variant': variant, 'sources': list(source), 'verse_id': verse_id,
+            'offset': start - table.starts[verse_id], 'length': len(variant)}
+
+def stream_page(table, input_phrase, engine, execution, limit, offset, start_pos, query_key, start_time,
+                maps=None, deadline=None, summary_extra=None, match='substring', format='full'):
+    """Stream one page of hits, stopping the scan once the page is filled or the deadline expires."""
+    deadline = deadline or Deadline(None)
+    observe_variant_count(input_phrase, maps)
+    hits = deadline.limit(iter_search_hits(table, input_phrase, engine, execution, start_pos, maps, deadline, match,
+                                           offset + limit + 1))
+    variants = set()
+    count = 0
+    last_hit = None
+    next_position = None
+    for hit in itertools.islice(hits, offset, None):
+        if count == limit:
+            next_position = resume_position(table, last_hit)
+            break
+        variant, source, verse_id, start = hit
+        variants.add((variant, source))
+        count += 1
+        last_hit = hit
+        if format == 'compact':
+            yield make_match_record(table, variant, source, verse_id, start)
+        else:
+            yield {'type': 'location', 'variant': variant, 'sources': list(source),
+                   'location': make_location(table, verse_id, start, len(variant))}
+    hits.close()
+    if deadline.reached and next_position is None:
+        next_position = truncated_position(table, last_hit, start_pos)
+    metrics.observe(STAGE_SECONDS, time.time() - start_time, stage='stream')
+    metrics.observe('torah_search_matches', count)
+    metrics.inc('torah_search_requests_total', endpoint='stream', engine=engine, cached='false')
+    if deadline.reached:
+        metrics.inc('torah_search_truncated_total', endpoint='stream')
+    
+    yield {
+        'type': 'summary',
+        'input_phrase': input_phrase,
+        'total_variants': len(variants),
+        'engine': engine,
+        'limit': limit,
+        'offset': offset,
+        'hit_count': count,
+        'has_more': next_position is not None,
+        'next_cursor': encode_cursor(query_key, next_position) if next_position is not None else None,
+        'search_time': round(time.time() - start_time, 3),
+        'truncated': deadline.reached,
+        'cached': False,
+        'success': True,
+        **(summary_extra or {})
+    }
 
 # === Web Routes ===
 
@@ -497,6 +3540,7 @@ HTML_TEMPLATE = """
 
     <script>
         let isSearching = false;
+        const VERSE_BATCH = 200;
         
         document.getElementById('searchInput').addEventListener('keypress', function(e) {
             if (e.key === 'Enter') {
@@ -519,16 +3563,40 @@ HTML_TEMPLATE = """
             document.getElementById('searchBtn').disabled = true;
             
             try {
-                const response = await fetch('/api/search', {
+                const response = await fetch('/api/search/stream', {
                     method: 'POST',
                     headers: {
                         'Content-Type': 'application/json',
                     },
-                    body: JSON.stringify({ phrase: query })
+                    body: JSON.stringify({ phrase: query, format: 'compact' })
                 });
                 
-                const data = await response.json();
-                displayResults(data);
+                if (!response.ok) {
+                    displayError(await response.json());
+                    return;
+                }
+                
+                // Render NDJSON records as they arrive
+                const reader = response.body.getReader();
+                const decoder = new TextDecoder();
+                const state = { groups: {}, count: 0, verses: {}, pending: [], fetches: [] };
+                let buffer = '';
+                
+                while (true) {
+                    const { done, value } = await reader.read();
+                    if (done) break;
+                    
+                    buffer += decoder.decode(value, { stream: true });
+                    const lines = buffer.split('\\n');
+                    buffer = lines.pop();
+                    lines.forEach(line => {
+                        if (line.trim()) handleRecord(JSON.parse(line), state);
+                    });
+                    flushLocations(state);
+                }
+                if (buffer.trim()) handleRecord(JSON.parse(buffer), state);
+                flushLocations(state);
+                await Promise.all(state.fetches);
                 
             } catch (error) {
                 console.error('Error:', error);
@@ -541,40 +3609,87 @@ HTML_TEMPLATE = """
             }
         }
         
-        function displayResults(data) {
+        function displayError(data) {
+            document.getElementById('results').innerHTML = 
+                '<div class="error">שגיאה: ' + (data.error || 'שגיאה לא ידועה') + '</div>';
+        }
+        
+        function handleRecord(record, state) {
             const resultsDiv = document.getElementById('results');
             
-            if (!data.success) {
-                resultsDiv.innerHTML = '<div class="error">שגיאה: ' + (data.error || 'שגיאה לא ידועה') + '</div>';
+            if (record.type === 'error') {
+                displayError(record);
                 return;
             }
             
-            if (data.results.length === 0) {
-                resultsDiv.innerHTML = '<div class="error">לא נמצאו תוצאות עבור: ' + data.input_phrase + '</div>';
+            if (record.type === 'summary') {
+                if (state.count === 0) {
+                    resultsDiv.innerHTML = '<div class="error">לא נמצאו תוצאות עבור: ' + record.input_phrase + '</div>';
+                    return;
+                }
+                
+                const stats = document.createElement('div');
+                stats.className = 'stats';
+                stats.innerHTML = '<strong>נמצאו ' + record.total_variants + ' וריאציות</strong><br>' +
+                    'זמן חיפוש: ' + record.search_time + ' שניות';
+                resultsDiv.insertBefore(stats, resultsDiv.firstChild);
                 return;
             }
             
-            let html = '<div class="stats">';
-            html += '<strong>נמצאו ' + data.total_variants + ' וריאציות</strong><br>';
-            html += 'זמן חיפוש: ' + data.search_time + ' שניות';
-            html += '</div>';
+            const key = record.variant + '|' + record.sources.join(',');
+            let group = state.groups[key];
+            if (!group) {
+                group = document.createElement('div');
+                group.className = 'result-item';
+                group.innerHTML = '<div class="variant">' + record.variant + '</div>' +
+                    '<div class="sources">מקורות: ' + record.sources.join(', ') + '</div>';
+                resultsDiv.appendChild(group);
+                state.groups[key] = group;
+            }
             
-            data.results.forEach(result => {
-                html += '<div class="result-item">';
-                html += '<div class="variant">' + result.variant + '</div>';
-                html += '<div class="sources">מקורות: ' + result.sources.join(', ') + '</div>';
-                
-                result.locations.forEach(location => {
-                    html += '<div class="location">';
-                    html += '<div class="location-header">' + location.book + ' פרק ' + location.chapter + ', פסוק ' + location.verse + '</div>';
-                    html += '<div class="verse-text">' + location.text.replace(/\[([^\]]+)\]/g, '<span class="highlight">$1</span>') + '</div>';
-                    html += '</div>';
-                });
-                
-                html += '</div>';
-            });
+            // Compact records only locate the match; the verse is filled in once its text is fetched
+            const locationDiv = document.createElement('div');
+            locationDiv.className = 'location';
+            group.appendChild(locationDiv);
+            state.pending.push({ record: record, div: locationDiv });
+            state.count++;
+            if (state.pending.length >= VERSE_BATCH) flushLocations(state);
+        }
+        
+        function flushLocations(state) {
+            const pending = state.pending;
+            if (!pending.length) return;
+            state.pending = [];
+            const ids = [...new Set(pending.map(item => item.record.verse_id))]
+                .filter(id => !(id in state.verses));
+            state.fetches.push(loadVerses(ids, state.verses).then(() => {
+                pending.forEach(item => renderLocation(item.record, state.verses[item.record.verse_id], item.div));
+            }));
+        }
+        
+        async function loadVerses(ids, verses) {
+            for (let i = 0; i < ids.length; i += VERSE_BATCH) {
+                const response = await fetch('/api/verses?ids=' + ids.slice(i, i + VERSE_BATCH).join(','));
+                const data = await response.json();
+                if (!response.ok) throw new Error(data.error || response.status);
+                data.verses.forEach(verse => { verses[verse.id] = verse; });
+            }
+        }
+        
+        function renderLocation(record, verse, locationDiv) {
+            const header = document.createElement('div');
+            header.className = 'location-header';
+            header.textContent = verse.book + ' פרק ' + verse.chapter + ', פסוק ' + verse.verse;
             
-            resultsDiv.innerHTML = html;
+            // Highlight the match at its offset, not wherever its text first occurs
+            const end = record.offset + record.length;
+            const highlight = document.createElement('span');
+            highlight.className = 'highlight';
+            highlight.textContent = verse.text.slice(record.offset, end);
+            const text = document.createElement('div');
+            text.className = 'verse-text';
+            text.append(verse.text.slice(0, record.offset), highlight, verse.text.slice(end));
+            locationDiv.append(header, text);
         }
     </script>
 </body>
@@ -586,25 +3701,483 @@ def index():
     """Serve the main search interface."""
     return render_template_string(HTML_TEMPLATE)
 
-@app.route('/api/search', methods=['POST'])
-def api_search():
-    """API endpoint for performing search."""
+def validate_phrase(raw_phrase):
+    """Normalize and validate one phrase, returning ``(phrase, error)``."""
+    if not isinstance(raw_phrase, str):
+        return None, 'Phrase must be a string'
+    
+    phrase = normalize_phrase(raw_phrase)
+    if not phrase:
+        return None, 'Empty phrase provided'
+    
+    if len(phrase) > 100:
+        return None, 'Phrase too long (max 100 characters)'
+    
+    return phrase, None
+
+def parse_search_request(data):
+    """Validate a search request body.
+
+    Returns ``(options, error)``: keyword arguments for perform_search, or an
+    error message for a 400 response.
+    """
+    if not data or 'phrase' not in data:
+        return None, 'Missing phrase parameter'
+    
+    phrase, error = validate_phrase(data['phrase'])
+    if error:
+        return None, error
+    
+    engine = data.get('engine')
+    if engine is not None and engine not in SEARCH_ENGINES:
+        return None, f'Unknown search engine: {engine}'
+    
+    execution = data.get('execution')
+    if execution is not None and execution not in EXECUTION_MODES:
+        return None, f'Unknown execution mode: {execution}'
+    
+    options = {'input_phrase': phrase, 'engine': engine, 'execution': execution}
+    
+    match = data.get('match')
+    if match is not None:
+        if match not in MATCH_MODES:
+            return None, f"match must be one of: {', '.join(MATCH_MODES)}"
+        options['match'] = match
+    
+    response_format = data.get('format')
+    if response_format is not None:
+        if response_format not in RESPONSE_FORMATS:
+            return None, f"format must be one of: {', '.join(RESPONSE_FORMATS)}"
+        options['format'] = response_format
+    
+    corpora = data.get('corpora')
+    if corpora is not None:
+        registry = get_corpus_registry()
+        if not isinstance(corpora, list) or not corpora or any(name not in registry for name in corpora):
+            return None, f"corpora must be a non-empty list of: {', '.join(registry)}"
+        options['corpora'] = corpora
+    
+    maps = data.get('maps')
+    if maps is not None:
+        if not isinstance(maps, list) or not maps or any(name not in MAP_NAMES for name in maps):
+            return None, f"maps must be a non-empty list of: {', '.join(MAP_NAMES)}"
+        options['maps'] = maps
+    
+    limit = data.get('limit')
+    offset = data.get('offset', 0)
+    cursor = data.get('cursor')
+    if limit is not None:
+        if not isinstance(limit, int) or isinstance(limit, bool) or not 1 <= limit <= app.config['MAX_PAGE_SIZE']:
+            return None, f"limit must be an integer between 1 and {app.config['MAX_PAGE_SIZE']}"
+        if not isinstance(offset, int) or isinstance(offset, bool) or offset < 0:
+            return None, 'offset must be a non-negative integer'
+        if cursor is not None and not isinstance(cursor, str):
+            return None, 'cursor must be a string'
+        options.update(limit=limit, offset=offset, cursor=cursor)
+    elif offset or cursor:
+        return None, 'offset and cursor require limit'
+    if limit is not None and response_format == 'summary':
+        return None, 'summary results are not paged'
+    
+    deadline = data.get('deadline')
+    if deadline is not None:
+        if not isinstance(deadline, (int, float)) or isinstance(deadline, bool) or deadline <= 0:
+            return None, 'deadline must be a positive number of seconds'
+        options['deadline'] = deadline
+    
+    return options, None
+
+def search_stream_chunks(options, use_sse):
+    """Yield the HTTP status of a streaming search, then its response body in chunks.
+
+    The search runs up to its first record before the status is known, so a
+    request refused before any record is sent (see ErrorResponse) is answered
+    with its own status and the error as a JSON body, not as a stream.
+    """
+    records = stream_search(**options)
     try:
-        data = request.get_json()
-        if not data or 'phrase' not in data:
-            return jsonify({'error': 'Missing phrase parameter', 'success': False}), 400
-        
-        phrase = data['phrase'].strip()
-        if not phrase:
-            return jsonify({'error': 'Empty phrase provided', 'success': False}), 400
-        
-        if len(phrase) > 100:
-            return jsonify({'error': 'Phrase too long (max 100 characters)', 'success': False}), 400
+        first = next(records)
+        status = response_status(first)
+        yield status
+        if status != 200:
+            yield json.dumps(first, ensure_ascii=False)
+            return
+        yield from encode_stream(itertools.chain([first], records), use_sse)
+    finally:
+        records.close()
+
+def encode_stream(records, use_sse):
+    """Serialize stream records as NDJSON lines, or as Server-Sent Events if use_sse."""
+    # Encoding time is summed over the stream and recorded once per request
+    encoding_time = 0.0
+    for record in records:
+        encode_start = time.perf_counter()
+        payload = json.dumps(record, ensure_ascii=False)
+        encoding_time += time.perf_counter() - encode_start
+        yield f'data: {payload}\n\n' if use_sse else payload + '\n'
+    metrics.observe(STAGE_SECONDS, encoding_time, stage='json_encoding')
+
+def parse_batch_request(data):
+    """Validate a batch search body, returning ``(options, error)`` for perform_batch_search."""
+    if not data or not isinstance(data.get('phrases'), list) or not data['phrases']:
+        return None, 'Missing phrases parameter'
+    
+    if len(data['phrases']) > app.config['MAX_BATCH_PHRASES']:
+        return None, f"Too many phrases (max {app.config['MAX_BATCH_PHRASES']})"
+    
+    phrases = []
+    for raw_phrase in data['phrases']:
+        phrase, error = validate_phrase(raw_phrase)
+        if error:
+            return None, error
+        phrases.append(phrase)
+    
+    options = {'input_phrases': phrases}
+    
+    corpora = data.get('corpora')
+    if corpora is not None:
+        registry = get_corpus_registry()
+        if not isinstance(corpora, list) or not corpora or any(name not in registry for name in corpora):
+            return None, f"corpora must be a non-empty list of: {', '.join(registry)}"
+        options['corpora'] = corpora
+    
+    deadline = data.get('deadline')
+    if deadline is not None:
+        if not isinstance(deadline, (int, float)) or isinstance(deadline, bool) or deadline <= 0:
+            return None, 'deadline must be a positive number of seconds'
+        options['deadline'] = deadline
+    
+    return options, None
+
+def parse_els_request(data):
+    """Validate an ELS search body, returning ``(options, error)`` for perform_els_search."""
+    if not data or 'phrase' not in data:
+        return None, 'Missing phrase parameter'
+    
+    phrase, error = validate_phrase(data['phrase'])
+    if error:
+        return None, error
+    if len(phrase.replace(' ', '')) < 2:
+        return None, 'ELS search needs at least 2 letters'
+    
+    options = {'input_phrase': phrase}
+    
+    max_allowed = app.config['ELS_MAX_SKIP']
+    min_skip = data.get('min_skip', 2)
+    max_skip = data.get('max_skip', min(100, max_allowed))
+    for name, value in (('min_skip', min_skip), ('max_skip', max_skip)):
+        if not isinstance(value, int) or isinstance(value, bool) or not 1 <= value <= max_allowed:
+            return None, f'{name} must be an integer between 1 and {max_allowed}'
+    if min_skip > max_skip:
+        return None, 'min_skip must not exceed max_skip'
+    options.update(min_skip=min_skip, max_skip=max_skip)
+    
+    direction = data.get('direction', 'both')
+    if direction not in ELS_DIRECTIONS:
+        return None, f"direction must be one of: {', '.join(ELS_DIRECTIONS)}"
+    options['direction'] = direction
+    
+    maps = data.get('maps')
+    if maps is not None:
+        if not isinstance(maps, list) or not maps or any(name not in MAP_NAMES for name in maps):
+            return None, f"maps must be a non-empty list of: {', '.join(MAP_NAMES)}"
+        options['maps'] = maps
+    
+    corpora = data.get('corpora')
+    if corpora is not None:
+        registry = get_corpus_registry()
+        if not isinstance(corpora, list) or not corpora or any(name not in registry for name in corpora):
+            return None, f"corpora must be a non-empty list of: {', '.join(registry)}"
+        options['corpora'] = corpora
+    
+    deadline = data.get('deadline')
+    if deadline is not None:
+        if not isinstance(deadline, (int, float)) or isinstance(deadline, bool) or deadline <= 0:
+            return None, 'deadline must be a positive number of seconds'
+        options['deadline'] = deadline
+    
+    return options, None
+
+def parse_gematria_request(data):
+    """Validate a gematria search body, returning ``(options, error)`` for perform_gematria_search."""
+    if not data or 'phrase' not in data:
+        return None, 'Missing phrase parameter'
+    
+    phrase, error = validate_phrase(data['phrase'])
+    if error:
+        return None, error
+    if not gematria_value(phrase):
+        return None, 'Phrase has no Hebrew letters'
+    
+    options = {'input_phrase': phrase}
+    
+    span = data.get('span', 'words')
+    if span not in GEMATRIA_SPANS:
+        return None, f"span must be one of: {', '.join(GEMATRIA_SPANS)}"
+    options['span'] = span
+    
+    maps = data.get('maps')
+    if maps is not None:
+        if not isinstance(maps, list) or not maps or any(name not in MAP_NAMES for name in maps):
+            return None, f"maps must be a non-empty list of: {', '.join(MAP_NAMES)}"
+        options['maps'] = maps
+    
+    corpora = data.get('corpora')
+    if corpora is not None:
+        registry = get_corpus_registry()
+        if not isinstance(corpora, list) or not corpora or any(name not in registry for name in corpora):
+            return None, f"corpora must be a non-empty list of: {', '.join(registry)}"
+        options['corpora'] = corpora
+    
+    return options, None
+
+def parse_fuzzy_request(data):
+    """Validate a fuzzy search body, returning ``(options, error)`` for perform_fuzzy_search."""
+    if not data or 'phrase' not in data:
+        return None, 'Missing phrase parameter'
+    
+    phrase, error = validate_phrase(data['phrase'])
+    if error:
+        return None, error
+    if len(phrase) > 64:
+        return None, 'Fuzzy search supports phrases of at most 64 characters'
+    
+    options = {'input_phrase': phrase}
+    
+    max_allowed = app.config['FUZZY_MAX_DISTANCE']
+    max_distance = data.get('max_distance', 1)
+    if not isinstance(max_distance, int) or isinstance(max_distance, bool) or not 0 <= max_distance <= max_allowed:
+        return None, f'max_distance must be an integer between 0 and {max_allowed}'
+    if max_distance >= len(phrase):
+        return None, 'max_distance must be smaller than the phrase length'
+    options['max_distance'] = max_distance
+    
+    maps = data.get('maps')
+    if maps is not None:
+        if not isinstance(maps, list) or not maps or any(name not in MAP_NAMES for name in maps):
+            return None, f"maps must be a non-empty list of: {', '.join(MAP_NAMES)}"
+        options['maps'] = maps
+    
+    corpora = data.get('corpora')
+    if corpora is not None:
+        registry = get_corpus_registry()
+        if not isinstance(corpora, list) or not corpora or any(name not in registry for name in corpora):
+            return None, f"corpora must be a non-empty list of: {', '.join(registry)}"
+        options['corpora'] = corpora
+    
+    deadline = data.get('deadline')
+    if deadline is not None:
+        if not isinstance(deadline, (int, float)) or isinstance(deadline, bool) or deadline <= 0:
+            return None, 'deadline must be a positive number of seconds'
+        options['deadline'] = deadline
+    
+    return options, None
+
+def parse_occurrence_request(data):
+    """Validate an occurrence search body, returning ``(options, error)`` for perform_occurrence_search."""
+    if not data or 'phrase' not in data:
+        return None, 'Missing phrase parameter'
+    
+    phrase, error = validate_phrase(data['phrase'])
+    if error:
+        return None, error
+    
+    options = {'input_phrase': phrase}
+    
+    maps = data.get('maps')
+    if maps is not None:
+        if not isinstance(maps, list) or not maps or any(name not in MAP_NAMES for name in maps):
+            return None, f"maps must be a non-empty list of: {', '.join(MAP_NAMES)}"
+        options['maps'] = maps
+    
+    corpora = data.get('corpora')
+    if corpora is not None:
+        registry = get_corpus_registry()
+        if not isinstance(corpora, list) or not corpora or any(name not in registry for name in corpora):
+            return None, f"corpora must be a non-empty list of: {', '.join(registry)}"
+        options['corpora'] = corpora
+    
+    return options, None
+
+def parse_verse_request(args):
+    """Validate /api/verses query arguments, returning ``(options, error)`` for get_verses."""
+    raw_ids = args.get('ids')
+    if not raw_ids:
+        return None, 'Missing ids parameter'
+    try:
+        verse_ids = list(dict.fromkeys(int(verse_id) for verse_id in raw_ids.split(',')))
+    except ValueError:
+        return None, 'ids must be a comma-separated list of verse ids'
+    if len(verse_ids) > app.config['MAX_VERSE_IDS']:
+        return None, f"Too many ids (max {app.config['MAX_VERSE_IDS']})"
+    
+    options = {'verse_ids': verse_ids}
+    corpora = args.get('corpora')
+    if corpora:
+        options['corpora'] = corpora.split(',')
+    return options, None
+
+def explain_search(input_phrase, engine=None, execution=None, limit=None, offset=0, cursor=None, maps=None,
+                   deadline=None, match='substring', corpora=None, format='full'):
+    """Describe how a search would run without running it."""
+    input_phrase = normalize_phrase(input_phrase)
+    engine, execution, maps, error = resolve_search_options(engine, execution, maps, match, input_phrase)
+    if not error:
+        corpora, error = resolve_corpora(corpora)
+    if error:
+        return ErrorResponse(400, error=error, success=False)
+    
+    table = load_search_table(corpora)
+    if not table:
+        return {'error': 'Torah file not found or empty', 'success': False}
+    
+    plan = plan_search(table, input_phrase, summary_engine(engine) if format == 'summary' else engine, maps, limit)
+    return {
+        'input_phrase': input_phrase,
+        'requested_engine': engine,
+        'engine': plan['engine'] if plan['action'] != 'reject' else None,
+        'execution': execution,
+        'maps': list(maps) if maps is not None else None,
+        'match': match,
+        'corpora': list(corpora) if corpora is not None else [DEFAULT_CORPUS],
+        'format': format,
+        'action': plan['action'],
+        'reason': plan['reason'],
+        'limit': plan['limit'],
+        'deadline': min(deadline or app.config['REQUEST_DEADLINE'], app.config['REQUEST_DEADLINE']),
+        'estimate': plan['estimate'],
+        'budgets': {
+            'max_variant_space': app.config['MAX_VARIANT_SPACE'],
+            'cost_budget_ms': app.config['COST_BUDGET_MS'],
+            'policy': app.config['COST_POLICY']
+        },
+        'success': True
+    }
+
+def search_request_key(options):
+    """Key identifying a search request after option defaults are applied.
+
+    Every option is part of the key, so requests that differ in anything
+    that changes the response (e.g. ``format``) never share a result.
+    """
+    engine, execution, maps, _ = resolve_search_options(
+        options.get('engine'), options.get('execution'), options.get('maps'), options.get('match', 'substring'),
+        options['input_phrase']
+    )
+    return make_cache_key(**{
+        'offset': 0, 'match': 'substring', 'format': 'full', **options, 'route': 'search',
+        'engine': engine, 'execution': execution, 'maps': list(maps) if maps is not None else None
+    })
+
+class JsonRoute:
+    """A POST endpoint taking a JSON body, served by both the Flask and ASGI apps.
+
+    ``parse`` validates the body into ``(options, error)`` and ``perform``
+    is called with those options. ``key`` identifies requests that may
+    share one in-flight result; routes with ``queued=False`` are cheap
+    and answered without taking a search slot.
+    """
+
+    def __init__(self, path, endpoint, name, parse, perform, label=None, key=None, queued=True):
+        self.path = path
+        self.endpoint = endpoint
+        self.name = name
+        self.parse = parse
+        self.perform = perform
+        self.label = label
+        self.queued = queued
+        self._key = key
+
+    def key(self, options):
+        if self._key:
+            return self._key(options)
+        return make_cache_key(route=self.name, **options)
+
+    def describe(self, options):
+        if 'input_phrases' in options:
+            return f"{self.label} request for {len(options['input_phrases'])} phrases"
+        return f"{self.label} request for phrase: {options['input_phrase']}"
+
+JSON_ROUTES = [
+    JsonRoute('/api/search', 'api_search', 'search', parse_search_request, perform_search,
+              label='Search', key=search_request_key),
+    JsonRoute('/api/search/explain', 'api_search_explain', 'explain', parse_search_request, explain_search,
+              queued=False),
+    JsonRoute('/api/search/batch', 'api_search_batch', 'batch', parse_batch_request, perform_batch_search,
+              label='Batch search'),
+    JsonRoute('/api/search/els', 'api_search_els', 'els', parse_els_request, perform_els_search,
+              label='ELS search'),
+    JsonRoute('/api/search/gematria', 'api_search_gematria', 'gematria', parse_gematria_request,
+              perform_gematria_search, label='Gematria search'),
+    JsonRoute('/api/search/fuzzy', 'api_search_fuzzy', 'fuzzy', parse_fuzzy_request, perform_fuzzy_search,
+              label='Fuzzy search'),
+    JsonRoute('/api/search/occurrences', 'api_search_occurrences', 'occurrences', parse_occurrence_request,
+              perform_occurrence_search, label='Occurrence search'),
+]
+
+def make_json_view(route):
+    """Build the Flask view for a JsonRoute."""
+    def view():
+        try:
+            options, error = route.parse(request.get_json())
+            if error:
+                return jsonify({'error': error, 'success': False}), 400
+            
+            if route.label:
+                logger.info(route.describe(options))
+            result = route.perform(**options)
+            
+            with metrics.timer(STAGE_SECONDS, stage='json_encoding'):
+                return jsonify(result), response_status(result)
+            
+        except Exception as e:
+            logger.error(f"API error: {e}")
+            return jsonify({'error': 'Internal server error', 'success': False}), 500
+    view.__doc__ = route.perform.__doc__
+    return view
+
+for json_route in JSON_ROUTES:
+    app.add_url_rule(json_route.path, json_route.endpoint, make_json_view(json_route), methods=['POST'])
+
+@app.route('/api/search/stream', methods=['POST'])
+def api_search_stream():
+    """Streaming search endpoint: NDJSON records, or Server-Sent Events if requested."""
+    try:
+        options, error = parse_search_request(request.get_json())
+        if error:
+            return jsonify({'error': error, 'success': False}), 400
+    except Exception as e:
+        logger.error(f"API error: {e}")
+        return jsonify({'error': 'Internal server error', 'success': False}), 500
+    
+    logger.info(f"Streaming search request for phrase: {options['input_phrase']}")
+    use_sse = 'text/event-stream' in request.headers.get('Accept', '')
+    
+    chunks = search_stream_chunks(options, use_sse)
+    status = next(chunks)
+    if status != 200:
+        return Response(''.join(chunks), status, mimetype='application/json')
+    mimetype = 'text/event-stream' if use_sse else 'application/x-ndjson'
+    return Response(stream_with_context(chunks), mimetype=mimetype,
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/api/verses', methods=['GET'])
+def api_verses():
+    """Cacheable batch lookup of verse texts for compact search results."""
+    try:
+        options, error = parse_verse_request(request.args)
+        if error:
+            return jsonify({'error': error, 'success': False}), 400
         
-        logger.info(f"Search request for phrase: {phrase}")
-        result = perform_search(phrase)
+        result, etag = get_verses(**options)
+        if etag is None:
+            return jsonify(result), 400
         
-        return jsonify(result)
+        response = jsonify(result)
+        response.set_etag(etag)
+        response.cache_control.public = True
+        response.cache_control.max_age = app.config['CACHE_TIMEOUT']
+        return response.make_conditional(request)
         
     except Exception as e:
         logger.error(f"API error: {e}")
@@ -618,12 +4191,64 @@ def health_check():
 @app.route('/stats')
 def stats():
     """Get application statistics."""
-    lines, _ = load_torah_lines()
-    return jsonify({
-        'torah_lines': len(lines),
+    return jsonify(collect_stats())
+
+def collect_stats():
+    """Return application statistics for /stats."""
+    table = load_verse_table()
+    return {
+        'torah_lines': table.line_count if table else 0,
+        'torah_verses': len(table) if table else 0,
         'max_results': app.config['MAX_RESULTS'],
-        'max_workers': app.config['MAX_WORKERS']
-    })
+        'max_workers': app.config['MAX_WORKERS'],
+        'search_engine': app.config['SEARCH_ENGINE'],
+        'execution_mode': app.config['EXECUTION_MODE'],
+        'corpora': {
+            name: len(_verse_tables[name]) if name in _verse_tables else None
+            for name in get_corpus_registry()
+        },
+        'cache': result_cache.stats(),
+        'matcher_cache': matcher_cache.stats()
+    }
+
+@app.cli.command('build-corpus')
+def build_corpus_command():
+    """Compile every configured corpus into its binary corpus file and signature index, and compare startup times."""
+    for name, text_path in get_corpus_registry().items():
+        corpus_path = corpus_file_path(name)
+        source_sha1 = file_sha1(text_path)
+        
+        def parse_text():
+            table = parse_torah_file(text_path)
+            table.encoded = EncodedCorpus.from_table(table)
+            table.word_index = WordIndex.build(table)
+            return table
+        
+        table = parse_text()
+        write_corpus(table, corpus_path, source_sha1)
+        print(f"Wrote {corpus_path} ({os.path.getsize(corpus_path)} bytes, {len(table)} verses)")
+        
+        # The signature index is saved next to the corpus file so workers only load it
+        signature_index = load_signature_index(table)
+        print(f"Signature index: {sum(len(grams) for grams in signature_index.grams.values())} n-grams")
+        
+        for label, load in (('text parse', parse_text), ('mapped file', lambda: read_corpus(corpus_path))):
+            timings = []
+            for _ in range(5):
+                start = time.perf_counter()
+                load()
+                timings.append(time.perf_counter() - start)
+            print(f"{label:>12}: {min(timings) * 1000:8.1f} ms (best of 5)")
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Prometheus text-format metrics aggregated across all workers."""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@app.teardown_request
+def flush_metrics(error=None):
+    if metrics.request_done():
+        metrics.flush()
 
 @app.errorhandler(404)
 def not_found(error):
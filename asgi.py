@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+"""
+ASGI entry point for async serving
+Requests are handled on an asyncio event loop while searches run in a
+bounded thread pool. Concurrent requests for the same normalized query
+share one in-flight search, and once ASYNC_QUEUE_SIZE distinct searches
+are waiting new ones are rejected with 503, so slow queries cannot starve
+/health or the other cheap endpoints answered on the loop itself.
+
+    gunicorn -c gunicorn.conf.py -k uvicorn.workers.UvicornWorker asgi:app
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import threading
+from urllib.parse import parse_qsl
+from concurrent.futures import ThreadPoolExecutor
+
+# Add the current directory to the Python path
+sys.path.insert(0, os.path.dirname(__file__))
+
+import app_web
+from app_web import (
+    app as flask_app, HTML_TEMPLATE, logger, metrics, parse_search_request, search_stream_chunks,
+    collect_stats, load_verse_table, get_corpus_registry, parse_verse_request, get_verses, response_status
+)
+
+MAX_BODY_SIZE = 1024 * 1024
+
+# POST endpoints are served from the same table the Flask app registers
+JSON_ROUTES = {route.path: route for route in app_web.JSON_ROUTES}
+
+class Overloaded(Exception):
+    """Raised when the search queue is full."""
+
+class SearchQueue:
+    """Run blocking searches in a thread pool with single-flight coalescing.
+
+    At most ``concurrency`` searches run at once and at most ``queue_size``
+    more may wait for a thread; callers asking for a key that is already
+    in flight await the same future instead of taking a slot.
+    """
+
+    def __init__(self, concurrency, queue_size):
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self.executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='search')
+        self._in_flight = {}
+        self._pending = 0
+        self.coalesced = 0
+        self.rejected = 0
+
+    def _admit(self):
+        if self._pending >= self.concurrency + self.queue_size:
+            self.rejected += 1
+            metrics.inc('torah_search_rejected_total')
+            raise Overloaded()
+        self._pending += 1
+
+    def _release(self, _=None):
+        self._pending -= 1
+
+    async def run(self, key, func, *args):
+        """Return ``func(*args)``, sharing the result with concurrent calls for ``key``."""
+        future = self._in_flight.get(key)
+        if future is not None:
+            self.coalesced += 1
+            metrics.inc('torah_search_coalesced_total')
+            return await asyncio.shield(future)
+
+        self._admit()
+        future = asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+        self._in_flight[key] = future
+        future.add_done_callback(self._release)
+        future.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        return await asyncio.shield(future)
+
+    def stream(self, iterator_factory):
+        """Return an async iterator over a blocking iterator produced on a pool thread.
+
+        Admission happens immediately, so an overloaded server can still
+        answer 503 before any response has started. The slot is released
+        once the iterator has been consumed or closed; a caller that never
+        iterates it must call ``_release`` itself.
+        """
+        self._admit()
+        return self._stream(iterator_factory)
+
+    async def _stream(self, iterator_factory):
+        # The producer waits for the consumer through a small bounded queue
+        # and stops at the next item once the consumer goes away
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(maxsize=16)
+        stopped = threading.Event()
+        done = object()
+
+        def produce():
+            iterator = iterator_factory()
+            try:
+                for item in iterator:
+                    if stopped.is_set():
+                        break
+                    asyncio.run_coroutine_threadsafe(queue.put(item), loop).result()
+            finally:
+                close = getattr(iterator, 'close', None)
+                if close:
+                    close()
+                asyncio.run_coroutine_threadsafe(queue.put(done), loop)
+
+        producer = loop.run_in_executor(self.executor, produce)
+        producer.add_done_callback(self._release)
+        try:
+            while True:
+                item = await queue.get()
+                if item is done:
+                    break
+                yield item
+        finally:
+            stopped.set()
+            # Unblock a producer waiting on a full queue
+            while not queue.empty():
+                queue.get_nowait()
+            # The slot is only free once the producer has stopped, so closing releases it
+            await producer
+
+    def stats(self):
+        return {
+            'concurrency': self.concurrency,
+            'queue_size': self.queue_size,
+            'pending': self._pending,
+            'in_flight': len(self._in_flight),
+            'coalesced': self.coalesced,
+            'rejected': self.rejected
+        }
+
+metrics.counter('torah_search_coalesced_total', 'Requests answered by an identical in-flight search.')
+metrics.counter('torah_search_rejected_total', 'Searches rejected because the queue was full.')
+
+search_queue = SearchQueue(
+    flask_app.config['ASYNC_CONCURRENCY'] or os.cpu_count() or 4,
+    flask_app.config['ASYNC_QUEUE_SIZE']
+)
+
+async def read_json(receive):
+    """Read and decode a JSON request body, or return None if it is missing or invalid."""
+    body = bytearray()
+    while True:
+        message = await receive()
+        body.extend(message.get('body', b''))
+        if len(body) > MAX_BODY_SIZE:
+            return None
+        if not message.get('more_body'):
+            break
+    try:
+        return json.loads(body) if body else None
+    except ValueError:
+        return None
+
+def response_headers(content_type, extra=None):
+    headers = [(b'content-type', content_type.encode('latin-1')),
+               (b'access-control-allow-origin', b'*')]
+    for name, value in (extra or {}).items():
+        headers.append((name.lower().encode('latin-1'), str(value).encode('latin-1')))
+    return headers
+
+async def send_body(send, status, body, content_type, headers=None):
+    await send({'type': 'http.response.start', 'status': status,
+                'headers': response_headers(content_type, headers)})
+    await send({'type': 'http.response.body', 'body': body})
+
+def encode_json(data):
+    with metrics.timer(app_web.STAGE_SECONDS, stage='json_encoding'):
+        return flask_app.json.dumps(data).encode('utf-8')
+
+async def send_json(send, data, status=200, headers=None, offload=False):
+    # Large search results are encoded off the event loop
+    if offload:
+        body = await asyncio.get_running_loop().run_in_executor(None, encode_json, data)
+    else:
+        body = encode_json(data)
+    await send_body(send, status, body, 'application/json', headers)
+
+def without_body(send):
+    """Wrap ``send`` so only the response start goes out, as HEAD requires."""
+    async def send_headers(message):
+        if message['type'] != 'http.response.body':
+            await send(message)
+        elif not message.get('more_body'):
+            await send({'type': 'http.response.body', 'body': b''})
+    return send_headers
+
+async def handle_json_route(route, receive, send):
+    options, error = route.parse(await read_json(receive))
+    if error:
+        return await send_json(send, {'error': error, 'success': False}, 400)
+    if not route.queued:
+        # Cheap routes never take a search slot, but may still load a corpus, so
+        # they run off the event loop
+        result = await asyncio.get_running_loop().run_in_executor(None, lambda: route.perform(**options))
+        return await send_json(send, result, response_status(result))
+    logger.info(route.describe(options))
+    result = await search_queue.run(route.key(options), lambda: route.perform(**options))
+    await send_json(send, result, response_status(result), offload=True)
+
+async def handle_verses(scope, send):
+    args = dict(parse_qsl(scope.get('query_string', b'').decode('latin-1')))
+    options, error = parse_verse_request(args)
+    if error:
+        return await send_json(send, {'error': error, 'success': False}, 400)
+    result, etag = await asyncio.get_running_loop().run_in_executor(None, lambda: get_verses(**options))
+    if etag is None:
+        return await send_json(send, result, 400)
+
+    etag = f'"{etag}"'
+    headers = {'ETag': etag, 'Cache-Control': f"public, max-age={flask_app.config['CACHE_TIMEOUT']}"}
+    if_none_match = dict(scope['headers']).get(b'if-none-match', b'').decode('latin-1')
+    if etag in if_none_match or if_none_match.strip() == '*':
+        return await send_body(send, 304, b'', 'application/json', headers)
+    await send_json(send, result, headers=headers)
+
+async def handle_stream(scope, receive, send):
+    options, error = parse_search_request(await read_json(receive))
+    if error:
+        return await send_json(send, {'error': error, 'success': False}, 400)
+    logger.info(f"Streaming search request for phrase: {options['input_phrase']}")
+    accept = dict(scope['headers']).get(b'accept', b'').decode('latin-1')
+    use_sse = 'text/event-stream' in accept
+
+    chunks = search_queue.stream(lambda: search_stream_chunks(options, use_sse))
+    content_type = 'text/event-stream' if use_sse else 'application/x-ndjson'
+    try:
+        # Iterating starts the producer, which releases the slot however the response ends
+        status = await chunks.__anext__()
+        if status != 200:
+            body = ''.join([chunk async for chunk in chunks])
+            return await send_body(send, status, body.encode('utf-8'), 'application/json')
+        await send({'type': 'http.response.start', 'status': 200, 'headers': response_headers(
+            content_type, {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})})
+        async for chunk in chunks:
+            await send({'type': 'http.response.body', 'body': chunk.encode('utf-8'), 'more_body': True})
+    finally:
+        await chunks.aclose()
+    await send({'type': 'http.response.body', 'body': b''})
+
+async def handle_http(scope, receive, send):
+    method, path = scope['method'], scope['path']
+    loop = asyncio.get_running_loop()
+
+    if method == 'OPTIONS':
+        return await send_body(send, 204, b'', 'text/plain', {
+            'Access-Control-Allow-Methods': 'GET, POST, OPTIONS',
+            'Access-Control-Allow-Headers': 'Content-Type'
+        })
+    if path == '/health' and method in ('GET', 'HEAD'):
+        return await send_json(send, {'status': 'healthy', 'timestamp': time.time(),
+                                      'queue': search_queue.stats()})
+    if path == '/' and method in ('GET', 'HEAD'):
+        return await send_body(send, 200, HTML_TEMPLATE.encode('utf-8'), 'text/html; charset=utf-8')
+    if path == '/stats' and method in ('GET', 'HEAD'):
+        stats = await loop.run_in_executor(None, collect_stats)
+        stats['async'] = search_queue.stats()
+        return await send_json(send, stats)
+    if path == '/metrics' and method in ('GET', 'HEAD'):
+        body = await loop.run_in_executor(None, metrics.render)
+        return await send_body(send, 200, body.encode('utf-8'), 'text/plain; version=0.0.4; charset=utf-8')
+    if path == '/api/verses' and method in ('GET', 'HEAD'):
+        return await handle_verses(scope, send)
+    if method == 'POST' and path in JSON_ROUTES:
+        return await handle_json_route(JSON_ROUTES[path], receive, send)
+    if method == 'POST' and path == '/api/search/stream':
+        return await handle_stream(scope, receive, send)
+    await send_json(send, {'error': 'Endpoint not found'}, 404)
+
+async def handle_lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            # Load every corpus before the first request instead of during it
+            for name in get_corpus_registry():
+                await asyncio.get_running_loop().run_in_executor(search_queue.executor, load_verse_table, name)
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            search_queue.executor.shutdown(wait=False, cancel_futures=True)
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+async def app(scope, receive, send):
+    """ASGI application."""
+    if scope['type'] == 'lifespan':
+        return await handle_lifespan(receive, send)
+    if scope['type'] != 'http':
+        return
+
+    if scope['method'] == 'HEAD':
+        send = without_body(send)
+    try:
+        await handle_http(scope, receive, send)
+    except Overloaded:
+        await send_json(send, {'error': 'Server busy, retry shortly', 'success': False}, 503,
+                        {'Retry-After': 1})
+    except Exception as e:
+        logger.error(f"API error: {e}")
+        await send_json(send, {'error': 'Internal server error', 'success': False}, 500)
+    finally:
+        if metrics.request_done():
+            asyncio.get_running_loop().run_in_executor(None, metrics.flush)
+
+if __name__ == '__main__':
+    import uvicorn
+    uvicorn.run(app, host='0.0.0.0', port=8000)
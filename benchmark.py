@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""
+Search pipeline benchmark
+Runs the search stages (variant generation, automaton construction, scan,
+result formatting, ELS skip search and batch versus sequential API
+searches) against the bundled torah.txt over a matrix of phrase lengths,
+letter mixes, engines and worker counts, and writes the measurements to a
+JSON file that can be compared across runs.
+
+Usage:
+    python benchmark.py --output before.json
+    python benchmark.py --output after.json --compare before.json
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import argparse
+import platform
+import statistics
+import subprocess
+import tracemalloc
+from collections import Counter
+
+# Benchmarks must never be answered from the shared result cache
+os.environ['CACHE_TIMEOUT'] = '0'
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+import app_web
+
+DEFAULT_LENGTHS = [2, 3, 4, 5, 6, 8]
+DEFAULT_ENGINES = ['class', 'bitap', 'suffix', 'aho']
+# Aho-Corasick stages are skipped above this many variants
+DEFAULT_MAX_VARIANTS = 500000
+# Skip range of the ELS stage
+DEFAULT_ELS_SKIPS = (2, 50)
+
+def select_phrases(table, lengths, per_mix):
+    """Pick frequent corpus words per length, split by how many map options their letters have.
+
+    'dense' words use letters with many conversion options, 'sparse' words
+    letters with few; the selection is deterministic for a given corpus.
+    """
+    words = Counter()
+    for i in range(len(table)):
+        words.update(table.verse_text(i).replace(':', '').split())
+
+    phrases = []
+    for length in lengths:
+        candidates = [word for word, _ in words.most_common() if len(word) == length][:200]
+        candidates.sort(key=lambda word: (app_web.count_variants(word) ** (1 / length), word))
+        for mix, chosen in (('sparse', candidates[:per_mix]), ('dense', candidates[-per_mix:])):
+            for phrase in chosen:
+                phrases.append({'phrase': phrase, 'length': length, 'mix': mix})
+    return phrases
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+def peak_memory(func, *args):
+    """Peak traced Python allocation of one call, in KiB."""
+    tracemalloc.start()
+    try:
+        func(*args)
+        return tracemalloc.get_traced_memory()[1] / 1024
+    finally:
+        tracemalloc.stop()
+
+def summarize(samples):
+    """Latency percentiles and throughput for a list of durations in seconds."""
+    ordered = sorted(samples)
+    if len(ordered) > 1:
+        percentiles = statistics.quantiles(ordered, n=100, method='inclusive')
+        p50, p99 = percentiles[49], percentiles[98]
+    else:
+        p50 = p99 = ordered[0]
+    mean = statistics.fmean(ordered)
+    return {
+        'samples': len(ordered),
+        'mean_ms': round(mean * 1000, 3),
+        'p50_ms': round(p50 * 1000, 3),
+        'p99_ms': round(p99 * 1000, 3),
+        'throughput_per_s': round(1 / mean, 3) if mean > 0 else None
+    }
+
+class Recorder:
+    """Collect samples keyed by (stage, engine, length, mix, workers)."""
+
+    def __init__(self):
+        self.samples = {}
+        self.memory = {}
+        self.extra = {}
+
+    def add(self, key, duration, **extra):
+        self.samples.setdefault(key, []).append(duration)
+        for name, value in extra.items():
+            self.extra.setdefault(key, {}).setdefault(name, []).append(value)
+
+    def track(self, key, memory_kb):
+        self.memory[key] = max(self.memory.get(key, 0), memory_kb)
+
+    def results(self, corpus_chars):
+        rows = []
+        for key, samples in self.samples.items():
+            stage, engine, length, mix, workers = key
+            row = {'stage': stage, 'engine': engine, 'length': length, 'mix': mix, 'workers': workers}
+            row.update(summarize(samples))
+            if stage == 'scan':
+                row['chars_per_s'] = round(corpus_chars * row['throughput_per_s'])
+            if key in self.memory:
+                row['peak_memory_kb'] = round(self.memory[key], 1)
+            for name, values in self.extra.get(key, {}).items():
+                row[name] = round(statistics.fmean(values), 3)
+            rows.append(row)
+        rows.sort(key=lambda row: (row['stage'], row['engine'] or '', row['length'], row['mix'], row['workers'] or 0))
+        return rows
+
+def scan(table, phrase, engine, execution='thread'):
+    return list(app_web.iter_search_hits(table, phrase, engine, execution))
+
+def format_hits(table, hits):
+    grouped_matches = app_web.group_matches(table, hits)
+    return json.dumps(app_web.format_results(grouped_matches), ensure_ascii=False)
+
+def run_pipeline(table, phrases, engines, repeat, max_variants, recorder):
+    """Time every stage for every phrase and engine."""
+    for item in phrases:
+        phrase, length, mix = item['phrase'], item['length'], item['mix']
+        space = app_web.count_variants(phrase)
+
+        hits = []
+        for _ in range(repeat):
+            if space <= max_variants:
+                duration, variants = timed(app_web.generate_all_variants, phrase)
+                recorder.add(('variants', None, length, mix, None), duration, variant_count=space)
+                duration, _ = timed(app_web.build_automaton, variants)
+                recorder.add(('automaton', None, length, mix, None), duration, variant_count=space)
+
+            for engine in engines:
+                if engine == 'aho' and space > max_variants:
+                    continue
+                duration, hits = timed(scan, table, phrase, engine)
+                recorder.add(('scan', engine, length, mix, None), duration, hit_count=len(hits))
+
+            duration, _ = timed(format_hits, table, hits)
+            recorder.add(('format', None, length, mix, None), duration, hit_count=len(hits))
+
+        # One traced run per stage for peak memory, kept out of the timings
+        if space <= max_variants:
+            variants = app_web.generate_all_variants(phrase)
+            recorder.track(('variants', None, length, mix, None),
+                           peak_memory(app_web.generate_all_variants, phrase))
+            recorder.track(('automaton', None, length, mix, None),
+                           peak_memory(app_web.build_automaton, variants))
+        for engine in engines:
+            if engine == 'aho' and space > max_variants:
+                continue
+            recorder.track(('scan', engine, length, mix, None), peak_memory(scan, table, phrase, engine))
+        recorder.track(('format', None, length, mix, None), peak_memory(format_hits, table, hits))
+
+def run_workers(table, phrases, worker_counts, repeat, max_variants, recorder):
+    """Time thread-batched Aho-Corasick and process-pool scans per worker count."""
+    cpu_count = os.cpu_count() or 1
+    for workers in worker_counts:
+        app_web.app.config['MAX_WORKERS'] = workers
+        app_web.app.config['SCAN_PROCESSES'] = workers
+        for scanner in app_web._process_scanners.values():
+            scanner.shutdown()
+        app_web._process_scanners.clear()
+        # Warm up the pool so process start-up is not measured
+        scan(table, phrases[0]['phrase'], 'class', 'process')
+
+        for item in phrases:
+            phrase, length, mix = item['phrase'], item['length'], item['mix']
+            for _ in range(repeat):
+                duration, _ = timed(scan, table, phrase, 'class', 'process')
+                recorder.add(('scan', 'class-process', length, mix, workers), duration)
+                if app_web.count_variants(phrase) <= max_variants:
+                    automaton = app_web.build_automaton(app_web.generate_all_variants(phrase))
+                    duration, _ = timed(list, app_web.iter_reference_parallel(
+                        automaton, table, len(phrase.replace(' ', '')), phrase))
+                    recorder.add(('scan', 'aho-threads', length, mix, workers), duration)
+        if workers > cpu_count:
+            print(f"note: {workers} workers exceeds the {cpu_count} available CPUs", file=sys.stderr)
+
+    for scanner in app_web._process_scanners.values():
+        scanner.shutdown()
+    app_web._process_scanners.clear()
+
+def run_els(table, phrases, skips, repeat, recorder):
+    """Time ELS searches, recording throughput as skips x positions per second."""
+    min_skip, max_skip = skips
+    for item in phrases:
+        phrase, length, mix = item['phrase'], item['length'], item['mix']
+        for _ in range(repeat):
+            duration, (hits, hit_count, positions) = timed(app_web.search_els, table, phrase, min_skip, max_skip)
+            recorder.add(('els', None, length, mix, None), duration, hit_count=hit_count,
+                         skip_positions_per_s=positions / duration)
+
+def select_bigrams(table, count):
+    """Pick the most frequent two-word phrases of the corpus."""
+    bigrams = Counter()
+    for i in range(len(table)):
+        words = table.verse_text(i).replace(':', '').split()
+        bigrams.update(' '.join(pair) for pair in zip(words, words[1:]))
+    return [phrase for phrase, _ in bigrams.most_common(count)]
+
+def run_batch(table, phrase_sets, repeat, recorder):
+    """Time one perform_batch_search call against the same phrases searched one by one.
+
+    Both go through the API functions, so routing, formatting and cache
+    lookups (disabled here) are included; ``mix`` names the phrase set.
+    """
+    for mix, phrases in phrase_sets.items():
+        for _ in range(repeat):
+            duration, _ = timed(lambda: [app_web.perform_search(phrase) for phrase in phrases])
+            recorder.add(('batch', 'sequential', 0, mix, None), duration, phrase_count=len(phrases))
+            duration, _ = timed(app_web.perform_batch_search, phrases)
+            recorder.add(('batch', 'batch', 0, mix, None), duration, phrase_count=len(phrases))
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+def compare(current, baseline_path):
+    """Print p50 latency changes against a previous run."""
+    with open(baseline_path, encoding='utf-8') as f:
+        baseline = json.load(f)
+
+    def key(row):
+        return row['stage'], row['engine'], row['length'], row['mix'], row['workers']
+
+    previous = {key(row): row for row in baseline['results']}
+    print(f"\n{'stage':<10} {'engine':<14} {'len':>3} {'mix':<6} {'wrk':>3} "
+          f"{'p50 before':>11} {'p50 after':>10} {'change':>8}")
+    for row in current['results']:
+        old = previous.get(key(row))
+        if not old:
+            continue
+        change = (row['p50_ms'] / old['p50_ms'] - 1) * 100 if old['p50_ms'] else 0.0
+        print(f"{row['stage']:<10} {row['engine'] or '-':<14} {row['length']:>3} {row['mix']:<6} "
+              f"{row['workers'] or '-':>3} {old['p50_ms']:>11.3f} {row['p50_ms']:>10.3f} {change:>+7.1f}%")
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the Torah search pipeline')
+    parser.add_argument('--output', default='benchmark_results.json', help='JSON file to write')
+    parser.add_argument('--compare', help='previous JSON results to compare against')
+    parser.add_argument('--lengths', type=int, nargs='+', default=DEFAULT_LENGTHS)
+    parser.add_argument('--engines', nargs='+', default=DEFAULT_ENGINES, choices=app_web.SEARCH_ENGINES)
+    parser.add_argument('--phrases-per-mix', type=int, default=2)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--workers', type=int, nargs='*',
+                        help='worker counts to measure (default: powers of two up to the CPU count)')
+    parser.add_argument('--batch-size', type=int, default=20,
+                        help='phrases per batch in the batch stage (0 skips it)')
+    parser.add_argument('--max-variants', type=int, default=DEFAULT_MAX_VARIANTS)
+    parser.add_argument('--els-skips', type=int, nargs=2, default=DEFAULT_ELS_SKIPS, metavar=('MIN', 'MAX'),
+                        help='skip range of the ELS stage (MAX 0 skips it)')
+    args = parser.parse_args()
+
+    duration, table = timed(app_web.load_verse_table)
+    if not table:
+        sys.exit(f"Torah file not found: {app_web.app.config['TORAH_FILE']}")
+
+    worker_counts = args.workers
+    if worker_counts is None:
+        cpu_count = os.cpu_count() or 1
+        worker_counts = sorted({2 ** i for i in range(int(math.log2(cpu_count)) + 1)} | {cpu_count})
+
+    phrases = select_phrases(table, args.lengths, args.phrases_per_mix)
+    recorder = Recorder()
+    recorder.add(('corpus_load', None, 0, '-', None), duration)
+
+    print(f"Benchmarking {len(phrases)} phrases x {len(args.engines)} engines, repeat={args.repeat}",
+          file=sys.stderr)
+    run_pipeline(table, phrases, args.engines, args.repeat, args.max_variants, recorder)
+    if args.els_skips[1]:
+        run_els(table, [item for item in phrases if item['length'] >= 3], args.els_skips, args.repeat, recorder)
+    if args.batch_size:
+        words = [item['phrase'] for item in phrases][:args.batch_size]
+        run_batch(table, {'words': words, 'bigrams': select_bigrams(table, args.batch_size)}, args.repeat, recorder)
+    if worker_counts:
+        worker_phrases = [item for item in phrases if item['length'] in (min(args.lengths), max(args.lengths))]
+        run_workers(table, worker_phrases, worker_counts, args.repeat, args.max_variants, recorder)
+
+    report = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'revision': git_revision(),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'corpus_chars': len(table.text),
+            'corpus_verses': len(table),
+            'repeat': args.repeat,
+            'phrases': phrases
+        },
+        'results': recorder.results(len(table.text))
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"Wrote {len(report['results'])} measurements to {args.output}", file=sys.stderr)
+
+    if args.compare:
+        compare(report, args.compare)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""
+Binary corpus file
+A precompiled form of the corpus: fixed-width sections (encoded letters,
+verse offsets, reference ids) laid out 8-byte aligned after a small JSON
+header. Readers memory-map the file read-only and get memoryviews into it,
+so every worker process shares the same physical pages instead of holding
+its own copy of the parsed text.
+"""
+
+import os
+import json
+import mmap
+import struct
+
+MAGIC = b'TSODCORP'
+VERSION = 1
+# magic, format version, header length
+PREAMBLE = struct.Struct('<8sII')
+
+def _align(offset):
+    return offset + (-offset % 8)
+
+def write_corpus_file(path, meta, sections):
+    """Write a corpus file.
+
+    ``meta`` is a JSON-serializable dict stored in the header and
+    ``sections`` maps a name to ``(format, data)``, where ``format`` is a
+    struct format character (e.g. 'B', 'I', 'q') and ``data`` a buffer of
+    items of that format.
+    """
+    layout = {}
+    payloads = []
+    offset = 0
+    for name, (fmt, data) in sections.items():
+        payload = memoryview(data).cast('B')
+        layout[name] = {'format': fmt, 'offset': offset, 'count': len(payload) // struct.calcsize(fmt)}
+        payloads.append(payload)
+        offset = _align(offset + len(payload))
+
+    header = json.dumps({'meta': meta, 'sections': layout}, ensure_ascii=False).encode('utf-8')
+    header += b' ' * (-(PREAMBLE.size + len(header)) % 8)
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(PREAMBLE.pack(MAGIC, VERSION, len(header)))
+        f.write(header)
+        for payload in payloads:
+            f.write(payload)
+            f.write(b'\0' * (-len(payload) % 8))
+    os.replace(tmp_path, path)
+
+def read_corpus_file(path):
+    """Memory-map a corpus file read-only.
+
+    Returns ``(meta, sections)`` with each section as a memoryview of its
+    format. Raises ValueError if the file is not a corpus file of this
+    version, and OSError if it cannot be read.
+    """
+    with open(path, 'rb') as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    view = memoryview(buffer)
+    if len(view) < PREAMBLE.size:
+        raise ValueError(f'Truncated corpus file: {path}')
+    magic, version, header_length = PREAMBLE.unpack_from(view)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f'Not a version {VERSION} corpus file: {path}')
+
+    body = PREAMBLE.size + header_length
+    header = json.loads(bytes(view[PREAMBLE.size:body]).decode('utf-8'))
+    sections = {}
+    for name, section in header['sections'].items():
+        start = body + section['offset']
+        end = start + section['count'] * struct.calcsize(section['format'])
+        if end > len(view):
+            raise ValueError(f'Truncated corpus file: {path}')
+        sections[name] = view[start:end].cast(section['format'])
+    return header['meta'], sections
@@ -11,7 +11,8 @@ backlog = 2048
 
 # Worker processes
 workers = multiprocessing.cpu_count() * 2 + 1
-worker_class = "sync"
+# Set to uvicorn.workers.UvicornWorker (with asgi:app) for async serving
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "sync")
 worker_connections = 1000
 timeout = 30
 keepalive = 2
@@ -41,3 +42,16 @@ tmp_upload_dir = None
 limit_request_line = 4094
 limit_request_fields = 100
 limit_request_field_size = 8190
+
+# Server hooks
+def when_ready(server):
+    # With preload_app the corpora are loaded once here, before the workers
+    # fork, so every worker shares the decoded text and vocabulary pages
+    import app_web
+    for name in app_web.get_corpus_registry():
+        app_web.load_verse_table(name)
+
+def worker_exit(server, worker):
+    # Metrics are flushed periodically; write what the worker still holds
+    import app_web
+    app_web.metrics.flush()
@@ -0,0 +1,161 @@
+"""
+Compiled matcher cache
+Compiled matchers are kept in a bounded in-memory LRU, evicted by their
+memory footprint, in front of a directory of pickled matchers shared by
+all gunicorn workers, so a phrase's variants are generated and compiled
+once instead of on every request.
+"""
+
+import os
+import time
+import pickle
+import logging
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+class MatcherCache:
+    """Two-level cache of compiled matchers keyed by query.
+
+    ``get`` looks in memory, then on disk, and finally calls ``build``.
+    Only matchers whose build took at least ``min_persist_seconds`` are
+    written to disk, since cheaper ones are faster to rebuild than to load.
+    The disk store is trimmed to ``max_disk_bytes`` by least recent use.
+    """
+
+    def __init__(self, directory, max_bytes, max_disk_bytes, min_persist_seconds=0.05, sizeof=None):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.min_persist_seconds = min_persist_seconds
+        self.sizeof = sizeof or (lambda matcher: 0)
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.build_seconds = 0.0
+        self.seconds_saved = 0.0
+
+    def _path(self, key):
+        return os.path.join(self.directory, f'{key}.pkl')
+
+    def _remember(self, key, matcher, build_seconds):
+        size = self.sizeof(matcher)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                return
+            self._entries[key] = (matcher, size, build_seconds)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, evicted_size, _) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+
+    def _load(self, key):
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                build_seconds, matcher = pickle.load(f)
+            os.utime(path)
+            return matcher, build_seconds
+        except FileNotFoundError:
+            return None
+        except (OSError, pickle.UnpicklingError, EOFError, ValueError, TypeError) as e:
+            logger.warning(f"Discarding unreadable matcher {path}: {e}")
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+
+    def _store(self, key, matcher, build_seconds):
+        path = self._path(key)
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+            with open(tmp_path, 'wb') as f:
+                pickle.dump((build_seconds, matcher), f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+            self._trim_disk()
+        except OSError as e:
+            logger.warning(f"Matcher store failed: {e}")
+
+    def _trim_disk(self):
+        files = []
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if entry.name.endswith('.pkl'):
+                    stat = entry.stat()
+                    files.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_disk_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def get(self, key, build):
+        """Return ``(matcher, outcome, seconds_saved)``.
+
+        ``outcome`` is 'memory', 'disk' or 'build'; ``seconds_saved`` is the
+        recorded build time minus the time spent loading instead.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                matcher, _, build_seconds = entry
+                self.memory_hits += 1
+                self.seconds_saved += build_seconds
+                return matcher, 'memory', build_seconds
+
+        start = time.perf_counter()
+        loaded = self._load(key)
+        if loaded is not None:
+            matcher, build_seconds = loaded
+            saved = max(build_seconds - (time.perf_counter() - start), 0.0)
+            with self._lock:
+                self.disk_hits += 1
+                self.seconds_saved += saved
+            self._remember(key, matcher, build_seconds)
+            return matcher, 'disk', saved
+
+        start = time.perf_counter()
+        matcher = build()
+        build_seconds = time.perf_counter() - start
+        with self._lock:
+            self.misses += 1
+            self.build_seconds += build_seconds
+        self._remember(key, matcher, build_seconds)
+        if build_seconds >= self.min_persist_seconds:
+            self._store(key, matcher, build_seconds)
+        return matcher, 'build', 0.0
+
+    def clear(self):
+        """Drop the in-memory entries (the disk store is left in place)."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        """Return this process's hit rates, occupancy and build time saved."""
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'memory_hits': self.memory_hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'hit_rate': round((self.memory_hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+                'build_seconds': round(self.build_seconds, 3),
+                'build_seconds_saved': round(self.seconds_saved, 3)
+            }
@@ -0,0 +1,207 @@
+"""
+Search metrics
+Counters and histograms are accumulated in memory by each worker and
+flushed to an SQLite file shared by all gunicorn worker processes, so the
+/metrics endpoint reports server-wide totals in the Prometheus text format.
+"""
+
+import os
+import math
+import time
+import sqlite3
+import logging
+import threading
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+TIME_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (1, 10, 100, 1000, 10000, 100000, 1000000, 10000000, 100000000)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS samples (
+    family TEXT NOT NULL,
+    suffix TEXT NOT NULL,
+    labels TEXT NOT NULL,
+    le REAL NOT NULL,
+    value REAL NOT NULL,
+    PRIMARY KEY (family, suffix, labels, le)
+);
+"""
+
+def format_labels(labels):
+    """Render label pairs as the inside of a Prometheus label set."""
+    def escape(value):
+        return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return ','.join(f'{name}="{escape(value)}"' for name, value in sorted(labels.items()))
+
+def format_value(value):
+    if math.isinf(value):
+        return '+Inf'
+    return repr(int(value)) if value == int(value) else repr(value)
+
+class Metrics:
+    """Counters and histograms shared across worker processes.
+
+    Observations only touch an in-memory dict; ``flush`` folds them into
+    the shared file in one transaction. Pending values inherited through a
+    fork are dropped so they are not counted once per worker.
+
+    Requests do not flush one by one, which would serialize every worker on
+    the file's write lock: ``request_done`` asks for a flush once
+    ``flush_requests`` requests have finished, and a background thread per
+    process flushes every ``flush_interval`` seconds.
+    """
+
+    def __init__(self, path, enabled=True, flush_interval=5.0, flush_requests=100):
+        self.path = path
+        self.enabled = enabled
+        self.flush_interval = flush_interval
+        self.flush_requests = flush_requests
+        self._families = {}
+        self._pending = {}
+        self._pending_pid = os.getpid()
+        self._requests = 0
+        self._flusher_pid = None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def counter(self, name, documentation):
+        # Counter names carry their _total suffix, as in the 0.0.4 text format
+        self._families[name] = ('counter', documentation, None)
+
+    def histogram(self, name, documentation, buckets=TIME_BUCKETS):
+        self._families[name] = ('histogram', documentation, tuple(buckets) + (math.inf,))
+
+    def _add(self, family, suffix, labels, le, amount):
+        key = (family, suffix, labels, le)
+        with self._lock:
+            if self._pending_pid != os.getpid():
+                self._pending = {}
+                self._pending_pid = os.getpid()
+            self._pending[key] = self._pending.get(key, 0) + amount
+
+    def inc(self, name, amount=1, **labels):
+        """Increment a counter."""
+        if self.enabled:
+            self._add(name, '', format_labels(labels), 0, amount)
+
+    def observe(self, name, value, **labels):
+        """Record one histogram observation."""
+        if not self.enabled:
+            return
+        label_text = format_labels(labels)
+        # Buckets are cumulative; empty ones are still written so every series is complete
+        for le in self._families[name][2]:
+            self._add(name, '_bucket', label_text, le, 1 if value <= le else 0)
+        self._add(name, '_sum', label_text, 0, value)
+        self._add(name, '_count', label_text, 0, 1)
+
+    @contextmanager
+    def timer(self, name, **labels):
+        """Observe the duration of a block in seconds."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def _connect(self):
+        # Connections are per thread and must not survive a fork
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.executescript(SCHEMA)
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    def request_done(self):
+        """Count a finished request, returning True once a flush is due.
+
+        The first call in each process starts its periodic flusher thread.
+        """
+        if not self.enabled:
+            return False
+        with self._lock:
+            if self._flusher_pid != os.getpid():
+                self._flusher_pid = os.getpid()
+                self._requests = 0
+                if self.flush_interval > 0:
+                    threading.Thread(target=self._flush_periodically, name='metrics-flush', daemon=True).start()
+            self._requests += 1
+            return self._requests >= self.flush_requests
+
+    def _flush_periodically(self):
+        pid = os.getpid()
+        while self._flusher_pid == pid:
+            time.sleep(self.flush_interval)
+            self.flush()
+
+    def flush(self):
+        """Fold pending observations into the shared file."""
+        with self._lock:
+            if self._pending_pid != os.getpid():
+                self._pending = {}
+                self._pending_pid = os.getpid()
+            pending, self._pending = self._pending, {}
+            self._requests = 0
+        if not pending:
+            return
+        try:
+            conn = self._connect()
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                conn.executemany(
+                    'INSERT INTO samples (family, suffix, labels, le, value) VALUES (?, ?, ?, ?, ?) '
+                    'ON CONFLICT(family, suffix, labels, le) DO UPDATE SET value = value + excluded.value',
+                    [(*key, value) for key, value in pending.items()]
+                )
+                conn.execute('COMMIT')
+            except sqlite3.Error:
+                conn.execute('ROLLBACK')
+                raise
+        except sqlite3.Error as e:
+            logger.warning(f"Metrics flush failed: {e}")
+
+    def render(self):
+        """Return all metrics in the Prometheus text exposition format."""
+        self.flush()
+        rows = []
+        if self.enabled:
+            try:
+                rows = self._connect().execute(
+                    'SELECT family, suffix, labels, le, value FROM samples ORDER BY family, labels, suffix, le'
+                ).fetchall()
+            except sqlite3.Error as e:
+                logger.warning(f"Metrics read failed: {e}")
+
+        lines = []
+        current = None
+        for family, suffix, labels, le, value in rows:
+            if family not in self._families:
+                continue
+            if family != current:
+                kind, documentation, _ = self._families[family]
+                lines.append(f'# HELP {family} {documentation}')
+                lines.append(f'# TYPE {family} {kind}')
+                current = family
+            if suffix == '_bucket':
+                le_label = f'le="{format_value(le)}"'
+                labels = f'{labels},{le_label}' if labels else le_label
+            label_set = f'{{{labels}}}' if labels else ''
+            lines.append(f'{family}{suffix}{label_set} {format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+    def clear(self):
+        """Drop pending and stored samples."""
+        with self._lock:
+            self._pending = {}
+        self._connect().execute('DELETE FROM samples')
@@ -0,0 +1,211 @@
+"""
+Shared search result cache
+An SQLite-backed store with TTL expiry and LRU eviction, shared by all
+gunicorn worker processes through a single file on local disk.
+"""
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    created REAL NOT NULL,
+    accessed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed);
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+def make_cache_key(**options):
+    """Build a cache key from normalized search options."""
+    payload = json.dumps(options, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+class ResultCache:
+    """TTL-bounded LRU cache of JSON-serializable results.
+
+    Entries older than ``ttl`` seconds are treated as misses and removed;
+    once more than ``max_entries`` are stored the least recently read ones
+    are evicted. Hit and miss counters live in the same file so they are
+    aggregated across workers.
+
+    Reads stay read-only in the common case: an entry's access time is only
+    refreshed once it is ``touch_interval`` seconds old, and hit/miss counts
+    are kept in memory until ``counter_batch`` lookups have accumulated or
+    the next ``set`` takes the write lock anyway.
+    """
+
+    def __init__(self, path, ttl, max_entries, touch_interval=60, counter_batch=100):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.touch_interval = touch_interval
+        self.counter_batch = counter_batch
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._pending_pid = os.getpid()
+        self._failed = False
+
+    @property
+    def enabled(self):
+        return self.ttl > 0 and self.max_entries > 0
+
+    def _connect(self):
+        # Connections are per thread and must not survive a fork
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.executescript(SCHEMA)
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    def _warn(self, action, error):
+        # A missing or unwritable cache directory fails on every call; say so once
+        if self._failed:
+            logger.debug(f"Result cache {action} failed: {error}")
+            return
+        self._failed = True
+        logger.warning(f"Result cache {action} failed: {error}")
+
+    def _count(self, name):
+        """Record a hit or miss, returning True once a batch is due for writing."""
+        with self._lock:
+            if self._pending_pid != os.getpid():
+                # Counts inherited from the parent process were not ours
+                self._pending, self._pending_pid = {}, os.getpid()
+            self._pending[name] = self._pending.get(name, 0) + 1
+            return sum(self._pending.values()) >= self.counter_batch
+
+    def _take_counts(self):
+        with self._lock:
+            if self._pending_pid != os.getpid():
+                self._pending, self._pending_pid = {}, os.getpid()
+            pending, self._pending = self._pending, {}
+            return pending
+
+    def _write_counts(self, conn, counts):
+        conn.executemany(
+            'INSERT INTO counters (name, value) VALUES (?, ?) '
+            'ON CONFLICT(name) DO UPDATE SET value = value + excluded.value',
+            [(name, value) for name, value in counts.items() if value]
+        )
+
+    def _flush_counts(self, conn):
+        counts = self._take_counts()
+        try:
+            self._write_counts(conn, counts)
+        except sqlite3.Error:
+            # Keep the counts for the next attempt
+            with self._lock:
+                for name, value in counts.items():
+                    self._pending[name] = self._pending.get(name, 0) + value
+            raise
+
+    def get(self, key):
+        """Return the cached value for key, or None on a miss."""
+        if not self.enabled:
+            return None
+        try:
+            conn = self._connect()
+            now = time.time()
+            row = conn.execute('SELECT value, created, accessed FROM entries WHERE key = ?', (key,)).fetchone()
+            if row is not None and now - row[1] > self.ttl:
+                # Left for the next set() to delete, so a miss needs no write lock
+                row = None
+
+            flush = self._count('hits' if row is not None else 'misses')
+            if row is not None and now - row[2] >= self.touch_interval:
+                conn.execute('UPDATE entries SET accessed = ? WHERE key = ?', (now, key))
+            if flush:
+                self._flush_counts(conn)
+            return json.loads(row[0]) if row is not None else None
+        except (sqlite3.Error, OSError) as e:
+            self._warn('read', e)
+            return None
+
+    def set(self, key, value):
+        """Store a value and evict expired and least recently used entries."""
+        if not self.enabled:
+            return
+        try:
+            conn = self._connect()
+            now = time.time()
+            payload = json.dumps(value, ensure_ascii=False)
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                conn.execute(
+                    'INSERT OR REPLACE INTO entries (key, value, created, accessed) VALUES (?, ?, ?, ?)',
+                    (key, payload, now, now)
+                )
+                conn.execute('DELETE FROM entries WHERE created < ?', (now - self.ttl,))
+                conn.execute(
+                    'DELETE FROM entries WHERE key IN ('
+                    'SELECT key FROM entries ORDER BY accessed DESC LIMIT -1 OFFSET ?)',
+                    (self.max_entries,)
+                )
+                self._flush_counts(conn)
+                conn.execute('COMMIT')
+            except sqlite3.Error:
+                conn.execute('ROLLBACK')
+                raise
+        except (sqlite3.Error, OSError) as e:
+            self._warn('write', e)
+
+    def clear(self):
+        """Remove every entry and reset the counters."""
+        conn = self._connect()
+        conn.execute('DELETE FROM entries')
+        conn.execute('DELETE FROM counters')
+        self._take_counts()
+
+    def stats(self):
+        """Return hit/miss counters and occupancy.
+
+        Counts not yet written by this process are included; other workers'
+        unwritten counts show up once they reach ``counter_batch``.
+        """
+        stats = {
+            'enabled': self.enabled,
+            'ttl': self.ttl,
+            'max_entries': self.max_entries,
+            'entries': 0,
+            'hits': 0,
+            'misses': 0
+        }
+        if not self.enabled:
+            return stats
+        try:
+            conn = self._connect()
+            stats['entries'] = conn.execute('SELECT COUNT(*) FROM entries').fetchone()[0]
+            for name, value in conn.execute('SELECT name, value FROM counters'):
+                stats[name] = value
+        except (sqlite3.Error, OSError) as e:
+            self._warn('stats', e)
+        with self._lock:
+            if self._pending_pid == os.getpid():
+                for name, value in self._pending.items():
+                    stats[name] = stats.get(name, 0) + value
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / lookups, 4) if lookups else 0.0
+        return stats
@@ -0,0 +1,120 @@
+"""
+Process-pool corpus scanning
+The encoded corpus (one byte per character plus verse start offsets) is
+written once to a scan buffer file that worker processes memory-map
+read-only, so every process shares the same physical pages. Workers only
+receive a compiled byte pattern and return compact arrays of hit offsets.
+"""
+
+import os
+import re
+import mmap
+import logging
+import multiprocessing
+from array import array
+from bisect import bisect_right
+from concurrent.futures import ProcessPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# Per-process view of the scan buffer, set by attach_scan_buffer
+_codes = None
+_starts = None
+
+def write_scan_buffer(path, codes, starts):
+    """Write encoded codes followed by int64 verse starts to a scan buffer file."""
+    if os.path.exists(path):
+        return
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(bytes(codes))
+        f.write(b'\0' * (-len(codes) % 8))
+        f.write(array('q', starts).tobytes())
+    os.replace(tmp_path, path)
+
+def attach_scan_buffer(path, code_count, start_count):
+    """Memory-map a scan buffer file in the current process."""
+    global _codes, _starts
+    with open(path, 'rb') as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    view = memoryview(buffer)
+    offset = code_count + (-code_count % 8)
+    _codes = view[:code_count]
+    _starts = view[offset:offset + 8 * start_count].cast('q')
+
+def scan_verses(pattern, phrase_codes, first_verse, last_verse):
+    """Scan verses [first_verse, last_verse) and return first-hit offsets.
+
+    Occurrences of phrase_codes (the unmapped input phrase, or None if it
+    cannot occur) are skipped and at most one offset is returned per verse.
+    """
+    regex = re.compile(pattern)
+    codes, starts = _codes, _starts
+    length = len(phrase_codes) if phrase_codes is not None else 0
+    pos = starts[first_verse]
+    end = starts[last_verse]
+    verse = first_verse
+    hits = array('q')
+
+    while True:
+        match = regex.search(codes, pos, end)
+        if not match:
+            break
+        start = match.start()
+        if phrase_codes is not None and codes[start:start + length] == phrase_codes:
+            pos = start + 1
+            continue
+        verse = bisect_right(starts, start, verse) - 1
+        hits.append(start)
+        pos = starts[verse + 1]
+
+    return hits
+
+class ProcessScanner:
+    """Fan a byte-pattern scan out over a pool of processes.
+
+    The pool is created lazily and recreated after a fork, so each gunicorn
+    worker owns its own pool while all of them map the same buffer file.
+    """
+
+    def __init__(self, path, code_count, start_count, processes):
+        self.path = path
+        self.code_count = code_count
+        self.verse_count = start_count - 1
+        self.start_count = start_count
+        self.processes = processes
+        self._executor = None
+        self._pid = None
+
+    def _pool(self):
+        if self._executor is None or self._pid != os.getpid():
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.processes,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=attach_scan_buffer,
+                initargs=(self.path, self.code_count, self.start_count)
+            )
+            self._pid = os.getpid()
+            logger.info(f"Started scan pool with {self.processes} processes")
+        return self._executor
+
+    def scan(self, pattern, phrase_codes):
+        """Return the sorted first-hit offsets of pattern across all verses."""
+        # A few chunks per process keeps the load balanced across the pool
+        chunk_count = min(self.verse_count, self.processes * 4) or 1
+        bounds = [self.verse_count * i // chunk_count for i in range(chunk_count + 1)]
+        futures = [
+            self._pool().submit(scan_verses, pattern, phrase_codes, first, last)
+            for first, last in zip(bounds, bounds[1:])
+            if last > first
+        ]
+        hits = array('q')
+        for future in futures:
+            hits.extend(future.result())
+        return hits
+
+    def shutdown(self):
+        if self._executor is not None and self._pid == os.getpid():
+            self._executor.shutdown(wait=False, cancel_futures=True)
+        self._executor = None
@@ -0,0 +1,151 @@
+import json
+import asyncio
+import threading
+
+import asgi
+import app_web
+
+
+async def call(method, path, body=None):
+    """Send one request through the ASGI app and return the messages it sent."""
+    messages = []
+    payload = json.dumps(body).encode('utf-8') if body is not None else b''
+
+    async def receive():
+        return {'type': 'http.request', 'body': payload, 'more_body': False}
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {'type': 'http', 'method': method, 'path': path, 'query_string': b'', 'headers': []}
+    await asgi.app(scope, receive, send)
+    return messages
+
+
+def response_body(messages):
+    return b''.join(message.get('body', b'') for message in messages if message['type'] == 'http.response.body')
+
+
+async def post(path, body):
+    """Send one POST request and return ``(status, decoded JSON body)``."""
+    messages = await call('POST', path, body)
+    return messages[0]['status'], json.loads(response_body(messages))
+
+
+def run_concurrently(*bodies):
+    async def main():
+        return await asyncio.gather(*(post('/api/search', body) for body in bodies))
+    return asyncio.run(main())
+
+
+def test_concurrent_formats_are_not_coalesced():
+    (full_status, full), (compact_status, compact) = run_concurrently(
+        {'phrase': 'בראשית', 'deadline': 20}, {'phrase': 'בראשית', 'deadline': 20, 'format': 'compact'}
+    )
+    assert full_status == compact_status == 200
+    assert 'format' not in full
+    assert all('locations' in result for result in full['results'])
+    assert compact['format'] == 'compact'
+    assert all('matches' in result for result in compact['results'])
+
+
+def test_search_key_includes_format():
+    options = {'input_phrase': 'משה'}
+    key = app_web.search_request_key
+    assert key(options) != key({**options, 'format': 'compact'})
+    assert key(options) == key({**options, 'format': 'full'})
+
+
+def test_concurrent_full_and_summary_get_their_own_shape():
+    (_, full), (_, summary) = run_concurrently(
+        {'phrase': 'אלהים', 'deadline': 21}, {'phrase': 'אלהים', 'deadline': 21, 'format': 'summary'}
+    )
+    assert 'results' in full and 'summary' not in full
+    assert summary['format'] == 'summary'
+    assert set(summary['summary']) == {'sources', 'books', 'chapters'}
+    assert 'results' not in summary and not summary['truncated']
+    assert summary['total_variants'] == full['total_variants']
+
+
+def test_head_sends_headers_only():
+    for path in ('/health', '/', '/stats'):
+        get, head = asyncio.run(call('GET', path)), asyncio.run(call('HEAD', path))
+        assert head[0]['status'] == get[0]['status'] == 200
+        assert dict(head[0]['headers'])[b'content-type'] == dict(get[0]['headers'])[b'content-type']
+        assert response_body(get) and response_body(head) == b''
+
+
+def test_json_routes_match_flask():
+    flask_posts = {rule.rule for rule in app_web.app.url_map.iter_rules() if 'POST' in rule.methods}
+    assert set(asgi.JSON_ROUTES) == flask_posts - {'/api/search/stream'}
+
+
+def test_batch_route_through_asgi():
+    status, result = asyncio.run(post('/api/search/batch', {'phrases': ['משה', 'אהרן']}))
+    assert status == 200 and result['success']
+    assert asyncio.run(post('/api/search/batch', {'phrases': []}))[0] == 400
+
+
+def test_failed_stream_start_releases_its_slot():
+    async def receive():
+        return {'type': 'http.request', 'body': json.dumps({'phrase': 'משה'}).encode('utf-8'), 'more_body': False}
+
+    async def send(message):
+        if message['type'] == 'http.response.start' and message['status'] == 200:
+            raise OSError('client went away')
+
+    scope = {'type': 'http', 'method': 'POST', 'path': '/api/search/stream', 'query_string': b'', 'headers': []}
+    for _ in range(3):
+        asyncio.run(asgi.app(scope, receive, send))
+    assert asgi.search_queue.stats()['pending'] == 0
+
+
+def test_request_errors_are_not_200(monkeypatch):
+    assert asyncio.run(post('/api/search', {'phrase': 'משה', 'match': 'word', 'engine': 'bitap'}))[0] == 400
+    assert asyncio.run(post('/api/search', {'phrase': 'משה', 'limit': 5, 'cursor': 'bogus'}))[0] == 400
+    assert asyncio.run(post('/api/search/stream', {'phrase': 'משה', 'limit': 5, 'cursor': 'bogus'}))[0] == 400
+
+    monkeypatch.setitem(app_web.app.config, 'COST_POLICY', 'reject')
+    monkeypatch.setitem(app_web.app.config, 'COST_BUDGET_MS', 0)
+    status, result = asyncio.run(post('/api/search', {'phrase': 'משה', 'engine': 'class'}))
+    assert status == 422 and result['error'].startswith('Query too expensive')
+    status, result = asyncio.run(post('/api/search/stream', {'phrase': 'משה', 'engine': 'class'}))
+    assert status == 422 and not result['success']
+
+    client = app_web.app.test_client()
+    assert client.post('/api/search', json={'phrase': 'משה', 'engine': 'class'}).status_code == 422
+    assert client.post('/api/search/stream', json={'phrase': 'משה', 'engine': 'class'}).status_code == 422
+    monkeypatch.undo()
+    assert client.post('/api/search', json={'phrase': 'משה', 'limit': 5, 'cursor': 'bogus'}).status_code == 400
+    response = client.post('/api/search/stream', json={'phrase': 'משה', 'limit': 5})
+    assert response.status_code == 200 and response.mimetype == 'application/x-ndjson'
+    assert json.loads(response.get_data(as_text=True).splitlines()[-1])['type'] == 'summary'
+
+
+def test_health_answers_while_explain_loads_a_corpus(monkeypatch):
+    started, release = threading.Event(), threading.Event()
+    load_search_table = app_web.load_search_table
+
+    def slow_load(corpora=None):
+        started.set()
+        release.wait(5)
+        return load_search_table(corpora)
+    monkeypatch.setattr(app_web, 'load_search_table', slow_load)
+
+    async def main():
+        explain = asyncio.ensure_future(post('/api/search/explain', {'phrase': 'משה'}))
+        await asyncio.get_running_loop().run_in_executor(None, started.wait, 5)
+        health = await asyncio.wait_for(call('GET', '/health'), 2)
+        assert health[0]['status'] == 200 and not explain.done()
+        release.set()
+        return await explain
+    status, result = asyncio.run(main())
+    assert status == 200 and result['success']
+
+
+def test_server_faults_are_500(monkeypatch):
+    monkeypatch.setitem(app_web.app.config, 'COST_POLICY', 'unknown')
+    monkeypatch.setitem(app_web.app.config, 'COST_BUDGET_MS', 0)
+    status, result = asyncio.run(post('/api/search', {'phrase': 'משה', 'engine': 'class'}))
+    assert status == 500 and result['error'] == 'Internal server error'
+    assert asyncio.run(post('/api/search/stream', {'phrase': 'משה', 'engine': 'class'}))[0] == 500
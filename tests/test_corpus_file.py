@@ -0,0 +1,30 @@
+import re
+
+import numpy as np
+
+import app_web
+
+
+def test_mapped_word_index_and_columns_match_a_fresh_build(tmp_path):
+    table = app_web.load_verse_table()
+    path = str(tmp_path / 'corpus.bin')
+    app_web.write_corpus(table, path, 'sha1')
+    mapped = app_web.read_corpus(path, 'sha1')
+
+    built = app_web.WordIndex.build(mapped)
+    assert mapped.word_index.vocabulary == built.vocabulary
+    for name, _ in app_web.WordIndex.ARRAYS:
+        assert np.array_equal(getattr(mapped.word_index, name), getattr(built, name))
+
+    columns = app_web.VerseColumns.build(mapped.encoded)
+    for name in ('order', 'lengths', 'active', 'columns'):
+        assert np.array_equal(getattr(mapped.verse_columns, name), getattr(columns, name))
+
+    patterns = [(re.compile('משה'), 3)]
+    assert np.array_equal(mapped.word_index.find(patterns, prefixes=True), built.find(patterns, prefixes=True))
+
+
+def test_older_layouts_are_stale(tmp_path):
+    path = str(tmp_path / 'corpus.bin')
+    app_web.write_corpus_file(path, {'source_sha1': 'sha1'}, {'codes': ('B', b'\0')})
+    assert app_web.read_corpus(path, 'sha1') is None
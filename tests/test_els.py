@@ -0,0 +1,50 @@
+import re
+import bisect
+
+import pytest
+
+import app_web
+
+
+def reference_els(table, phrase, maps, min_skip, max_skip):
+    """Every forward and backward ELS, found with a regex over the letters read at each skip."""
+    classes = [''.join(sorted({letter for letter, _ in options}))
+               for options in app_web.get_letter_options(phrase, maps)]
+    offsets = [offset for offset, ch in enumerate(table.text) if app_web.WORD_RE.fullmatch(ch)]
+    letters = ''.join(table.text[offset] for offset in offsets)
+    verse_of = lambda index: bisect.bisect_right(table.starts, offsets[index]) - 1
+    hits = set()
+    for sign, pattern_classes in ((1, classes), (-1, classes[::-1])):
+        pattern = re.compile('(?=(' + ''.join(f'[{letter_class}]' for letter_class in pattern_classes) + '))')
+        for skip in range(min_skip, max_skip + 1):
+            for residue in range(skip):
+                for match in pattern.finditer(letters[residue::skip]):
+                    first = residue + match.start() * skip
+                    # Backward hits start at the letter read first, the highest index
+                    start = first if sign > 0 else first + (len(phrase) - 1) * skip
+                    end = start + sign * (len(phrase) - 1) * skip
+                    variant = match.group(1) if sign > 0 else match.group(1)[::-1]
+                    hits.add((variant, sign * skip, start, verse_of(start), verse_of(end)))
+    return hits
+
+
+@pytest.mark.parametrize('maps', [('Map 4',), ('Map 1', 'Map 6')])
+def test_els_matches_a_brute_force_scan(monkeypatch, maps):
+    monkeypatch.setitem(app_web.app.config, 'ELS_MAX_HITS', 10 ** 6)
+    table = app_web.load_verse_table()
+    hits, hit_count, _ = app_web.search_els(table, 'אהרן', 2, 12, maps=maps)
+    expected = reference_els(table, 'אהרן', maps, 2, 12)
+    assert {(variant, skip, start, start_verse, end_verse)
+            for variant, _, skip, start, start_verse, end_verse in hits} == expected
+    assert hit_count == len(hits) == len(expected)
+    assert any(skip < 0 for _, _, skip, *_ in hits)
+
+
+def test_els_directions_split_the_hits(monkeypatch):
+    monkeypatch.setitem(app_web.app.config, 'ELS_MAX_HITS', 10 ** 6)
+    table = app_web.load_verse_table()
+    both = app_web.search_els(table, 'משה', 2, 30, maps=('Map 4',))[0]
+    forward = app_web.search_els(table, 'משה', 2, 30, direction='forward', maps=('Map 4',))[0]
+    backward = app_web.search_els(table, 'משה', 2, 30, direction='backward', maps=('Map 4',))[0]
+    assert all(hit[2] > 0 for hit in forward) and all(hit[2] < 0 for hit in backward)
+    assert sorted(both) == sorted(forward + backward)
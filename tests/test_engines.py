@@ -0,0 +1,93 @@
+import pytest
+
+import app_web
+
+PHRASES = ['משה', 'אהרן', 'כי טוב']
+MAPS = [None, ('Map 4',), ('Map 1', 'Map 6')]
+
+
+def is_letter(ch):
+    return app_web.WORD_RE.fullmatch(ch) is not None
+
+
+def reference_hits(table, phrase, maps, whole_words=False, prefixes=False):
+    """First mapped match per verse, found by testing every window letter by letter.
+
+    With ``prefixes`` a whole-word match may also follow ignored_prefixes
+    letters at the start of its first word.
+    """
+    allowed = [{letter for letter, _ in options} for options in app_web.get_letter_options(phrase, maps)]
+    resolve_sources = app_web.make_source_resolver(app_web.get_letter_options(phrase, maps))
+    hits = []
+    for verse_id in range(len(table)):
+        text = table.verse_text(verse_id)
+        for offset in range(len(text) - len(phrase) + 1):
+            if text[offset] not in allowed[0]:
+                continue
+            window = text[offset:offset + len(phrase)]
+            if window == phrase or not all(letter in letters for letter, letters in zip(window, allowed)):
+                continue
+            if whole_words:
+                word_start = offset
+                while word_start and is_letter(text[word_start - 1]):
+                    word_start -= 1
+                prefix = text[word_start:offset]
+                if prefix and not (prefixes and set(prefix) <= app_web.ignored_prefixes):
+                    continue
+                if is_letter(text[offset + len(phrase):][:1]):
+                    continue
+            hits.append((window, resolve_sources(window), verse_id, table.starts[verse_id] + offset))
+            break
+    return hits
+
+
+@pytest.fixture(scope='module')
+def table():
+    return app_web.load_verse_table()
+
+
+@pytest.fixture(scope='module')
+def references(table):
+    cache = {}
+
+    def get(phrase, maps, whole_words=False, prefixes=False):
+        key = phrase, maps, whole_words, prefixes
+        if key not in cache:
+            cache[key] = reference_hits(table, phrase, maps, whole_words, prefixes)
+        return cache[key]
+    return get
+
+
+@pytest.mark.parametrize('engine', app_web.SEARCH_ENGINES)
+@pytest.mark.parametrize('maps', MAPS)
+@pytest.mark.parametrize('phrase', PHRASES)
+def test_engines_match_a_brute_force_scan(table, references, engine, maps, phrase):
+    if engine == 'signature' and not app_web.is_signature_phrase(phrase):
+        pytest.skip('the signature index only answers single words')
+    if engine == 'projected' and maps is None:
+        maps = app_web.MAP_NAMES
+    hits = list(app_web.iter_search_hits(table, phrase, engine, 'thread', maps=maps))
+    assert hits == references(phrase, maps, whole_words=engine == 'words')
+
+
+@pytest.mark.parametrize('maps', MAPS)
+@pytest.mark.parametrize('phrase', PHRASES)
+def test_prefix_matches_match_a_brute_force_scan(table, references, maps, phrase):
+    hits = list(app_web.iter_search_hits(table, phrase, 'words', 'thread', maps=maps, match='prefix'))
+    assert hits == references(phrase, maps, whole_words=True, prefixes=True)
+    assert len(hits) >= len(references(phrase, maps, whole_words=True))
+
+
+@pytest.mark.parametrize('maps', MAPS)
+def test_process_execution_matches_thread_execution(table, maps):
+    thread = list(app_web.iter_search_hits(table, 'אהרן', 'class', 'thread', maps=maps))
+    process = list(app_web.iter_search_hits(table, 'אהרן', 'class', 'process', maps=maps))
+    assert process == thread
+
+
+def test_single_map_queries_use_the_projected_index(table, references):
+    result = app_web.perform_search('כי טוב', maps=['Map 4'], limit=1000, format='compact')
+    assert result['engine'] == 'projected'
+    hits = sorted((verse_id, table.starts[verse_id] + offset) for item in result['results']
+                  for verse_id, offset in item['matches'])
+    assert hits == [(verse_id, start) for _, _, verse_id, start in references('כי טוב', ('Map 4',))]
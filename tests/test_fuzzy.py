@@ -0,0 +1,54 @@
+import pytest
+
+import app_web
+
+
+def edit_distance(allowed, text):
+    """Edits turning a text into the phrase, any letter of a position's class matching it."""
+    column = list(range(len(allowed) + 1))
+    for ch in text:
+        row = [column[0] + 1]
+        for i, letters in enumerate(allowed, start=1):
+            row.append(min(column[i] + 1, row[i - 1] + 1, column[i - 1] + (ch not in letters)))
+        column = row
+    return column[-1]
+
+
+def reference_fuzzy(table, phrase, maps, max_distance):
+    """Closest match per verse, from an edit-distance table over the whole verse.
+
+    The match ends where the smallest distance is first reached and starts
+    where the alignment is closest, then closest to the phrase length.
+    """
+    allowed = [{letter for letter, _ in options} for options in app_web.get_letter_options(phrase, maps)]
+    length = len(allowed)
+    hits = []
+    for verse_id in range(len(table)):
+        text = table.verse_text(verse_id)
+        column = list(range(length + 1))
+        best, end = max_distance + 1, None
+        for j, ch in enumerate(text):
+            row = [0]
+            for i, letters in enumerate(allowed, start=1):
+                row.append(min(column[i] + 1, row[i - 1] + 1, column[i - 1] + (ch not in letters)))
+            column = row
+            if column[-1] < best:
+                best, end = column[-1], j
+        if best > max_distance:
+            continue
+        distance, _, span = min(
+            (edit_distance(allowed, text[end + 1 - span:end + 1]), abs(span - length), span)
+            for span in range(min(length + max_distance, end + 1) + 1)
+        )
+        assert distance == best
+        start = end + 1 - span
+        hits.append((text[start:end + 1], distance, verse_id, table.starts[verse_id] + start))
+    return hits
+
+
+@pytest.mark.parametrize('phrase, max_distance, maps', [('משה', 1, None), ('אהרן', 2, ('Map 4',))])
+def test_fuzzy_matches_a_brute_force_edit_distance(phrase, max_distance, maps):
+    table = app_web.load_verse_table()
+    hits = app_web.search_fuzzy(table, phrase, max_distance, maps)
+    assert hits == reference_fuzzy(table, phrase, maps, max_distance)
+    assert {distance for _, distance, _, _ in hits} == set(range(max_distance + 1))
@@ -0,0 +1,47 @@
+import pytest
+
+import app_web
+
+
+def reference_gematria(table, phrase, span, maps, max_words):
+    """Every span worth a target value, found by adding up letters or words verse by verse."""
+    targets = app_web.gematria_targets(phrase.replace(' ', ''), maps)
+    largest = max(targets)
+    letter_values = {ch: app_web.gematria_value(ch) for ch in set(table.text)}
+    hits = []
+    for verse_id in range(len(table)):
+        text = table.verse_text(verse_id)
+        base = table.starts[verse_id]
+        if span == 'words':
+            units = [(match.start(), match.end()) for match in app_web.WORD_RE.finditer(text)]
+            longest = max_words
+        else:
+            units = [(offset, offset + 1) for offset, ch in enumerate(text) if app_web.WORD_RE.fullmatch(ch)]
+            longest = len(units)
+        for i in range(len(units)):
+            value = 0
+            for j in range(i, min(i + longest, len(units))):
+                value += sum(letter_values[ch] for ch in text[units[j][0]:units[j][1]])
+                if value > largest:
+                    break
+                if value in targets:
+                    covered = text[units[i][0]:units[j][1]]
+                    variant = covered if span == 'words' else ''.join(app_web.WORD_RE.findall(covered))
+                    hits.append((variant, value, verse_id, base + units[i][0], len(covered)))
+    return targets, hits
+
+
+@pytest.mark.parametrize('span, phrase, maps', [
+    ('words', 'משה', None), ('words', 'אהרן', ('Map 4', 'Map 6')),
+    ('letters', 'גד', None), ('letters', 'גד', ('Map 1', 'Map 4'))
+])
+def test_gematria_matches_a_brute_force_sum(monkeypatch, span, phrase, maps):
+    monkeypatch.setitem(app_web.app.config, 'GEMATRIA_MAX_HITS', 10 ** 6)
+    table = app_web.load_verse_table()
+    values, hits, hit_count = app_web.search_gematria(table, phrase, span, maps)
+    targets, expected = reference_gematria(table, phrase, span, maps, app_web.app.config['GEMATRIA_MAX_WORDS'])
+    assert values == targets
+    assert [(variant, value, verse_id, start, length)
+            for variant, _, value, verse_id, start, length in hits] == expected
+    assert hit_count == len(expected)
+    assert all(sources == values[value] for _, sources, value, *_ in hits)
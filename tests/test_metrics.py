@@ -0,0 +1,20 @@
+from metrics import Metrics
+
+
+def test_requests_only_flush_once_a_batch_is_due(tmp_path):
+    metrics = Metrics(str(tmp_path / 'metrics.sqlite3'), flush_interval=0, flush_requests=3)
+    metrics.counter('requests_total', 'Requests.')
+    conn = metrics._connect()
+    changes = conn.total_changes
+
+    for _ in range(2):
+        metrics.inc('requests_total')
+        assert not metrics.request_done()
+    assert conn.total_changes == changes
+
+    metrics.inc('requests_total')
+    assert metrics.request_done()
+    metrics.flush()
+    assert conn.total_changes > changes
+    assert 'requests_total 3' in metrics.render()
+    assert not metrics.request_done()
@@ -0,0 +1,58 @@
+import os
+import logging
+
+from result_cache import ResultCache
+
+
+def test_hits_do_not_write_until_a_batch_is_due(tmp_path):
+    cache = ResultCache(str(tmp_path / 'cache.sqlite3'), ttl=60, max_entries=10, counter_batch=3)
+    cache.set('a', {'value': 1})
+    conn = cache._connect()
+    changes = conn.total_changes
+
+    assert cache.get('a') == {'value': 1}
+    assert cache.get('missing') is None
+    assert conn.total_changes == changes
+    assert cache.stats()['hits'] == 1 and cache.stats()['misses'] == 1
+
+    cache.get('a')
+    assert conn.total_changes > changes
+    assert dict(conn.execute('SELECT name, value FROM counters')) == {'hits': 2, 'misses': 1}
+    assert cache.stats()['hits'] == 2
+
+
+def test_access_time_is_refreshed_after_the_touch_interval(tmp_path):
+    cache = ResultCache(str(tmp_path / 'cache.sqlite3'), ttl=60, max_entries=10, touch_interval=0)
+    cache.set('a', 1)
+    conn = cache._connect()
+    conn.execute('UPDATE entries SET accessed = 0')
+    cache.get('a')
+    assert conn.execute('SELECT accessed FROM entries').fetchone()[0] > 0
+
+
+def test_unusable_cache_directory_is_logged_once(tmp_path, caplog):
+    blocker = tmp_path / 'file'
+    blocker.write_text('')
+    cache = ResultCache(os.path.join(str(blocker), 'cache.sqlite3'), ttl=60, max_entries=10)
+
+    with caplog.at_level(logging.WARNING, logger='result_cache'):
+        assert cache.get('a') is None
+        cache.set('a', 1)
+        assert cache.stats()['entries'] == 0
+    assert len(caplog.records) == 1
+
+
+def test_expired_entries_miss_and_least_recently_read_are_evicted(tmp_path):
+    cache = ResultCache(str(tmp_path / 'cache.sqlite3'), ttl=60, max_entries=2, touch_interval=0)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    conn = cache._connect()
+    conn.execute("UPDATE entries SET accessed = accessed - 10 WHERE key = 'b'")
+    cache.get('a')
+    cache.set('c', 3)
+    assert (cache.get('a'), cache.get('b'), cache.get('c')) == (1, None, 3)
+
+    conn.execute("UPDATE entries SET created = created - 120 WHERE key = 'a'")
+    assert cache.get('a') is None
+    cache.set('d', 4)
+    assert {key for key, in conn.execute('SELECT key FROM entries')} == {'c', 'd'}
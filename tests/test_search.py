@@ -0,0 +1,201 @@
+import bisect
+from collections import Counter
+
+import pytest
+
+import app_web
+from result_cache import ResultCache
+
+
+@pytest.fixture(autouse=True)
+def empty_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(app_web, 'result_cache', ResultCache(str(tmp_path / 'cache.sqlite3'), 60, 100))
+
+
+def test_empty_truncated_page_can_be_resumed():
+    result = app_web.perform_search('אהרן', engine='aho', limit=50, deadline=1e-9)
+    assert result['success'] and result['truncated']
+    assert result['hit_count'] == 0
+    assert result['has_more']
+    query_key = app_web.make_query_key(app_web.load_verse_table(), 'אהרן', 'aho', None)
+    assert app_web.decode_cursor(result['next_cursor'], query_key) == 0
+
+    resumed = app_web.perform_search('אהרן', engine='aho', limit=50, cursor=result['next_cursor'])
+    first = app_web.perform_search('אהרן', engine='aho', limit=50)
+    assert resumed['results'] == first['results']
+
+
+def test_empty_truncated_stream_page_can_be_resumed():
+    records = list(app_web.stream_search('אהרן', engine='aho', limit=50, deadline=1e-9))
+    summary = records[-1]
+    assert summary['type'] == 'summary' and summary['truncated']
+    assert summary['hit_count'] == 0 and summary['has_more'] and summary['next_cursor']
+
+
+def test_map_counts_include_maps_producing_the_original_letter():
+    table = app_web.load_verse_table()
+    occurrences = app_web.search_occurrences(table, 'ה')
+    counts = occurrences.map_counts(app_web.MAP_NAMES)
+    # Map 4 maps ה to itself, so every hit of the phrase uses it
+    assert counts['Map 4'] == int(occurrences.counts[occurrences.original]) > 0
+    assert all(count <= len(occurrences) for count in counts.values())
+
+
+@pytest.mark.parametrize('maps', [None, ('Map 4',)])
+def test_occurrences_match_a_brute_force_scan(maps):
+    table = app_web.load_verse_table()
+    letter_options = app_web.get_letter_options('משה', maps)
+    allowed = [{letter for letter, _ in options} for options in letter_options]
+    expected = [
+        (start, table.text[start:start + 3]) for start in range(len(table.text) - 2)
+        if table.text[start] in allowed[0] and all(letter in letters for letter, letters in zip(table.text[start:start + 3], allowed))
+    ]
+    occurrences = app_web.search_occurrences(table, 'משה', maps)
+    hits = [(start, occurrences.variants[variant_id])
+            for start, variant_id in zip(occurrences.starts.tolist(), occurrences.variant_ids.tolist())]
+    assert hits == expected
+    assert occurrences.verse_ids.tolist() == [
+        bisect.bisect_right(table.starts, start) - 1 for start, _ in expected
+    ]
+
+    counts = Counter(variant for _, variant in expected)
+    first_seen = {variant: index for index, (_, variant) in reversed(list(enumerate(expected)))}
+    assert occurrences.variants == sorted(counts, key=lambda variant: (-counts[variant], first_seen[variant]))
+    assert occurrences.counts.tolist() == [counts[variant] for variant in occurrences.variants]
+    verses = Counter(variant for variant, _ in {
+        (variant, verse_id) for (_, variant), verse_id in zip(expected, occurrences.verse_ids.tolist())
+    })
+    assert occurrences.verse_counts.tolist() == [verses[variant] for variant in occurrences.variants]
+
+    produced = {name: [{letter for letter, source in options if source == name} for options in letter_options]
+                for name in app_web.MAP_NAMES}
+    assert occurrences.map_counts(app_web.MAP_NAMES) == {
+        name: sum(1 for _, variant in expected if any(letter in letters for letter, letters in zip(variant, sets)))
+        for name, sets in produced.items()
+    }
+
+
+def test_summary_keeps_same_named_books_of_each_corpus_apart(monkeypatch):
+    monkeypatch.setitem(app_web.app.config, 'CORPORA', 'copy=torah.txt')
+    single = app_web.perform_search('משה', format='summary')
+    both = app_web.perform_search('משה', format='summary', corpora=['torah', 'copy'])
+    assert both['success'] and both['total_hits'] == 2 * single['total_hits']
+
+    books = both['summary']['books']
+    assert [book for book in books if book['corpus'] == 'torah'] == [
+        {'corpus': 'torah', **book} for book in single['summary']['books']
+    ]
+    assert len(books) == 2 * len(single['summary']['books'])
+    assert {chapter['corpus'] for chapter in both['summary']['chapters']} == {'torah', 'copy'}
+
+
+def test_every_search_route_accepts_corpora(monkeypatch):
+    monkeypatch.setitem(app_web.app.config, 'CORPORA', 'copy=torah.txt')
+    both = ['torah', 'copy']
+    searches = [
+        (app_web.perform_els_search, {'input_phrase': 'משה', 'max_skip': 10, 'maps': ['Map 4']}),
+        (app_web.perform_gematria_search, {'input_phrase': 'משה'}),
+        (app_web.perform_fuzzy_search, {'input_phrase': 'אהרן', 'maps': ['Map 4']}),
+        (app_web.perform_occurrence_search, {'input_phrase': 'אהרן'})
+    ]
+    for perform, options in searches:
+        single = perform(**options)
+        combined = perform(**options, corpora=both)
+        assert combined['success'] and combined['corpora'] == both, perform.__name__
+        assert combined['total_hits'] == 2 * single['total_hits'] > 0, perform.__name__
+        assert app_web.response_status(perform(**options, corpora=['missing'])) == 400
+
+    single = app_web.perform_occurrence_search('אהרן')
+    combined = app_web.perform_occurrence_search('אהרן', corpora=both)
+    assert [(item['variant'], 2 * item['count'], 2 * item['verses']) for item in single['results']] == [
+        (item['variant'], item['count'], item['verses']) for item in combined['results']
+    ]
+    assert combined['original_hits'] == 2 * single['original_hits']
+
+    batch = app_web.perform_batch_search(['משה', 'כי טוב'], corpora=both)
+    for result in batch['results']:
+        assert result['corpora'] == both
+        assert result['results'] == app_web.perform_search(result['input_phrase'], corpora=both)['results']
+
+
+def test_cache_keys_change_when_the_corpus_is_replaced(tmp_path):
+    table = app_web.load_verse_table()
+    key = app_web.make_query_key(table, 'משה', 'bitap', None)
+    assert app_web.make_query_key(app_web.ShardSet([table, table]), 'משה', 'bitap', None) != key
+
+    replaced = tmp_path / 'torah.txt'
+    with open(app_web.app.config['TORAH_FILE'], encoding='utf-8') as source:
+        replaced.write_text(source.read().replace('בראשית ברא', 'בראשית בנה', 1), encoding='utf-8')
+    table = app_web.load_corpus(str(replaced), str(tmp_path / 'corpus.bin'))
+    assert app_web.make_query_key(table, 'משה', 'bitap', None) != key
+
+
+def test_repeated_search_is_served_from_the_cache():
+    first = app_web.perform_search('אהרן', engine='bitap')
+    second = app_web.perform_search('אהרן', engine='bitap')
+    assert not first['cached'] and second['cached']
+    assert second['results'] == first['results']
+
+
+def test_batch_matches_single_searches():
+    phrases = ['משה', 'אהרן', 'כי טוב', 'בני ישראל']
+    batch = app_web.perform_batch_search(phrases)
+    assert batch['success'] and batch['phrase_count'] == 4
+    for phrase, result in zip(phrases, batch['results']):
+        single = app_web.perform_search(phrase)
+        assert result['results'] == single['results'], phrase
+    assert [result['engine'] for result in batch['results']] == ['signature', 'signature', 'bitap', 'bitap']
+
+
+def test_summary_and_batch_follow_the_cost_policy(monkeypatch):
+    monkeypatch.setitem(app_web.app.config, 'COST_BUDGET_MS', 0)
+    monkeypatch.setitem(app_web.app.config, 'COST_POLICY', 'reject')
+    summary = app_web.perform_search('אהרן', format='summary')
+    assert app_web.response_status(summary) == 422 and not summary['success']
+    rejected = app_web.perform_batch_search(['אהרן', 'כי טוב'])['results']
+    assert all(not result['success'] and 'estimate' in result for result in rejected)
+
+    monkeypatch.setitem(app_web.app.config, 'COST_POLICY', 'downgrade')
+    monkeypatch.setitem(app_web.app.config, 'DOWNGRADE_LIMIT', 5)
+    summary = app_web.perform_search('אהרן', format='summary')
+    assert summary['total_hits'] == 5 and summary['plan']['action'] == 'downgrade'
+    for result in app_web.perform_batch_search(['אהרן', 'כי טוב'])['results']:
+        assert result['plan']['action'] == 'downgrade'
+        assert sum(len(item['locations']) for item in result['results']) == 5
+
+
+def test_summary_and_batch_stop_at_the_deadline():
+    summary = app_web.perform_search('אהרן', format='summary', deadline=1e-9)
+    assert summary['success'] and summary['truncated'] and summary['total_hits'] == 0
+    assert not app_web.perform_search('אהרן', format='summary')['cached']
+
+    batch = app_web.perform_batch_search(['אהרן', 'כי טוב'], deadline=1e-9)
+    assert all(result['truncated'] and not result['results'] for result in batch['results'])
+    assert not any(result['cached'] for result in app_web.perform_batch_search(['אהרן', 'כי טוב'])['results'])
+
+
+def page_hits(result):
+    return sorted((verse_id, offset, item['variant']) for item in result['results']
+                  for verse_id, offset in item['matches'])
+
+
+@pytest.mark.parametrize('engine', ['bitap', 'aho', 'signature'])
+def test_cursor_pages_cover_every_hit_once(engine):
+    table = app_web.load_verse_table()
+    expected = sorted((verse_id, start - table.starts[verse_id], variant)
+                      for variant, _, verse_id, start in app_web.iter_search_hits(table, 'אהרן', engine, 'thread'))
+
+    hits, cursor, pages = [], None, 0
+    while True:
+        page = app_web.perform_search('אהרן', engine=engine, limit=2000, cursor=cursor, format='compact')
+        assert page['success'] and page['hit_count'] <= 2000
+        hits.extend(page_hits(page))
+        pages += 1
+        if not page['has_more']:
+            break
+        cursor = page['next_cursor']
+    assert pages > 1
+    assert sorted(hits) == expected
+
+    skipped = app_web.perform_search('אהרן', engine=engine, limit=10, offset=5, format='compact')
+    assert page_hits(skipped) == expected[5:15]